@@ -0,0 +1,86 @@
+# Allocation - Distribuição de alunos sem turma entre as turmas com vagas
+
+"""
+Algoritmos puros (sem banco) usados por services.matricular_automatico para
+POST /matriculas/auto. Recebem os alunos sem turma e as turmas com a
+ocupação atual e devolvem as alocações; quem chama grava tudo em uma única
+transação.
+
+Políticas:
+  - "equilibrar": cada aluno, em ordem de id, vai para a turma com menor
+    ocupação proporcional (alunos / capacidade) naquele momento. Heap de
+    turmas: O(n log t).
+  - "faixa_etaria": alunos ordenados por data de nascimento (mais velhos
+    primeiro) preenchem as turmas ordenadas pela idade média de quem já está
+    nelas (turmas vazias por último), de modo que cada turma recebe uma faixa
+    contínua de idades. O(n log n).
+  - "ordem": os alunos de `ordem` (na ordem dada; os demais depois, por id)
+    preenchem as turmas na ordem recebida, uma de cada vez. O(n).
+"""
+
+import heapq
+from collections import namedtuple
+
+POLITICAS = ("equilibrar", "faixa_etaria", "ordem")
+
+# nascimento_medio: número comparável (ex.: juliano) ou None para turma vazia
+TurmaVagas = namedtuple("TurmaVagas", ["id", "capacidade", "alunos", "nascimento_medio"])
+AlunoSemTurma = namedtuple("AlunoSemTurma", ["id", "data_nascimento"])
+
+
+def allocate(alunos, turmas, politica="equilibrar", ordem=None):
+    """
+    Distribui `alunos` (AlunoSemTurma em ordem de id) entre `turmas`
+    (TurmaVagas). Retorna (alocacoes [(aluno_id, turma_id)], sem_vaga [aluno_id]).
+    """
+    turmas = [turma for turma in turmas if turma.capacidade > turma.alunos]
+    if politica == "equilibrar":
+        return _balance(alunos, turmas)
+    if politica == "faixa_etaria":
+        alunos = sorted(alunos, key=lambda aluno: (aluno.data_nascimento, aluno.id))
+        turmas = sorted(turmas, key=lambda turma: (
+            turma.nascimento_medio is None, turma.nascimento_medio or 0, turma.id
+        ))
+        return _fill([aluno.id for aluno in alunos], turmas)
+    if politica == "ordem":
+        return _fill(_ordered_ids(alunos, ordem or ()), turmas)
+    raise ValueError(f"Política inválida: {politica}")
+
+
+def _balance(alunos, turmas):
+    heap = [(turma.alunos / turma.capacidade, turma.id, turma.alunos, turma.capacidade) for turma in turmas]
+    heapq.heapify(heap)
+    alocacoes = []
+    for index, aluno in enumerate(alunos):
+        if not heap:
+            return alocacoes, [aluno.id for aluno in alunos[index:]]
+        _, turma_id, ocupados, capacidade = heapq.heappop(heap)
+        alocacoes.append((aluno.id, turma_id))
+        ocupados += 1
+        if ocupados < capacidade:
+            heapq.heappush(heap, (ocupados / capacidade, turma_id, ocupados, capacidade))
+    return alocacoes, []
+
+
+def _fill(aluno_ids, turmas):
+    """Preenche as turmas em sequência, cada uma até a capacidade"""
+    alocacoes = []
+    inicio = 0
+    for turma in turmas:
+        vagas = turma.capacidade - turma.alunos
+        alocacoes.extend((aluno_id, turma.id) for aluno_id in aluno_ids[inicio:inicio + vagas])
+        inicio += vagas
+        if inicio >= len(aluno_ids):
+            break
+    return alocacoes, list(aluno_ids[inicio:])
+
+
+def _ordered_ids(alunos, ordem):
+    """Ids de `ordem` que estão sem turma (sem repetir), seguidos dos demais"""
+    sem_turma = {aluno.id for aluno in alunos}
+    primeiros = []
+    for aluno_id in ordem:
+        if aluno_id in sem_turma:
+            primeiros.append(aluno_id)
+            sem_turma.discard(aluno_id)
+    return primeiros + [aluno.id for aluno in alunos if aluno.id in sem_turma]
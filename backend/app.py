@@ -1,34 +1,145 @@
 # Sistema de Gestão Escolar - Backend Simplificado
 # FastAPI + SQLAlchemy + SQLite
 
-from fastapi import FastAPI, HTTPException, Depends, Query
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import models
 import database
-from database import get_db
+import sync
+import services
+import compression
+import cors
+import coalescing
+import profiler
+import slow_queries
+import roster
+import json
+import os
+import tenancy
+from database import get_db, get_read_db
 from pydantic import BaseModel, validator
 from datetime import date, datetime
 
-# Inicializar FastAPI
-app = FastAPI(
-    title="Sistema de Gestão Escolar API",
-    description="API para gerenciamento de alunos, turmas e matrículas",
-    version="1.0.0"
-)
-
-# Configurar CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Criar tabelas no banco de dados
-models.Base.metadata.create_all(bind=database.engine)
+# Rotas ficam no router; o app é montado por create_app() (ou no primeiro
+# acesso a app.app), de modo que importar este módulo não toca no banco
+router = APIRouter()
+
+# Esta API não tem login: as rotas /debug (admin no Flask) só existem com
+# ESCOLA_DEBUG_LOCAL=1 e só respondem a clientes da própria máquina
+DEBUG_LOCAL = os.environ.get("ESCOLA_DEBUG_LOCAL") == "1"
+LOCAL_HOSTS = ("127.0.0.1", "::1", "localhost")
+
+def local_only(request: Request):
+    if request.client is None or request.client.host not in LOCAL_HOSTS:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+debug_router = APIRouter(dependencies=[Depends(local_only)])
+
+# Hooks executados por create_app(), em ordem, recebendo o app
+STARTUP_HOOKS = []
+
+def startup_hook(func):
+    STARTUP_HOOKS.append(func)
+    return func
+
+@startup_hook
+def init_debug(app):
+    """Rotas de diagnóstico, só com ESCOLA_DEBUG_LOCAL=1"""
+    if DEBUG_LOCAL:
+        app.include_router(debug_router)
+
+@startup_hook
+def init_database(app):
+    """Criar tabelas e aplicar migrações (só quando o hash do esquema muda)"""
+    database.startup()
+
+@startup_hook
+def init_roster(app):
+    """Carregar o índice de alunos em memória (ESCOLA_ROSTER=1; escolas sob demanda)"""
+    if not tenancy.enabled():
+        roster.warm(database.get_read_session)
+
+def create_app():
+    """Application factory: monta o app FastAPI e executa os hooks de inicialização"""
+    app = FastAPI(
+        title="Sistema de Gestão Escolar API",
+        description="API para gerenciamento de alunos, turmas e matrículas",
+        version="1.0.0"
+    )
+    
+    # Registrado antes do tenant_middleware: roda dentro dele, já com a escola definida
+    app.middleware("http")(perf_middleware)
+    app.middleware("http")(tenant_middleware)
+    # Compressão negociada (gzip/brotli); rotas com @compression.no_compression ficam de fora
+    app.add_middleware(compression.CompressionMiddleware)
+    # CORS com lista de origens permitidas (ESCOLA_CORS_ORIGINS); o mais externo,
+    # para responder preflights sem passar pelo resto da pilha
+    app.add_middleware(cors.CORSMiddleware)
+    app.include_router(router)
+    for hook in STARTUP_HOOKS:
+        hook(app)
+    return app
+
+_default_app = None
+
+def get_app():
+    """App padrão do módulo, criado no primeiro uso"""
+    global _default_app
+    if _default_app is None:
+        _default_app = create_app()
+    return _default_app
+
+def __getattr__(name):
+    # `uvicorn app:app` continua funcionando, mas o app só é montado sob demanda
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Modo multi-escola: rotear cada requisição para o banco da escola do Host
+async def tenant_middleware(request: Request, call_next):
+    if not tenancy.enabled():
+        return await call_next(request)
+    tenant = tenancy.router.resolve(request.headers.get("host"))
+    if tenant is None and request.url.path != "/health":
+        return JSONResponse(status_code=404, content={"detail": "Escola não encontrada"})
+    token = tenancy.current_tenant.set(tenant)
+    try:
+        return await call_next(request)
+    finally:
+        tenancy.current_tenant.reset(token)
+
+# Perfil por amostragem (ESCOLA_PERFIL=1): trace de cada requisição
+async def perf_middleware(request: Request, call_next):
+    if not profiler.profiler.enabled or request.method == "OPTIONS":
+        return await call_next(request)
+    trace = profiler.profiler.begin(request.method, request.url.path, tenancy.current_tenant.get())
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        profiler.profiler.end(trace, status)
+
+async def coalesced_json(request: Request, compute):
+    """
+    JSON de compute() compartilhado entre GETs idênticos e simultâneos (mesma
+    rota, argumentos e escola). Roda em thread para que as requisições que
+    esperam não bloqueiem o event loop.
+    """
+    key = coalescing.request_key(
+        request.url.path, request.query_params.multi_items(), None, tenancy.current_tenant.get()
+    )
+
+    def serialize():
+        with profiler.profiler.profiled():
+            return json.dumps(compute(), ensure_ascii=False, separators=(",", ":")).encode()
+
+    body = await run_in_threadpool(coalescing.flight.do, key, serialize)
+    return Response(content=body, media_type="application/json")
 
 # =====================================================
 # SCHEMAS PYDANTIC SIMPLIFICADOS
@@ -47,6 +158,12 @@ class TurmaResponse(TurmaBase):
     class Config:
         orm_mode = True
 
+class TurmaListItem(TurmaResponse):
+    # Campos opcionais de ?include=
+    ocupacao: Optional[float] = None
+    alunos_count: Optional[int] = None
+    vagas: Optional[int] = None
+
 class AlunoBase(BaseModel):
     nome: str
     data_nascimento: date
@@ -68,11 +185,21 @@ class MatriculaCreate(BaseModel):
     aluno_id: int
     turma_id: int
 
+class MatriculaAuto(BaseModel):
+    politica: str = "equilibrar"
+    simular: bool = False
+    turmas: Optional[List[int]] = None
+    ordem: Optional[List[int]] = None
+
+class JobCreate(BaseModel):
+    tipo: str
+    parametros: Optional[dict] = None
+
 # =====================================================
 # ENDPOINTS DE SAÚDE
 # =====================================================
 
-@app.get("/health")
+@router.get("/health")
 async def health_check():
     """Endpoint de verificação de saúde da API"""
     return {
@@ -81,71 +208,76 @@ async def health_check():
         "timestamp": datetime.now().isoformat()
     }
 
+@debug_router.get("/debug/coalescencia")
+async def debug_coalescencia():
+    """Execuções, respostas compartilhadas e taxa de coalescência dos GETs"""
+    return coalescing.flight.metrics()
+
+@debug_router.get("/debug/consultas")
+async def debug_consultas(ordem: str = "total", limite: Optional[int] = Query(None, ge=1)):
+    """Consultas agregadas por fingerprint, com o plano das que passaram do limite"""
+    try:
+        return slow_queries.recorder.report(ordem, limite)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@debug_router.get("/debug/perf")
+async def debug_perf(formato: Optional[str] = None, id: Optional[int] = None):
+    """Últimos traces amostrados ou lentos (SQL e pilhas collapsed para flame graphs)"""
+    if formato == "texto":
+        return Response(content=profiler.profiler.collapsed(id), media_type="text/plain")
+    return await run_in_threadpool(profiler.profiler.snapshot)
+
+@debug_router.get("/debug/compressao")
+async def debug_compressao():
+    """Razão de compressão e custo de CPU por codificação"""
+    return compression.metrics.snapshot()
+
 # =====================================================
 # ENDPOINTS DE TURMAS
 # =====================================================
 
-@app.get("/turmas", response_model=List[TurmaResponse])
-async def get_turmas(db: Session = Depends(get_db)):
+@router.get("/turmas", response_model=List[TurmaListItem], response_model_exclude_none=True)
+async def get_turmas(
+    request: Request,
+    include: Optional[str] = Query(None, description="Campos extras: ocupacao,alunos_count,vagas"),
+    ordenar: Optional[str] = Query(None, description="Campo de ordenação (prefixo - para decrescente)"),
+    com_vagas: bool = Query(False, description="Apenas turmas com vagas"),
+    db: Session = Depends(get_read_db)
+):
     """Listar todas as turmas"""
-    turmas = db.query(models.Turma).all()
-    return turmas
+    try:
+        return await coalesced_json(
+            request, lambda: services.list_turmas(db, include=include, ordenar=ordenar, com_vagas=com_vagas)
+        )
+    except services.ServiceError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
-@app.post("/turmas", response_model=TurmaResponse)
+@router.post("/turmas", response_model=TurmaResponse)
 async def create_turma(turma: TurmaCreate, db: Session = Depends(get_db)):
     """Criar nova turma"""
     try:
-        # Verificar se já existe turma com o mesmo nome
-        existing_turma = db.query(models.Turma).filter(
-            models.Turma.nome == turma.nome
-        ).first()
-        
-        if existing_turma:
-            raise HTTPException(
-                status_code=400,
-                detail="Já existe uma turma com este nome"
-            )
-        
-        db_turma = models.Turma(**turma.dict())
-        db.add(db_turma)
-        db.commit()
-        db.refresh(db_turma)
-        
-        return db_turma
+        return services.create_turma(db, turma.nome, turma.capacidade)
         
+    except services.ServiceError as e:
+        db.rollback()
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
-@app.delete("/turmas/{turma_id}")
+@router.delete("/turmas/{turma_id}")
 async def delete_turma(turma_id: int, db: Session = Depends(get_db)):
     """Excluir turma"""
     try:
-        db_turma = db.query(models.Turma).filter(models.Turma.id == turma_id).first()
-        
-        if not db_turma:
-            raise HTTPException(status_code=404, detail="Turma não encontrada")
-        
-        # Verificar se há alunos matriculados
-        alunos_matriculados = db.query(models.Aluno).filter(
-            models.Aluno.turma_id == turma_id
-        ).count()
-        
-        if alunos_matriculados > 0:
-            raise HTTPException(
-                status_code=400,
-                detail="Não é possível excluir turma com alunos matriculados"
-            )
-        
-        db.delete(db_turma)
-        db.commit()
-        
+        services.delete_turma(db, turma_id)
         return {"message": "Turma excluída com sucesso"}
         
-    except HTTPException:
-        raise
+    except services.ServiceError as e:
+        db.rollback()
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
@@ -154,120 +286,64 @@ async def delete_turma(turma_id: int, db: Session = Depends(get_db)):
 # ENDPOINTS DE ALUNOS
 # =====================================================
 
-@app.get("/alunos", response_model=List[AlunoResponse])
+@router.get("/alunos", response_model=List[AlunoResponse])
 async def get_alunos(
+    request: Request,
     search: Optional[str] = Query(None, description="Buscar por nome"),
     turma_id: Optional[int] = Query(None, description="Filtrar por turma"),
     status: Optional[str] = Query(None, description="Filtrar por status"),
-    db: Session = Depends(get_db)
+    min_idade: Optional[int] = Query(None, ge=0, description="Idade mínima (anos completos)"),
+    max_idade: Optional[int] = Query(None, ge=0, description="Idade máxima (anos completos)"),
+    incluir_arquivados: bool = Query(False, description="Incluir alunos arquivados"),
+    format: str = Query("json", regex="^(json|columnar)$", description="json ou columnar"),
+    db: Session = Depends(get_read_db)
 ):
-    """Listar alunos com filtros opcionais"""
-    query = db.query(models.Aluno)
-    
-    # Filtro de busca por nome
-    if search:
-        query = query.filter(models.Aluno.nome.ilike(f"%{search}%"))
-    
-    # Filtro por turma
-    if turma_id:
-        query = query.filter(models.Aluno.turma_id == turma_id)
-    
-    # Filtro por status
-    if status:
-        query = query.filter(models.Aluno.status == status)
-    
-    alunos = query.all()
-    
-    # Adicionar nome da turma para cada aluno
-    result = []
-    for aluno in alunos:
-        aluno_dict = {
-            "id": aluno.id,
-            "nome": aluno.nome,
-            "data_nascimento": aluno.data_nascimento,
-            "email": aluno.email,
-            "status": aluno.status,
-            "turma_id": aluno.turma_id,
-            "turma_nome": None
-        }
-        
-        if aluno.turma_id:
-            turma = db.query(models.Turma).filter(models.Turma.id == aluno.turma_id).first()
-            if turma:
-                aluno_dict["turma_nome"] = turma.nome
-        
-        result.append(AlunoResponse(**aluno_dict))
-    
-    return result
+    """Listar alunos com filtros opcionais (?min_idade=10&max_idade=12; ?incluir_arquivados=1; ?format=columnar)"""
+    listar = services.list_alunos if format == "json" else services.list_alunos_columnar
+    try:
+        return await coalesced_json(request, lambda: listar(
+            db, search=search, turma_id=turma_id, status=status, min_idade=min_idade, max_idade=max_idade,
+            incluir_arquivados=incluir_arquivados
+        ))
+    except services.ServiceError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+@router.get("/alunos/changes")
+async def get_alunos_changes(
+    since: Optional[str] = Query(None, description="Token retornado pela sincronização anterior"),
+    db: Session = Depends(get_read_db)
+):
+    """Alunos inseridos/atualizados e ids excluídos desde um token de sincronização"""
+    try:
+        return services.alunos_changes(db, since)
+    except sync.InvalidTokenError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@app.post("/alunos", response_model=AlunoResponse)
+@router.post("/alunos", response_model=AlunoResponse)
 async def create_aluno(aluno: AlunoCreate, db: Session = Depends(get_db)):
     """Criar novo aluno"""
     try:
-        # Verificar se a turma existe (se fornecida)
-        if aluno.turma_id:
-            turma = db.query(models.Turma).filter(models.Turma.id == aluno.turma_id).first()
-            if not turma:
-                raise HTTPException(status_code=404, detail="Turma não encontrada")
-            
-            # Verificar capacidade da turma
-            alunos_na_turma = db.query(models.Aluno).filter(
-                models.Aluno.turma_id == aluno.turma_id
-            ).count()
-            
-            if alunos_na_turma >= turma.capacidade:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Turma já atingiu sua capacidade máxima"
-                )
-        
-        db_aluno = models.Aluno(**aluno.dict())
-        db.add(db_aluno)
-        db.commit()
-        db.refresh(db_aluno)
-        
-        # Retornar com nome da turma
-        result = {
-            "id": db_aluno.id,
-            "nome": db_aluno.nome,
-            "data_nascimento": db_aluno.data_nascimento,
-            "email": db_aluno.email,
-            "status": db_aluno.status,
-            "turma_id": db_aluno.turma_id,
-            "turma_nome": None
-        }
-        
-        if db_aluno.turma_id:
-            turma = db.query(models.Turma).filter(models.Turma.id == db_aluno.turma_id).first()
-            if turma:
-                result["turma_nome"] = turma.nome
-        
-        return AlunoResponse(**result)
+        return services.create_aluno(db, **aluno.dict())
         
+    except services.ServiceError as e:
+        db.rollback()
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
-    except HTTPException:
-        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
-@app.delete("/alunos/{aluno_id}")
+@router.delete("/alunos/{aluno_id}")
 async def delete_aluno(aluno_id: int, db: Session = Depends(get_db)):
     """Excluir aluno"""
     try:
-        db_aluno = db.query(models.Aluno).filter(models.Aluno.id == aluno_id).first()
-        
-        if not db_aluno:
-            raise HTTPException(status_code=404, detail="Aluno não encontrado")
-        
-        db.delete(db_aluno)
-        db.commit()
-        
+        services.delete_aluno(db, aluno_id)
         return {"message": "Aluno excluído com sucesso"}
         
-    except HTTPException:
-        raise
+    except services.ServiceError as e:
+        db.rollback()
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
@@ -276,49 +352,29 @@ async def delete_aluno(aluno_id: int, db: Session = Depends(get_db)):
 # ENDPOINTS DE MATRÍCULAS
 # =====================================================
 
-@app.post("/matriculas")
+@router.post("/matriculas")
 async def create_matricula(matricula: MatriculaCreate, db: Session = Depends(get_db)):
     """Matricular aluno em uma turma"""
     try:
-        # Verificar se o aluno existe
-        aluno = db.query(models.Aluno).filter(models.Aluno.id == matricula.aluno_id).first()
-        if not aluno:
-            raise HTTPException(status_code=404, detail="Aluno não encontrado")
-        
-        # Verificar se a turma existe
-        turma = db.query(models.Turma).filter(models.Turma.id == matricula.turma_id).first()
-        if not turma:
-            raise HTTPException(status_code=404, detail="Turma não encontrada")
-        
-        # Verificar se o aluno já está matriculado em alguma turma
-        if aluno.turma_id:
-            raise HTTPException(
-                status_code=400,
-                detail="Aluno já está matriculado em uma turma"
-            )
-        
-        # Verificar capacidade da turma
-        alunos_na_turma = db.query(models.Aluno).filter(
-            models.Aluno.turma_id == matricula.turma_id
-        ).count()
-        
-        if alunos_na_turma >= turma.capacidade:
-            raise HTTPException(
-                status_code=400,
-                detail="Turma já atingiu sua capacidade máxima"
-            )
-        
-        # Atualizar aluno
-        aluno.turma_id = matricula.turma_id
-        aluno.status = "ativo"  # Alterar status para ativo ao matricular
-        
-        db.commit()
-        db.refresh(aluno)
-        
+        services.matricular(db, matricula.aluno_id, matricula.turma_id)
         return {"message": "Aluno matriculado com sucesso"}
         
-    except HTTPException:
-        raise
+    except services.ServiceError as e:
+        db.rollback()
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+@router.post("/matriculas/auto")
+async def create_matriculas_auto(pedido: MatriculaAuto, db: Session = Depends(get_db)):
+    """Alocar todos os alunos sem turma nas turmas com vagas (simular: só a prévia)"""
+    try:
+        return services.matricular_automatico(db, pedido.politica, pedido.simular, pedido.turmas, pedido.ordem)
+        
+    except services.ServiceError as e:
+        db.rollback()
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
@@ -327,43 +383,75 @@ async def create_matricula(matricula: MatriculaCreate, db: Session = Depends(get
 # ENDPOINTS DE ESTATÍSTICAS
 # =====================================================
 
-@app.get("/estatisticas")
-async def get_estatisticas(db: Session = Depends(get_db)):
+@router.get("/estatisticas")
+async def get_estatisticas(request: Request, db: Session = Depends(get_read_db)):
     """Obter estatísticas gerais do sistema"""
     try:
-        total_alunos = db.query(models.Aluno).count()
-        alunos_ativos = db.query(models.Aluno).filter(models.Aluno.status == "ativo").count()
-        alunos_inativos = db.query(models.Aluno).filter(models.Aluno.status == "inativo").count()
-        total_turmas = db.query(models.Turma).count()
-        
-        # Estatísticas por turma
-        turmas_stats = []
-        turmas = db.query(models.Turma).all()
-        
-        for turma in turmas:
-            alunos_na_turma = db.query(models.Aluno).filter(
-                models.Aluno.turma_id == turma.id
-            ).count()
-            
-            turmas_stats.append({
-                "turma_id": turma.id,
-                "turma_nome": turma.nome,
-                "capacidade": turma.capacidade,
-                "ocupacao": alunos_na_turma,
-                "percentual_ocupacao": round((alunos_na_turma / turma.capacidade) * 100, 1) if turma.capacidade > 0 else 0
-            })
-        
-        return {
-            "total_alunos": total_alunos,
-            "alunos_ativos": alunos_ativos,
-            "alunos_inativos": alunos_inativos,
-            "total_turmas": total_turmas,
-            "turmas": turmas_stats
-        }
+        return await coalesced_json(request, lambda: services.estatisticas(db))
         
     except Exception as e:
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
-if __name__ == "__main__":
+@router.get("/estatisticas/idades")
+async def get_estatisticas_idades(request: Request, db: Session = Depends(get_read_db)):
+    """Histograma de idades por turma (calculado no banco)"""
+    return await coalesced_json(request, lambda: services.estatisticas_idades(db))
+
+# =====================================================
+# ENDPOINTS DE JOBS (TAREFAS EM SEGUNDO PLANO)
+# =====================================================
+
+@router.post("/jobs", status_code=202)
+async def create_job(job: JobCreate, db: Session = Depends(get_db)):
+    """Enfileirar uma tarefa lenta (importação, exportação, estatísticas)"""
+    import jobs  # importado sob demanda: só as rotas de jobs precisam dele
+    try:
+        db_job = jobs.enqueue(db, job.tipo, job.parametros)
+    except jobs.JobError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    jobs.ensure_worker_pool()
+    
+    result = jobs.job_to_dict(db_job)
+    result["url"] = f"/jobs/{db_job.id}"
+    return result
+
+def _job_anonimo(db, job_id):
+    """
+    Esta API não tem login: só expõe jobs criados por ela (sem usuário), nunca
+    os de usuários da API Flask que compartilham o banco
+    """
+    db_job = db.query(models.Job).filter(models.Job.id == job_id, models.Job.criado_por.is_(None)).first()
+    if not db_job:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return db_job
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: int, db: Session = Depends(get_read_db)):
+    """Consultar status e progresso de uma tarefa"""
+    import jobs
+    return jobs.job_to_dict(_job_anonimo(db, job_id))
+
+@router.get("/jobs/{job_id}/resultado")
+async def get_job_resultado(job_id: int, db: Session = Depends(get_read_db)):
+    """Baixar o resultado de uma tarefa concluída"""
+    db_job = _job_anonimo(db, job_id)
+    if db_job.status != "concluido":
+        raise HTTPException(status_code=409, detail="Job ainda não foi concluído")
+    
+    headers = {}
+    if db_job.resultado_tipo == "text/csv":
+        headers["Content-Disposition"] = f"attachment; filename=job_{db_job.id}.csv"
+    return Response(
+        content=db_job.resultado or "",
+        media_type=db_job.resultado_tipo or "application/json",
+        headers=headers
+    )
+
+def serve(host="0.0.0.0", port=8000):
+    """Inicia o servidor uvicorn"""
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(get_app(), host=host, port=port)
+
+if __name__ == "__main__":
+    serve()
@@ -1,64 +1,133 @@
 # Sistema de Gestão Escolar - Backend com Flask
 # Flask + SQLAlchemy + SQLite + Autenticação
 
-from flask import Flask, request, jsonify, session, send_from_directory
-from flask_session import Session
+from flask import Blueprint, Flask, current_app, request, jsonify, session, send_from_directory, Response, stream_with_context, g
 from sqlalchemy.orm import Session as DBSession
 from datetime import date, datetime
 from functools import wraps
+from concurrent.futures import TimeoutError as FutureTimeoutError
 import models
 import database
+import security
+import events
+import sync
+import services
+import compression
+import cors
+import coalescing
+import profiler
+import slow_queries
+import roster
+import login_buffer
+import tenancy
 import json
 import os
-
-# Inicializar Flask
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'escola-secret-key-2025'
-app.config['SESSION_TYPE'] = 'filesystem'
-app.config['SESSION_PERMANENT'] = False
-app.config['SESSION_USE_SIGNER'] = True
-app.config['SESSION_KEY_PREFIX'] = 'escola:'
-app.config['SESSION_COOKIE_SECURE'] = False  # Para desenvolvimento HTTP
-app.config['SESSION_COOKIE_HTTPONLY'] = True
-app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
-
-# Inicializar sessões
-Session(app)
-
-# Monkey patch para corrigir bug do Flask-Session/Python 3.13 (session_id como bytes)
-import flask_session.sessions as flask_sessions
-_orig_save_session = flask_sessions.FileSystemSessionInterface.save_session
-def patched_save_session(self, app, session, response):
-    # Garante que session.sid seja string
-    if hasattr(session, 'sid') and isinstance(session.sid, bytes):
-        session.sid = session.sid.decode('utf-8')
-    # Garante que session_id passado para set_cookie seja string
-    orig_set_cookie = response.set_cookie
-    def safe_set_cookie(key, value, *args, **kwargs):
-        if isinstance(value, bytes):
-            value = value.decode('utf-8')
-        return orig_set_cookie(key, value, *args, **kwargs)
-    response.set_cookie = safe_set_cookie
-    return _orig_save_session(self, app, session, response)
-flask_sessions.FileSystemSessionInterface.save_session = patched_save_session
-
-# Criar tabelas no banco de dados
-models.Base.metadata.create_all(bind=database.engine)
-
-# Adicionar headers CORS manualmente para garantir compatibilidade
-@app.after_request
+import threading
+
+# Rotas ficam no blueprint; o app é montado por create_app() (ou no primeiro
+# acesso a app_flask.app), de modo que importar este módulo não toca no banco
+bp = Blueprint('escola', __name__)
+
+DEFAULT_CONFIG = {
+    'SECRET_KEY': 'escola-secret-key-2025',
+    'SESSION_TYPE': 'filesystem',
+    'SESSION_PERMANENT': False,
+    'SESSION_USE_SIGNER': True,
+    'SESSION_KEY_PREFIX': 'escola:',
+    'SESSION_COOKIE_SECURE': False,  # Para desenvolvimento HTTP
+    'SESSION_COOKIE_HTTPONLY': True,
+    'SESSION_COOKIE_SAMESITE': 'Lax',
+}
+
+# Hooks executados por create_app(), em ordem, recebendo o app
+STARTUP_HOOKS = []
+
+def startup_hook(func):
+    STARTUP_HOOKS.append(func)
+    return func
+
+_flask_session_patched = False
+
+def _patch_flask_session():
+    """Monkey patch para corrigir bug do Flask-Session/Python 3.13 (session_id como bytes)"""
+    global _flask_session_patched
+    if _flask_session_patched:
+        return
+    import flask_session.sessions as flask_sessions
+    _orig_save_session = flask_sessions.FileSystemSessionInterface.save_session
+    def patched_save_session(self, app, session, response):
+        # Garante que session.sid seja string
+        if hasattr(session, 'sid') and isinstance(session.sid, bytes):
+            session.sid = session.sid.decode('utf-8')
+        # Garante que session_id passado para set_cookie seja string
+        orig_set_cookie = response.set_cookie
+        def safe_set_cookie(key, value, *args, **kwargs):
+            if isinstance(value, bytes):
+                value = value.decode('utf-8')
+            return orig_set_cookie(key, value, *args, **kwargs)
+        response.set_cookie = safe_set_cookie
+        return _orig_save_session(self, app, session, response)
+    flask_sessions.FileSystemSessionInterface.save_session = patched_save_session
+    _flask_session_patched = True
+
+@startup_hook
+def init_sessions(app):
+    """Inicializar sessões (Flask-Session em arquivos)"""
+    from flask_session import Session
+    _patch_flask_session()
+    Session(app)
+
+@startup_hook
+def init_database(app):
+    """Criar tabelas e aplicar migrações (só quando o hash do esquema muda)"""
+    database.startup()
+
+@startup_hook
+def init_roster(app):
+    """Carregar o índice de alunos em memória (ESCOLA_ROSTER=1; escolas sob demanda)"""
+    if not tenancy.enabled():
+        roster.warm(database.get_read_session)
+
+def create_app(config=None):
+    """Application factory: monta o app Flask e executa os hooks de inicialização"""
+    app = Flask(__name__)
+    app.config.update(DEFAULT_CONFIG)
+    if config:
+        app.config.update(config)
+    app.register_blueprint(bp)
+    for hook in STARTUP_HOOKS:
+        hook(app)
+    return app
+
+_default_app = None
+
+def get_app():
+    """App padrão do módulo, criado no primeiro uso"""
+    global _default_app
+    if _default_app is None:
+        _default_app = create_app()
+    return _default_app
+
+def __getattr__(name):
+    # `app_flask.app` (e `flask --app app_flask`) continua funcionando, mas sob demanda
+    if name == 'app':
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+@bp.after_app_request
+def compress_response(response):
+    """Compressão negociada (gzip/brotli) acima do tamanho mínimo"""
+    view = current_app.view_functions.get(request.endpoint)
+    return compression.compress_flask_response(response, request.headers.get('Accept-Encoding'), view)
+
+# Headers CORS pré-montados, só para origens da lista (cors.ALLOWED_ORIGINS)
+@bp.after_app_request
 def after_request(response):
-    origin = request.headers.get('Origin')
-    if origin:
-        response.headers.add('Access-Control-Allow-Origin', origin)
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,X-Requested-With')
-    response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
-    response.headers.add('Access-Control-Allow-Credentials', 'true')
-    # Expor Set-Cookie para ferramentas de debug no navegador
-    response.headers.add('Access-Control-Expose-Headers', 'Set-Cookie')
+    if request.method != 'OPTIONS':
+        response.headers.extend(cors.response_headers(request.headers.get('Origin')))
     return response
 
-@app.before_request
+@bp.before_app_request
 def before_request():
     # Log simples para debug de CORS e sessão
     try:
@@ -66,25 +135,56 @@ def before_request():
     except Exception:
         pass
     if request.method == 'OPTIONS':
-        response = jsonify({})
-        response.headers.add('Access-Control-Allow-Origin', request.headers.get('Origin', '*'))
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,X-Requested-With')
-        response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
-        response.headers.add('Access-Control-Allow-Credentials', 'true')
-        return response
+        # Preflight: 204 sem corpo, com Max-Age longo para o navegador reaproveitar
+        return Response(status=204, headers=cors.preflight_headers(request.headers.get('Origin')))
+    
+    # Modo multi-escola: rotear para o banco da escola (host ou sessão)
+    if tenancy.enabled() and _is_api_path(request.path):
+        session_tenant = session.get('tenant')
+        if request.path == '/auth/login' and request.is_json:
+            session_tenant = (request.get_json(silent=True) or {}).get('escola') or session_tenant
+        tenant = tenancy.router.resolve(request.host, session_tenant)
+        if tenant is None and request.path != '/health':
+            return jsonify({"detail": "Escola não encontrada"}), 404
+        g.tenant_token = tenancy.current_tenant.set(tenant)
+
+@bp.teardown_app_request
+def reset_tenant(exc):
+    token = g.pop('tenant_token', None)
+    if token is not None:
+        tenancy.current_tenant.reset(token)
+
+# Perfil por amostragem (ESCOLA_PERFIL=1): trace do início da requisição ao teardown
+@bp.before_app_request
+def perf_begin():
+    if profiler.profiler.enabled and request.method != 'OPTIONS':
+        rota = request.url_rule.rule if request.url_rule else request.path
+        g.perf_trace = profiler.profiler.begin(request.method, rota, tenancy.current_tenant.get())
+
+@bp.after_app_request
+def perf_status(response):
+    if 'perf_trace' in g:
+        g.perf_status = response.status_code
+    return response
+
+@bp.teardown_app_request
+def perf_end(exc):
+    trace = g.pop('perf_trace', None)
+    if trace is not None:
+        profiler.profiler.end(trace, g.pop('perf_status', 500))
 
 # =====================================================
 # ERRO HANDLERS (RETORNAR JSON PARA ROTAS DE API)
 # =====================================================
 
 API_PREFIXES = (
-    '/auth', '/alunos', '/turmas', '/matriculas', '/estatisticas', '/health', '/test-cors', '/debug'
+    '/auth', '/alunos', '/turmas', '/matriculas', '/estatisticas', '/jobs', '/events', '/health', '/test-cors', '/debug'
 )
 
 def _is_api_path(path: str) -> bool:
     return any(path.startswith(p) for p in API_PREFIXES)
 
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def handle_404(e):
     if _is_api_path(request.path):
         return jsonify({"detail": "Recurso não encontrado", "path": request.path}), 404
@@ -94,13 +194,13 @@ def handle_404(e):
     except Exception:
         return jsonify({"detail": "Not Found"}), 404
 
-@app.errorhandler(405)
+@bp.app_errorhandler(405)
 def handle_405(e):
     if _is_api_path(request.path):
         return jsonify({"detail": "Método não permitido", "path": request.path}), 405
     return jsonify({"detail": "Método não permitido"}), 405
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def handle_500(e):
     if _is_api_path(request.path):
         return jsonify({"detail": "Erro interno do servidor"}), 500
@@ -112,11 +212,11 @@ def handle_500(e):
 
 FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'frontend')
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
+@bp.route('/', defaults={'path': ''})
+@bp.route('/<path:path>')
 def serve_frontend(path):
     # Mapeia todos os caminhos não-API para arquivos do frontend
-    api_prefixes = ('auth/', 'alunos', 'turmas', 'matriculas', 'estatisticas', 'health', 'test-cors', 'debug/')
+    api_prefixes = ('auth/', 'alunos', 'turmas', 'matriculas', 'estatisticas', 'jobs', 'events', 'health', 'test-cors', 'debug/')
     if path.startswith(api_prefixes):
         return jsonify({'detail': 'Not Found'}), 404
     target = path or 'index.html'
@@ -130,7 +230,7 @@ def serve_frontend(path):
 # ENDPOINT DE DEBUG (DESENVOLVIMENTO)
 # =====================================================
 
-@app.route('/debug/session', methods=['GET'])
+@bp.route('/debug/session', methods=['GET'])
 def debug_session():
     try:
         info = {
@@ -143,23 +243,57 @@ def debug_session():
     except Exception:
         return jsonify({'error': 'debug failed'}), 500
 
+# Contadores para conferir que cada requisição abre no máximo uma sessão
+db_metrics = {"sessoes_abertas": 0, "reutilizacoes": 0}
+db_metrics_lock = threading.Lock()
+
+def _db_metrics_snapshot():
+    with db_metrics_lock:
+        return dict(db_metrics)
+
 def get_db():
-    """Função para obter sessão do banco de dados"""
-    db = database.SessionLocal()
-    try:
-        return db
-    finally:
-        pass  # Não fechar aqui, fechar manualmente
+    """
+    Sessão do banco da requisição atual (somente leitura em GET), aberta na
+    primeira chamada e reutilizada até o fim da requisição; close_db a libera.
+    """
+    db = g.get('db')
+    if db is None:
+        if request.method in ('GET', 'HEAD'):
+            db = database.get_read_session()
+        else:
+            db = database.get_session()
+        g.db = db
+        with db_metrics_lock:
+            db_metrics["sessoes_abertas"] += 1
+    else:
+        with db_metrics_lock:
+            db_metrics["reutilizacoes"] += 1
+    return db
+
+@bp.teardown_app_request
+def close_db(exc):
+    """Devolve a conexão ao pool ao fim da requisição (mesmo com erro ou return antecipado)"""
+    db = g.pop('db', None)
+    if db is not None:
+        if exc is not None:
+            db.rollback()
+        db.close()
 
 # =====================================================
 # DECORADORES DE AUTENTICAÇÃO
 # =====================================================
 
+def _session_valid():
+    """Sessão com usuário logado e (no modo multi-escola) da mesma escola da requisição"""
+    if 'user_id' not in session:
+        return False
+    return session.get('tenant') == tenancy.current_tenant.get()
+
 def login_required(f):
     """Decorator que exige que o usuário esteja logado"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
+        if not _session_valid():
             return jsonify({"detail": "Acesso não autorizado. Faça login primeiro."}), 401
         return f(*args, **kwargs)
     return decorated_function
@@ -168,37 +302,97 @@ def admin_required(f):
     """Decorator que exige que o usuário seja administrador"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
+        if not _session_valid():
             return jsonify({"detail": "Acesso não autorizado. Faça login primeiro."}), 401
         
         db = get_db()
-        try:
-            user = db.query(models.Usuario).filter(models.Usuario.id == session['user_id']).first()
-            if not user or user.tipo != 'admin':
-                return jsonify({"detail": "Acesso negado. Apenas administradores podem realizar esta ação."}), 403
-        finally:
-            db.close()
+        user = db.query(models.Usuario).filter(models.Usuario.id == session['user_id']).first()
+        if not user or user.tipo != 'admin':
+            return jsonify({"detail": "Acesso negado. Apenas administradores podem realizar esta ação."}), 403
         
         return f(*args, **kwargs)
     return decorated_function
 
+def coalesce(f):
+    """
+    Decorator de leitura: GETs idênticos e simultâneos (rota, argumentos,
+    papel e escola) compartilham uma execução, os bytes e os cabeçalhos da resposta
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = coalescing.request_key(
+            (request.endpoint, tuple(sorted(kwargs.items()))),
+            request.args.items(multi=True),
+            session.get('tipo'),
+            tenancy.current_tenant.get()
+        )
+
+        def compute():
+            response = current_app.make_response(f(*args, **kwargs))
+            # Cabeçalhos do handler (ETag, Cache-Control, Content-Disposition...) valem
+            # para todos; Set-Cookie é de uma sessão só e nunca é compartilhado
+            headers = [(name, value) for name, value in response.headers.items() if name.lower() != 'set-cookie']
+            return response.get_data(), response.status_code, headers
+
+        body, status, headers = coalescing.flight.do(key, compute)
+        return current_app.response_class(body, status=status, headers=headers)
+    return decorated_function
+
 def get_current_user():
     """Retorna o usuário atual da sessão"""
     if 'user_id' not in session:
         return None
     
     db = get_db()
+    user = db.query(models.Usuario).filter(models.Usuario.id == session['user_id']).first()
+    return user
+
+@bp.route('/debug/compressao', methods=['GET'])
+@admin_required
+def debug_compressao():
+    """Razão de compressão e custo de CPU por codificação"""
+    return jsonify(compression.metrics.snapshot())
+
+@bp.route('/debug/pool', methods=['GET'])
+@admin_required
+def debug_pool():
+    """Métricas de checkout dos pools de conexão"""
+    return jsonify({
+        "escrita": database.pool_metrics(database.engine),
+        "leitura": database.pool_metrics(database.read_engine),
+        "requisicoes": _db_metrics_snapshot()
+    })
+
+@bp.route('/debug/coalescencia', methods=['GET'])
+@admin_required
+def debug_coalescencia():
+    """Execuções, respostas compartilhadas e taxa de coalescência dos GETs"""
+    return jsonify(coalescing.flight.metrics())
+
+@bp.route('/debug/consultas', methods=['GET'])
+@admin_required
+def debug_consultas():
+    """Consultas agregadas por fingerprint, com o plano das que passaram do limite"""
     try:
-        user = db.query(models.Usuario).filter(models.Usuario.id == session['user_id']).first()
-        return user
-    finally:
-        db.close()
+        return jsonify(slow_queries.recorder.report(
+            request.args.get('ordem', 'total'), request.args.get('limite', type=int)
+        ))
+    except ValueError as e:
+        return jsonify({"detail": str(e)}), 400
+
+@bp.route('/debug/perf', methods=['GET'])
+@admin_required
+def debug_perf():
+    """Últimos traces amostrados ou lentos (SQL e pilhas collapsed para flame graphs)"""
+    if request.args.get('formato') == 'texto':
+        return Response(profiler.profiler.collapsed(request.args.get('id', type=int)), mimetype='text/plain')
+    return jsonify(profiler.profiler.snapshot())
 
 # =====================================================
 # ENDPOINTS DE AUTENTICAÇÃO
 # =====================================================
 
-@app.route('/auth/login', methods=['POST'])
+@bp.route('/auth/login', methods=['POST'])
 def login():
     """Endpoint de login"""
     try:
@@ -209,39 +403,55 @@ def login():
         if not username or not password:
             return jsonify({"detail": "Username e password são obrigatórios"}), 400
         
+        # Limite antes da consulta: usernames inexistentes também são limitados
+        try:
+            security.password_verifier.limit(username, request.remote_addr)
+        except security.RateLimitedError as e:
+            response = jsonify({"detail": "Muitas tentativas de login. Aguarde e tente novamente."})
+            response.headers['Retry-After'] = str(int(e.retry_after) + 1)
+            return response, 429
+        
         db = get_db()
+        user = db.query(models.Usuario).filter(
+            models.Usuario.username == username,
+            models.Usuario.ativo == True
+        ).first()
+        
+        # Verificar senha no pool limitado (fora da thread da requisição); usuário
+        # inexistente é verificado contra um hash fixo, no mesmo tempo
         try:
-            user = db.query(models.Usuario).filter(
-                models.Usuario.username == username,
-                models.Usuario.ativo == True
-            ).first()
-            
-            if not user or not user.check_password(password):
-                return jsonify({"detail": "Credenciais inválidas"}), 401
-            
-            # Atualizar último login
-            user.ultimo_login = datetime.utcnow()
+            valid = security.password_verifier.verify(password, user.password_hash if user else None)
+        except (security.PoolBusyError, FutureTimeoutError):
+            return jsonify({"detail": "Servidor ocupado. Tente novamente em instantes."}), 503
+        
+        if not user or not valid:
+            return jsonify({"detail": "Credenciais inválidas"}), 401
+        
+        # Regravar hash legado/desatualizado no formato atual
+        if user.needs_rehash:
+            user.set_password(password)
             db.commit()
-            
-            # Criar sessão
-            session['user_id'] = user.id
-            session['username'] = user.username
-            session['tipo'] = user.tipo
-            session['nome_completo'] = user.nome_completo
-            
-            return jsonify({
-                "message": "Login realizado com sucesso",
-                "user": {
-                    "id": user.id,
-                    "username": user.username,
-                    "nome_completo": user.nome_completo,
-                    "tipo": user.tipo,
-                    "is_admin": user.is_admin
-                }
-            })
-            
-        finally:
-            db.close()
+        
+        # Último login gravado em lote pelo login_buffer (sem lock de escrita aqui)
+        login_buffer.buffer.record(tenancy.current_tenant.get(), user.id, datetime.utcnow())
+        
+        # Criar sessão
+        session['user_id'] = user.id
+        session['username'] = user.username
+        session['tipo'] = user.tipo
+        session['nome_completo'] = user.nome_completo
+        session['tenant'] = tenancy.current_tenant.get()
+        
+        return jsonify({
+            "message": "Login realizado com sucesso",
+            "user": {
+                "id": user.id,
+                "username": user.username,
+                "nome_completo": user.nome_completo,
+                "tipo": user.tipo,
+                "is_admin": user.is_admin
+            }
+        })
             
     except Exception as e:
         import traceback
@@ -249,14 +459,14 @@ def login():
         traceback.print_exc()
         return jsonify({"detail": f"Erro interno do servidor: {str(e)}"}), 500
 
-@app.route('/auth/logout', methods=['POST'])
+@bp.route('/auth/logout', methods=['POST'])
 @login_required
 def logout():
     """Endpoint de logout"""
     session.clear()
     return jsonify({"message": "Logout realizado com sucesso"})
 
-@app.route('/auth/me', methods=['GET'])
+@bp.route('/auth/me', methods=['GET'])
 @login_required
 def get_current_user_info():
     """Retorna informações do usuário atual"""
@@ -264,6 +474,7 @@ def get_current_user_info():
     if not user:
         return jsonify({"detail": "Usuário não encontrado"}), 404
     
+    ultimo_login = login_buffer.buffer.latest(tenancy.current_tenant.get(), user.id, user.ultimo_login)
     return jsonify({
         "id": user.id,
         "username": user.username,
@@ -271,32 +482,31 @@ def get_current_user_info():
         "email": user.email,
         "tipo": user.tipo,
         "is_admin": user.is_admin,
-        "ultimo_login": user.ultimo_login.isoformat() if user.ultimo_login else None
+        "ultimo_login": ultimo_login.isoformat() if ultimo_login else None
     })
 
-@app.route('/auth/usuarios', methods=['GET'])
+@bp.route('/auth/usuarios', methods=['GET'])
 @admin_required
 def get_usuarios():
     """Listar todos os usuários (apenas admin)"""
     db = get_db()
-    try:
-        usuarios = db.query(models.Usuario).all()
-        result = []
-        for usuario in usuarios:
-            result.append({
-                "id": usuario.id,
-                "username": usuario.username,
-                "nome_completo": usuario.nome_completo,
-                "email": usuario.email,
-                "tipo": usuario.tipo,
-                "ativo": usuario.ativo,
-                "ultimo_login": usuario.ultimo_login.isoformat() if usuario.ultimo_login else None
-            })
-        return jsonify(result)
-    finally:
-        db.close()
+    usuarios = db.query(models.Usuario).all()
+    tenant = tenancy.current_tenant.get()
+    result = []
+    for usuario in usuarios:
+        ultimo_login = login_buffer.buffer.latest(tenant, usuario.id, usuario.ultimo_login)
+        result.append({
+            "id": usuario.id,
+            "username": usuario.username,
+            "nome_completo": usuario.nome_completo,
+            "email": usuario.email,
+            "tipo": usuario.tipo,
+            "ativo": usuario.ativo,
+            "ultimo_login": ultimo_login.isoformat() if ultimo_login else None
+        })
+    return jsonify(result)
 
-@app.route('/auth/usuarios', methods=['POST'])
+@bp.route('/auth/usuarios', methods=['POST'])
 @admin_required
 def create_usuario():
     print('[USUARIO CREATE] Requisição recebida:', request.json)
@@ -322,22 +532,19 @@ def create_usuario():
     try:
         db.add(usuario)
         db.commit()
-        user_id = usuario.id
-        db.close()
-        return jsonify({'message': 'Usuário (professor) criado com sucesso!', 'id': user_id}), 201
+        return jsonify({'message': 'Usuário (professor) criado com sucesso!', 'id': usuario.id}), 201
     except Exception as e:
         import traceback
         print('[USUARIO CREATE ERROR]', e)
         traceback.print_exc()
         db.rollback()
-        db.close()
         return jsonify({'message': f'Erro ao criar usuário: {str(e)}'}), 500
 
 # =====================================================
 # ENDPOINTS DE SAÚDE
 # =====================================================
 
-@app.route('/health', methods=['GET'])
+@bp.route('/health', methods=['GET'])
 def health_check():
     """Endpoint de verificação de saúde da API"""
     return jsonify({
@@ -350,7 +557,7 @@ def health_check():
         }
     })
 
-@app.route('/test-cors', methods=['GET', 'POST', 'OPTIONS'])
+@bp.route('/test-cors', methods=['GET', 'POST', 'OPTIONS'])
 def test_cors():
     """Endpoint para testar configuração CORS"""
     if request.method == 'OPTIONS':
@@ -367,306 +574,292 @@ def test_cors():
 # ENDPOINTS DE TURMAS
 # =====================================================
 
-@app.route('/turmas', methods=['GET'])
+@bp.route('/turmas', methods=['GET'])
 @login_required
+@coalesce
 def get_turmas():
-    """Listar todas as turmas"""
+    """Listar todas as turmas (?include=ocupacao,alunos_count,vagas&ordenar=-vagas&com_vagas=1)"""
     db = get_db()
     try:
-        turmas = db.query(models.Turma).all()
-        result = []
-        for turma in turmas:
-            result.append({
-                "id": turma.id,
-                "nome": turma.nome,
-                "capacidade": turma.capacidade
-            })
-        return jsonify(result)
-    finally:
-        db.close()
-
-@app.route('/turmas', methods=['POST'])
+        return jsonify(services.list_turmas(
+            db,
+            include=request.args.get('include'),
+            ordenar=request.args.get('ordenar'),
+            com_vagas=request.args.get('com_vagas', '').lower() in ('1', 'true', 'sim')
+        ))
+    except services.ServiceError as e:
+        return jsonify({"detail": e.detail}), e.status_code
+
+@bp.route('/turmas', methods=['POST'])
 @admin_required
 def create_turma():
     """Criar nova turma"""
     db = get_db()
     try:
         data = request.get_json()
+        result = services.create_turma(db, data['nome'], data['capacidade'])
+        return jsonify(result), 201
         
-        # Verificar se já existe turma com o mesmo nome
-        existing_turma = db.query(models.Turma).filter(
-            models.Turma.nome == data['nome']
-        ).first()
-        
-        if existing_turma:
-            return jsonify({"detail": "Já existe uma turma com este nome"}), 400
-        
-        turma = models.Turma(
-            nome=data['nome'],
-            capacidade=data['capacidade']
-        )
-        db.add(turma)
-        db.commit()
-        db.refresh(turma)
-        
-        return jsonify({
-            "id": turma.id,
-            "nome": turma.nome,
-            "capacidade": turma.capacidade
-        }), 201
-        
+    except services.ServiceError as e:
+        db.rollback()
+        return jsonify({"detail": e.detail}), e.status_code
     except Exception as e:
         db.rollback()
         return jsonify({"detail": "Erro interno do servidor"}), 500
-    finally:
-        db.close()
 
-@app.route('/turmas/<int:turma_id>', methods=['DELETE'])
+@bp.route('/turmas/<int:turma_id>', methods=['DELETE'])
 @admin_required
 def delete_turma(turma_id):
     """Excluir turma"""
     db = get_db()
     try:
-        turma = db.query(models.Turma).filter(models.Turma.id == turma_id).first()
-        
-        if not turma:
-            return jsonify({"detail": "Turma não encontrada"}), 404
-        
-        # Verificar se há alunos matriculados
-        alunos_matriculados = db.query(models.Aluno).filter(
-            models.Aluno.turma_id == turma_id
-        ).count()
-        
-        if alunos_matriculados > 0:
-            return jsonify({
-                "detail": "Não é possível excluir turma com alunos matriculados"
-            }), 400
-        
-        db.delete(turma)
-        db.commit()
-        
+        services.delete_turma(db, turma_id)
         return jsonify({"message": "Turma excluída com sucesso"})
         
+    except services.ServiceError as e:
+        db.rollback()
+        return jsonify({"detail": e.detail}), e.status_code
     except Exception as e:
         db.rollback()
         return jsonify({"detail": "Erro interno do servidor"}), 500
-    finally:
-        db.close()
 
 # =====================================================
 # ENDPOINTS DE ALUNOS
 # =====================================================
 
-@app.route('/alunos', methods=['GET'])
+@bp.route('/alunos', methods=['GET'])
 @login_required
+@coalesce
 def get_alunos():
-    """Listar alunos com filtros opcionais"""
+    """Listar alunos com filtros opcionais (?min_idade=10&max_idade=12; ?incluir_arquivados=1; ?format=columnar)"""
     db = get_db()
+    filtros = {
+        'search': request.args.get('search'),
+        'turma_id': request.args.get('turma_id'),
+        'status': request.args.get('status'),
+        'min_idade': request.args.get('min_idade'),
+        'max_idade': request.args.get('max_idade'),
+        'incluir_arquivados': request.args.get('incluir_arquivados', '').lower() in ('1', 'true', 'sim')
+    }
+    formato = request.args.get('format', 'json')
+    if formato not in ('json', 'columnar'):
+        return jsonify({"detail": "format deve ser json ou columnar"}), 400
     try:
-        query = db.query(models.Aluno)
-        
-        # Filtros opcionais
-        search = request.args.get('search')
-        turma_id = request.args.get('turma_id')
-        status = request.args.get('status')
-        
-        if search:
-            query = query.filter(models.Aluno.nome.ilike(f"%{search}%"))
-        
-        if turma_id:
-            query = query.filter(models.Aluno.turma_id == int(turma_id))
-        
-        if status:
-            query = query.filter(models.Aluno.status == status)
-        
-        alunos = query.all()
-        
-        # Adicionar nome da turma
-        result = []
-        for aluno in alunos:
-            aluno_dict = {
-                "id": aluno.id,
-                "nome": aluno.nome,
-                "data_nascimento": aluno.data_nascimento.isoformat(),
-                "email": aluno.email,
-                "status": aluno.status,
-                "turma_id": aluno.turma_id,
-                "turma_nome": None
-            }
-            
-            if aluno.turma_id:
-                turma = db.query(models.Turma).filter(models.Turma.id == aluno.turma_id).first()
-                if turma:
-                    aluno_dict["turma_nome"] = turma.nome
-            
-            result.append(aluno_dict)
-        
-        return jsonify(result)
-        
-    finally:
-        db.close()
+        if formato == 'json':
+            return jsonify(services.list_alunos(db, **filtros))
+        data = services.list_alunos_columnar(db, **filtros)
+    except services.ServiceError as e:
+        return jsonify({"detail": e.detail}), e.status_code
+    
+    body = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    return Response(body, mimetype='application/json')
 
-@app.route('/alunos', methods=['POST'])
+@bp.route('/alunos/changes', methods=['GET'])
+@login_required
+def get_alunos_changes():
+    """Alunos inseridos/atualizados e ids excluídos desde um token de sincronização"""
+    db = get_db()
+    try:
+        return jsonify(services.alunos_changes(db, request.args.get('since')))
+    except sync.InvalidTokenError as e:
+        return jsonify({"detail": str(e)}), 400
+
+@bp.route('/alunos', methods=['POST'])
 @admin_required
 def create_aluno():
     """Criar novo aluno"""
     db = get_db()
     try:
         data = request.get_json()
-        
-        # Converter string de data para objeto date
-        data_nascimento = datetime.strptime(data['data_nascimento'], '%Y-%m-%d').date()
-        
-        # Verificar se a turma existe (se fornecida)
-        if data.get('turma_id'):
-            turma = db.query(models.Turma).filter(models.Turma.id == data['turma_id']).first()
-            if not turma:
-                return jsonify({"detail": "Turma não encontrada"}), 404
-            
-            # Verificar capacidade da turma
-            alunos_na_turma = db.query(models.Aluno).filter(
-                models.Aluno.turma_id == data['turma_id']
-            ).count()
-            
-            if alunos_na_turma >= turma.capacidade:
-                return jsonify({
-                    "detail": "Turma já atingiu sua capacidade máxima"
-                }), 400
-        
-        aluno = models.Aluno(
+        result = services.create_aluno(
+            db,
             nome=data['nome'],
-            data_nascimento=data_nascimento,
-            email=data.get('email'),
+            data_nascimento=data['data_nascimento'],
             status=data['status'],
+            email=data.get('email'),
             turma_id=data.get('turma_id')
         )
-        
-        db.add(aluno)
-        db.commit()
-        db.refresh(aluno)
-        
-        # Retornar com nome da turma
-        result = {
-            "id": aluno.id,
-            "nome": aluno.nome,
-            "data_nascimento": aluno.data_nascimento.isoformat(),
-            "email": aluno.email,
-            "status": aluno.status,
-            "turma_id": aluno.turma_id,
-            "turma_nome": None
-        }
-        
-        if aluno.turma_id:
-            turma = db.query(models.Turma).filter(models.Turma.id == aluno.turma_id).first()
-            if turma:
-                result["turma_nome"] = turma.nome
-        
         return jsonify(result), 201
         
+    except services.ServiceError as e:
+        db.rollback()
+        return jsonify({"detail": e.detail}), e.status_code
     except Exception as e:
         db.rollback()
         return jsonify({"detail": "Erro interno do servidor"}), 500
-    finally:
-        db.close()
 
-@app.route('/alunos/<int:aluno_id>', methods=['DELETE'])
+@bp.route('/alunos/<int:aluno_id>', methods=['DELETE'])
 @admin_required
 def delete_aluno(aluno_id):
     """Excluir aluno"""
     db = get_db()
     try:
-        aluno = db.query(models.Aluno).filter(models.Aluno.id == aluno_id).first()
-        
-        if not aluno:
-            return jsonify({"detail": "Aluno não encontrado"}), 404
-        
-        db.delete(aluno)
-        db.commit()
-        
+        services.delete_aluno(db, aluno_id)
         return jsonify({"message": "Aluno excluído com sucesso"})
         
+    except services.ServiceError as e:
+        db.rollback()
+        return jsonify({"detail": e.detail}), e.status_code
     except Exception as e:
         db.rollback()
         return jsonify({"detail": "Erro interno do servidor"}), 500
-    finally:
-        db.close()
 
 # =====================================================
 # ENDPOINTS DE MATRÍCULAS
 # =====================================================
 
-@app.route('/matriculas', methods=['POST'])
+@bp.route('/matriculas', methods=['POST'])
 @admin_required
 def create_matricula():
     """Matricular aluno em uma turma"""
     db = get_db()
     try:
         data = request.get_json()
-        
-        # Verificar se o aluno existe
-        aluno = db.query(models.Aluno).filter(models.Aluno.id == data['aluno_id']).first()
-        if not aluno:
-            return jsonify({"detail": "Aluno não encontrado"}), 404
-        
-        # Verificar se a turma existe
-        turma = db.query(models.Turma).filter(models.Turma.id == data['turma_id']).first()
-        if not turma:
-            return jsonify({"detail": "Turma não encontrada"}), 404
-        
-        # Verificar se o aluno já está matriculado
-        if aluno.turma_id:
-            return jsonify({
-                "detail": "Aluno já está matriculado em uma turma"
-            }), 400
-        
-        # Verificar capacidade da turma
-        alunos_na_turma = db.query(models.Aluno).filter(
-            models.Aluno.turma_id == data['turma_id']
-        ).count()
-        
-        if alunos_na_turma >= turma.capacidade:
-            return jsonify({
-                "detail": "Turma já atingiu sua capacidade máxima"
-            }), 400
-        
-        # Atualizar aluno
-        aluno.turma_id = data['turma_id']
-        aluno.status = "ativo"
-        
-        db.commit()
-        
+        services.matricular(db, data['aluno_id'], data['turma_id'])
         return jsonify({"message": "Aluno matriculado com sucesso"})
         
+    except services.ServiceError as e:
+        db.rollback()
+        return jsonify({"detail": e.detail}), e.status_code
+    except Exception as e:
+        db.rollback()
+        return jsonify({"detail": "Erro interno do servidor"}), 500
+
+@bp.route('/matriculas/auto', methods=['POST'])
+@admin_required
+def create_matriculas_auto():
+    """Alocar todos os alunos sem turma nas turmas com vagas (simular: só a prévia)"""
+    db = get_db()
+    try:
+        data = request.get_json(silent=True) or {}
+        return jsonify(services.matricular_automatico(
+            db,
+            politica=data.get('politica', 'equilibrar'),
+            simular=bool(data.get('simular')),
+            turma_ids=data.get('turmas'),
+            ordem=data.get('ordem')
+        ))
+        
+    except services.ServiceError as e:
+        db.rollback()
+        return jsonify({"detail": e.detail}), e.status_code
     except Exception as e:
         db.rollback()
         return jsonify({"detail": "Erro interno do servidor"}), 500
-    finally:
-        db.close()
 
 # =====================================================
 # ENDPOINTS DE ESTATÍSTICAS
 # =====================================================
 
-@app.route('/estatisticas', methods=['GET'])
+@bp.route('/estatisticas', methods=['GET'])
 @login_required
+@coalesce
 def get_estatisticas():
     """Obter estatísticas gerais do sistema"""
     db = get_db()
     try:
-        total_alunos = db.query(models.Aluno).count()
-        alunos_ativos = db.query(models.Aluno).filter(models.Aluno.status == "ativo").count()
-        total_turmas = db.query(models.Turma).count()
+        return jsonify(services.estatisticas(db))
         
-        return jsonify({
-            "total_alunos": total_alunos,
-            "alunos_ativos": alunos_ativos,
-            "total_turmas": total_turmas
-        })
+    except Exception as e:
+        return jsonify({"detail": "Erro interno do servidor"}), 500
+
+@bp.route('/estatisticas/idades', methods=['GET'])
+@login_required
+@coalesce
+def get_estatisticas_idades():
+    """Histograma de idades por turma (calculado no banco)"""
+    db = get_db()
+    return jsonify(services.estatisticas_idades(db))
+
+# =====================================================
+# FEED DE MUDANÇAS (SERVER-SENT EVENTS)
+# =====================================================
+
+@bp.route('/events', methods=['GET'])
+@compression.no_compression
+@login_required
+def event_stream():
+    """Stream SSE com deltas de alunos e turmas"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_seen = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_seen = None
+    
+    bus = events.bus_for(tenancy.current_tenant.get())
+    response = Response(stream_with_context(bus.stream(last_seen)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# =====================================================
+# ENDPOINTS DE JOBS (TAREFAS EM SEGUNDO PLANO)
+# =====================================================
+
+@bp.route('/jobs', methods=['POST'])
+@admin_required
+def create_job():
+    """Enfileirar uma tarefa lenta (importação, exportação, estatísticas)"""
+    import jobs  # importado sob demanda: só as rotas de jobs precisam dele
+    db = get_db()
+    try:
+        data = request.get_json() or {}
+        try:
+            db_job = jobs.enqueue(db, data.get('tipo'), data.get('parametros'), session.get('user_id'))
+        except jobs.JobError as e:
+            return jsonify({"detail": str(e)}), 400
+        
+        jobs.ensure_worker_pool()
+        
+        result = jobs.job_to_dict(db_job)
+        result["url"] = f"/jobs/{db_job.id}"
+        return jsonify(result), 202
         
     except Exception as e:
+        db.rollback()
         return jsonify({"detail": "Erro interno do servidor"}), 500
-    finally:
-        db.close()
+
+def _job_do_usuario(db, job_id):
+    """Job visível para o usuário logado (quem criou ou um administrador): (job, None) ou (None, resposta de erro)"""
+    db_job = db.query(models.Job).filter(models.Job.id == job_id).first()
+    if not db_job:
+        return None, (jsonify({"detail": "Job não encontrado"}), 404)
+    if db_job.criado_por != session['user_id']:
+        user = db.query(models.Usuario).filter(models.Usuario.id == session['user_id']).first()
+        if not user or user.tipo != 'admin':
+            return None, (jsonify({"detail": "Acesso negado. Apenas quem criou o job ou administradores podem consultá-lo."}), 403)
+    return db_job, None
+
+@bp.route('/jobs/<int:job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    """Consultar status e progresso de uma tarefa"""
+    import jobs
+    db = get_db()
+    db_job, erro = _job_do_usuario(db, job_id)
+    if erro:
+        return erro
+    return jsonify(jobs.job_to_dict(db_job))
+
+@bp.route('/jobs/<int:job_id>/resultado', methods=['GET'])
+@login_required
+def get_job_resultado(job_id):
+    """Baixar o resultado de uma tarefa concluída"""
+    db = get_db()
+    db_job, erro = _job_do_usuario(db, job_id)
+    if erro:
+        return erro
+    if db_job.status != "concluido":
+        return jsonify({"detail": "Job ainda não foi concluído", "status": db_job.status}), 409
+    
+    response = current_app.response_class(db_job.resultado or '', mimetype=db_job.resultado_tipo or 'application/json')
+    if db_job.resultado_tipo == 'text/csv':
+        response.headers['Content-Disposition'] = f'attachment; filename=job_{db_job.id}.csv'
+    return response
+
+def serve(host="0.0.0.0", port=8000, debug=False):
+    """Inicia o servidor de desenvolvimento (multithread)"""
+    get_app().run(host=host, port=port, debug=debug, threaded=True)
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8000, debug=True)
+    serve(debug=True)
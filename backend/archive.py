@@ -0,0 +1,128 @@
+# Archive - Arquivamento de alunos inativos fora da tabela principal
+
+"""
+Alunos com status 'inativo' sem alteração há mais de ARQUIVO_DIAS dias saem
+de `alunos` para `alunos_arquivo`, em lotes de ARQUIVO_LOTE por transação
+(cada lote segura o lock de escrita só por alguns milissegundos). Assim a
+tabela principal, seus índices e o roster em memória ficam do tamanho do ano
+letivo corrente.
+
+Cada aluno arquivado ganha um tombstone em `exclusoes`, para que os clientes
+da sincronização incremental o removam da cópia local. Listagens e exportação
+incluem os arquivados com `incluir_arquivados` (services.list_alunos).
+
+`alunos.id` é AUTOINCREMENT (migração 0006): ids de alunos arquivados nunca
+são reaproveitados por alunos novos, mesmo depois de excluído o de maior id.
+
+Pode rodar pela fila de jobs (tipo "arquivar_alunos") ou pela linha de
+comando:
+    python archive.py --dias 365 --lote 500
+    python archive.py --simular
+"""
+
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import DateTime, bindparam, delete, func, insert, select
+
+import models
+
+ARQUIVO_DIAS = int(os.environ.get("ESCOLA_ARQUIVO_DIAS", 365))
+ARQUIVO_LOTE = int(os.environ.get("ESCOLA_ARQUIVO_LOTE", 500))
+
+Aluno = models.Aluno.__table__
+Arquivo = models.AlunoArquivo.__table__
+Exclusao = models.Exclusao.__table__
+
+COLUNAS = ["id", "nome", "data_nascimento", "email", "status", "turma_id", "data_cadastro", "data_atualizacao"]
+
+CANDIDATOS = select(Aluno.c.id).where(
+    Aluno.c.status == "inativo",
+    Aluno.c.data_atualizacao < bindparam("corte")
+).order_by(Aluno.c.id).limit(bindparam("lote"))
+CONTAR_CANDIDATOS = select(func.count()).select_from(Aluno).where(
+    Aluno.c.status == "inativo",
+    Aluno.c.data_atualizacao < bindparam("corte")
+)
+_IDS = bindparam("ids", expanding=True)
+COPIAR_PARA_ARQUIVO = insert(Arquivo).from_select(
+    COLUNAS + ["data_arquivamento"],
+    select(
+        *[Aluno.c[coluna] for coluna in COLUNAS], bindparam("agora", type_=DateTime).label("data_arquivamento")
+    ).where(Aluno.c.id.in_(_IDS))
+)
+REMOVER_ARQUIVADOS = delete(Aluno).where(Aluno.c.id.in_(_IDS))
+
+
+def archive_inactive(session_factory, dias=ARQUIVO_DIAS, lote=ARQUIVO_LOTE, agora=None, progresso=None):
+    """
+    Move os alunos inativos há mais de `dias` dias para alunos_arquivo, um
+    lote por transação. Retorna o total arquivado.
+    """
+    agora = agora or datetime.utcnow()
+    corte = agora - timedelta(days=dias)
+
+    db = session_factory()
+    try:
+        pendentes = db.execute(CONTAR_CANDIDATOS, {"corte": corte}).scalar()
+    finally:
+        db.close()
+
+    total = 0
+    while total < pendentes:
+        db = session_factory()
+        try:
+            ids = [row[0] for row in db.execute(CANDIDATOS, {"corte": corte, "lote": lote})]
+            if not ids:
+                break
+            db.execute(COPIAR_PARA_ARQUIVO, {"ids": ids, "agora": agora})
+            db.execute(REMOVER_ARQUIVADOS, {"ids": ids})
+            db.execute(insert(Exclusao), [
+                {"entidade": "aluno", "entidade_id": aluno_id, "data_exclusao": agora} for aluno_id in ids
+            ])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        total += len(ids)
+        if progresso:
+            progresso(total, pendentes)
+    return total
+
+
+def count_candidates(session_factory, dias=ARQUIVO_DIAS, agora=None):
+    """Quantos alunos seriam arquivados agora"""
+    corte = (agora or datetime.utcnow()) - timedelta(days=dias)
+    db = session_factory()
+    try:
+        return db.execute(CONTAR_CANDIDATOS, {"corte": corte}).scalar()
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Arquiva alunos inativos")
+    parser.add_argument("--dias", type=int, default=ARQUIVO_DIAS, help="Dias sem alteração para arquivar")
+    parser.add_argument("--lote", type=int, default=ARQUIVO_LOTE, help="Alunos por transação")
+    parser.add_argument("--simular", action="store_true", help="Só conta os alunos que seriam arquivados")
+    args = parser.parse_args(argv)
+
+    import database
+    import migrate
+    migrate.ensure_schema(database.engine)
+
+    if args.simular:
+        print(f"🔎 {count_candidates(database.SessionLocal, args.dias)} alunos seriam arquivados")
+        return
+    total = archive_inactive(
+        database.SessionLocal, args.dias, args.lote,
+        progresso=lambda feitos, pendentes: print(f"   {feitos}/{pendentes}")
+    )
+    print(f"🗄️  {total} alunos arquivados")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# Backup - Cópias online do banco com a API de backup do SQLite
+
+"""
+Copiar app.db com o app rodando bloqueia escritores ou gera uma cópia
+inconsistente. Aqui a cópia usa `sqlite3.Connection.backup` em passos de
+PAGINAS páginas com uma pausa entre eles, de modo que o I/O da cópia se
+intercala com o tráfego em vez de disputá-lo de uma vez.
+
+Com WAL, a leitura da origem não bloqueia escritores; em compensação, uma
+escrita de outra conexão durante a cópia faz o SQLite recomeçar do início.
+Depois de MAX_REINICIOS recomeços o restante é copiado em um único passo
+(que também não bloqueia escritores em WAL), para o backup sempre terminar.
+
+Cada cópia é gravada como <nome>-AAAAMMDD-HHMMSS.db em BACKUP_DIR, verificada
+com `PRAGMA integrity_check` e só então renomeada; as mais antigas além de
+MANTER são apagadas.
+
+A restauração verifica o snapshot, guarda uma cópia do banco atual e copia o
+snapshot para dentro do banco em uso (também pela API de backup, então as
+conexões abertas passam a ver o conteúdo restaurado). Os contadores de
+alteração são avançados para que os caches em memória (turma_cache, roster)
+recarreguem e os clientes da sincronização incremental recebam o conjunto
+completo.
+
+Uso:
+    python backup.py criar
+    python backup.py listar
+    python backup.py verificar backups/app-20250101-120000.db
+    python backup.py restaurar backups/app-20250101-120000.db
+Ou pela fila de jobs: POST /jobs {"tipo": "backup"}.
+"""
+
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+BACKUP_DIR = os.environ.get("ESCOLA_BACKUP_DIR", "backups")
+MANTER = int(os.environ.get("ESCOLA_BACKUP_MANTER", 7))
+PAGINAS = int(os.environ.get("ESCOLA_BACKUP_PAGINAS", 256))
+PAUSA = float(os.environ.get("ESCOLA_BACKUP_PAUSA", 0.005))
+MAX_REINICIOS = 3
+
+TABELAS_VERIFICADAS = ("usuarios", "turmas", "alunos")
+
+
+class BackupError(Exception):
+    pass
+
+
+def backup_dir_for(db_path, backup_dir=None):
+    """Diretório de snapshots (relativo ao diretório do banco)"""
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), backup_dir or BACKUP_DIR)
+
+
+class _Restarted(Exception):
+    pass
+
+
+def _copy(src, dst, paginas, pausa, progresso=None):
+    """Copia src para dst em passos pausados; retorna (passos, reinicios)"""
+    estado = {"passos": 0, "reinicios": 0, "restantes": None}
+
+    def on_step(status, remaining, total):
+        estado["passos"] += 1
+        # Sem avanço: a origem foi alterada e a cópia recomeçou
+        if estado["restantes"] is not None and remaining >= estado["restantes"]:
+            estado["reinicios"] += 1
+            if estado["reinicios"] >= MAX_REINICIOS:
+                raise _Restarted()
+        estado["restantes"] = remaining
+        if progresso:
+            progresso(total - remaining, total)
+        if pausa and remaining:
+            time.sleep(pausa)
+
+    try:
+        src.backup(dst, pages=paginas, progress=on_step)
+    except _Restarted:
+        # Escritas contínuas na origem: termina em um único passo
+        src.backup(dst, pages=-1)
+    return estado["passos"], estado["reinicios"]
+
+
+def verify(path):
+    """Integridade e contagens do snapshot; levanta BackupError se inválido"""
+    if not os.path.exists(path):
+        raise BackupError(f"Arquivo não encontrado: {path}")
+    conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    try:
+        resultado = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        if resultado != "ok":
+            raise BackupError(f"integrity_check falhou: {resultado}")
+        existentes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        faltando = [tabela for tabela in TABELAS_VERIFICADAS if tabela not in existentes]
+        if faltando:
+            raise BackupError(f"Tabelas ausentes: {', '.join(faltando)}")
+        return {
+            "arquivo": path,
+            "bytes": os.path.getsize(path),
+            "contagens": {
+                tabela: conn.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0]
+                for tabela in TABELAS_VERIFICADAS
+            },
+        }
+    finally:
+        conn.close()
+
+
+def create_backup(db_path, backup_dir=None, manter=MANTER, paginas=PAGINAS, pausa=PAUSA, progresso=None):
+    """Cria, verifica e rotaciona um snapshot (manter=None não rotaciona); retorna o resumo"""
+    destino_dir = backup_dir_for(db_path, backup_dir)
+    os.makedirs(destino_dir, exist_ok=True)
+    base = os.path.splitext(os.path.basename(db_path))[0]
+    carimbo = datetime.now().strftime("%Y%m%d-%H%M%S")
+    destino = os.path.join(destino_dir, f"{base}-{carimbo}.db")
+    sufixo = 1
+    while os.path.exists(destino):
+        destino = os.path.join(destino_dir, f"{base}-{carimbo}-{sufixo}.db")
+        sufixo += 1
+    temporario = destino + ".tmp"
+
+    inicio = time.perf_counter()
+    src = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+    dst = sqlite3.connect(temporario)
+    try:
+        passos, reinicios = _copy(src, dst, paginas, pausa, progresso)
+        # O snapshot herda o modo WAL da origem; como arquivo único é mais portátil
+        dst.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        dst.close()
+        src.close()
+
+    try:
+        resumo = verify(temporario)
+    except BackupError:
+        os.remove(temporario)
+        raise
+    os.replace(temporario, destino)
+    resumo.update({
+        "arquivo": destino,
+        "passos": passos,
+        "reinicios": reinicios,
+        "segundos": round(time.perf_counter() - inicio, 3),
+        "removidos": rotate(db_path, backup_dir, manter) if manter is not None else [],
+    })
+    return resumo
+
+
+def list_backups(db_path, backup_dir=None):
+    """Snapshots do banco, do mais recente para o mais antigo"""
+    destino_dir = backup_dir_for(db_path, backup_dir)
+    if not os.path.isdir(destino_dir):
+        return []
+    base = os.path.splitext(os.path.basename(db_path))[0]
+    nomes = [nome for nome in os.listdir(destino_dir) if nome.startswith(f"{base}-") and nome.endswith(".db")]
+    return [os.path.join(destino_dir, nome) for nome in sorted(nomes, reverse=True)]
+
+
+def rotate(db_path, backup_dir=None, manter=MANTER):
+    """Apaga os snapshots além dos `manter` mais recentes"""
+    removidos = []
+    for path in list_backups(db_path, backup_dir)[manter:]:
+        os.remove(path)
+        removidos.append(path)
+    return removidos
+
+
+def restore(snapshot, db_path, backup_dir=None):
+    """Restaura o snapshot no banco em uso, guardando antes uma cópia do atual"""
+    verify(snapshot)
+    # Sem rotação: o snapshot sendo restaurado pode ser o mais antigo
+    seguranca = create_backup(db_path, backup_dir, manter=None, pausa=0)
+
+    src = sqlite3.connect(f"file:{os.path.abspath(snapshot)}?mode=ro", uri=True)
+    dst = sqlite3.connect(db_path, timeout=30)
+    try:
+        contadores = _counters(dst)
+        src.backup(dst)
+        # Avança os contadores além dos valores vistos pelos caches dos processos
+        for nome, valor in contadores.items():
+            dst.execute("UPDATE contadores SET valor = ? WHERE nome = ?", (valor + 1, nome))
+        # Tokens de sincronização emitidos antes da restauração não valem mais (sync.py)
+        dst.execute(
+            "UPDATE contadores SET valor = (SELECT valor FROM contadores WHERE nome = 'sincronizacao') "
+            "WHERE nome = 'sincronizacao_corte'"
+        )
+        dst.commit()
+    finally:
+        dst.close()
+        src.close()
+    return {"restaurado": snapshot, "copia_anterior": seguranca["arquivo"]}
+
+
+def _counters(conn):
+    try:
+        return dict(conn.execute("SELECT nome, valor FROM contadores"))
+    except sqlite3.OperationalError:
+        return {}
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Backups online do banco")
+    parser.add_argument("--banco", help="Arquivo do banco (padrão: o de database.py)")
+    parser.add_argument("--diretorio", default=None, help=f"Diretório dos snapshots (padrão: {BACKUP_DIR})")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    criar = sub.add_parser("criar", help="Cria um snapshot e rotaciona os antigos")
+    criar.add_argument("--manter", type=int, default=MANTER)
+    criar.add_argument("--paginas", type=int, default=PAGINAS, help="Páginas por passo")
+    criar.add_argument("--pausa", type=float, default=PAUSA, help="Pausa entre passos (s)")
+    sub.add_parser("listar", help="Lista os snapshots")
+    verificar = sub.add_parser("verificar", help="Verifica a integridade de um snapshot")
+    verificar.add_argument("snapshot")
+    restaurar = sub.add_parser("restaurar", help="Restaura um snapshot no banco")
+    restaurar.add_argument("snapshot")
+    args = parser.parse_args(argv)
+
+    db_path = args.banco
+    if db_path is None:
+        import database
+        db_path = database.engine.url.database
+
+    try:
+        if args.comando == "criar":
+            resumo = create_backup(db_path, args.diretorio, args.manter, args.paginas, args.pausa)
+            print(f"💾 {resumo['arquivo']} ({resumo['bytes']} bytes, {resumo['passos']} passos, "
+                  f"{resumo['segundos']} s)")
+            for path in resumo["removidos"]:
+                print(f"   🗑️  {path}")
+        elif args.comando == "listar":
+            for path in list_backups(db_path, args.diretorio):
+                print(f"{path}  {os.path.getsize(path)} bytes")
+        elif args.comando == "verificar":
+            resumo = verify(args.snapshot)
+            print(f"✅ {args.snapshot}: {resumo['contagens']}")
+        else:
+            resumo = restore(args.snapshot, db_path, args.diretorio)
+            print(f"♻️  {resumo['restaurado']} restaurado (cópia anterior: {resumo['copia_anterior']})")
+    except BackupError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+# Benchmark - Mede os endpoints quentes nos dois backends (FastAPI e Flask)
+
+"""
+Cria um banco temporário com N alunos, chama os mesmos endpoints pelos
+clientes de teste de cada aplicação (sem rede) e também a camada de serviço
+diretamente, para separar o custo da consulta do custo do framework.
+
+Uso:
+    python benchmark.py --alunos 5000 --repeticoes 50
+    python benchmark.py --apenas flask
+    python benchmark.py --durante-backup   # repete as medições com backups em curso
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ENDPOINTS = [
+    ("GET /alunos", "/alunos"),
+    ("GET /alunos?status", "/alunos?status=ativo"),
+    ("GET /alunos?search", "/alunos?search=silva"),
+    ("GET /turmas", "/turmas"),
+    ("GET /estatisticas", "/estatisticas"),
+]
+
+
+def seed(n_alunos, n_turmas):
+    """Popula o banco temporário (já selecionado pelo diretório atual)"""
+    import database
+    import migrate
+    import models
+
+    migrate.ensure_schema(database.engine)
+    db = database.SessionLocal()
+    try:
+        admin = models.Usuario(username="admin", nome_completo="Admin", tipo="admin")
+        admin.set_password("admin123")
+        db.add(admin)
+        turmas = [models.Turma(nome=f"Turma {i}", capacidade=n_alunos) for i in range(n_turmas)]
+        db.add_all(turmas)
+        db.commit()
+
+        rng = random.Random(42)
+        sobrenomes = ["Silva", "Santos", "Costa", "Lima", "Souza", "Alves"]
+        db.bulk_insert_mappings(models.Aluno, [
+            {
+                "nome": f"Aluno {i} {rng.choice(sobrenomes)}",
+                "data_nascimento": date(2008, 1, 1) + timedelta(days=rng.randrange(3000)),
+                "status": rng.choice(["ativo", "inativo"]),
+                "turma_id": rng.choice(turmas).id if rng.random() < 0.8 else None,
+            }
+            for i in range(n_alunos)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def measure(func, repeticoes):
+    """Executa `func` e retorna (média, p95) em milissegundos"""
+    func()  # aquecimento
+    samples = []
+    for _ in range(repeticoes):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.mean(samples), samples[max(0, int(len(samples) * 0.95) - 1)]
+
+
+def flask_client():
+    import app_flask
+    client = app_flask.app.test_client()
+    response = client.post("/auth/login", json={"username": "admin", "password": "admin123"})
+    assert response.status_code == 200, response.json
+
+    def get(path):
+        response = client.get(path)
+        assert response.status_code == 200, (path, response.status_code)
+    return get
+
+
+def fastapi_client():
+    from fastapi.testclient import TestClient
+    import app
+    client = TestClient(app.app)
+
+    def get(path):
+        response = client.get(path)
+        assert response.status_code == 200, (path, response.status_code)
+    return get
+
+
+def services_client():
+    import database
+    import services
+
+    calls = {
+        "/alunos": lambda db: services.list_alunos(db),
+        "/alunos?status=ativo": lambda db: services.list_alunos(db, status="ativo"),
+        "/alunos?search=silva": lambda db: services.list_alunos(db, search="silva"),
+        "/turmas": lambda db: services.list_turmas(db),
+        "/estatisticas": lambda db: services.estatisticas(db),
+    }
+
+    def get(path):
+        db = database.SessionLocal()
+        try:
+            calls[path](db)
+        finally:
+            db.close()
+    return get
+
+
+def print_table(frontends, clients, repeticoes):
+    for label, path in ENDPOINTS:
+        row = f"{label:<22}"
+        for name, _ in frontends:
+            if name not in clients:
+                row += f"{'-':>22}"
+                continue
+            mean, p95 = measure(lambda: clients[name](path), repeticoes)
+            row += f"{f'{mean:.2f} / {p95:.2f}':>22}"
+        print(row)
+
+
+class BackupLoop(threading.Thread):
+    """Cria snapshots em sequência (backup.py) até ser parada"""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.parar = threading.Event()
+        self.duracoes = []
+
+    def run(self):
+        import backup
+        import database
+        while not self.parar.is_set():
+            resumo = backup.create_backup(database.engine.url.database, manter=1)
+            self.duracoes.append(resumo["segundos"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dos backends")
+    parser.add_argument("--alunos", type=int, default=2000)
+    parser.add_argument("--turmas", type=int, default=20)
+    parser.add_argument("--repeticoes", type=int, default=30)
+    parser.add_argument("--apenas", choices=["services", "flask", "fastapi"], action="append")
+    parser.add_argument("--durante-backup", action="store_true",
+                        help="Mede de novo com backups online rodando em paralelo")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="escola-bench-")
+    sys.path.insert(0, BACKEND_DIR)
+    # database.py usa um caminho relativo: o banco temporário fica no diretório atual
+    os.chdir(workdir)
+    # Evita que o limite de tentativas de login interfira nas medições
+    os.environ.setdefault("ESCOLA_LOGIN_BURST", "1000")
+    os.environ.setdefault("ESCOLA_LOGIN_IP_BURST", "1000")
+    try:
+        print(f"🌱 Populando banco temporário com {args.alunos} alunos...")
+        seed(args.alunos, args.turmas)
+
+        frontends = [("services", services_client), ("flask", flask_client), ("fastapi", fastapi_client)]
+        print(f"\n{'endpoint':<22}" + "".join(f"{name:>22}" for name, _ in frontends))
+        print(f"{'':<22}" + "".join(f"{'média / p95 (ms)':>22}" for _ in frontends))
+
+        clients = {}
+        for name, factory in frontends:
+            if args.apenas and name not in args.apenas:
+                continue
+            try:
+                clients[name] = factory()
+            except ImportError as e:
+                print(f"⚠️  {name} indisponível: {e}")
+
+        print_table(frontends, clients, args.repeticoes)
+
+        if args.durante_backup:
+            print("\n💾 Com backups online em paralelo:")
+            loop = BackupLoop()
+            loop.start()
+            try:
+                print_table(frontends, clients, args.repeticoes)
+            finally:
+                loop.parar.set()
+                loop.join()
+            if loop.duracoes:
+                print(f"   {len(loop.duracoes)} backups, {statistics.mean(loop.duracoes):.3f} s em média")
+    finally:
+        os.chdir(BACKEND_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# Coalescing - Requisições GET idênticas e simultâneas compartilham uma execução
+
+"""
+Quando o sinal toca, dezenas de professores abrem o painel ao mesmo tempo e
+disparam os mesmos GET /alunos, /turmas e /estatisticas. Com single-flight,
+a primeira requisição de cada chave (a "líder") executa o handler e as que
+chegarem enquanto ela roda esperam e recebem os mesmos bytes serializados,
+sem tocar no banco.
+
+A chave é (rota, argumentos normalizados, papel do usuário, escola), de modo
+que respostas nunca são compartilhadas entre escolas ou perfis diferentes.
+
+- Quem espera mais que WAIT_TIMEOUT segundos desiste e executa sozinho.
+- Se a líder falhar com exceção, cada espera executa o próprio handler.
+- Nada é guardado depois que a líder termina: não é um cache, e uma escrita
+  confirmada antes da requisição chegar sempre é vista.
+
+ESCOLA_COALESCENCIA=0 desliga; `metrics()` informa a taxa de coalescência.
+"""
+
+import os
+import threading
+
+ENABLED = os.environ.get("ESCOLA_COALESCENCIA", "1") != "0"
+WAIT_TIMEOUT = float(os.environ.get("ESCOLA_COALESCENCIA_TIMEOUT", 5))
+
+
+def request_key(rota, args, papel=None, tenant=None):
+    """Chave da requisição; argumentos vazios são ignorados e a ordem não importa"""
+    return (rota, tuple(sorted((k, v) for k, v in args if v != "")), papel, tenant)
+
+
+class _Call:
+    __slots__ = ("done", "result", "failed")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.failed = False
+
+
+class SingleFlight:
+    """Uma execução em andamento por chave; as demais esperam o resultado dela"""
+
+    def __init__(self, timeout=WAIT_TIMEOUT, enabled=ENABLED):
+        self.timeout = timeout
+        self.enabled = enabled
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._metrics = {"execucoes": 0, "compartilhadas": 0, "timeouts": 0, "falhas_lider": 0}
+
+    def do(self, key, func):
+        """Resultado de func() para a chave, compartilhado com chamadas simultâneas"""
+        if not self.enabled:
+            return func()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if leader:
+            try:
+                call.result = func()
+            except BaseException:
+                call.failed = True
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                    self._metrics["execucoes"] += 1
+                    if call.failed:
+                        self._metrics["falhas_lider"] += 1
+                call.done.set()
+            return call.result
+
+        if not call.done.wait(self.timeout):
+            with self._lock:
+                self._metrics["timeouts"] += 1
+            return self._run_alone(func)
+        if call.failed:
+            return self._run_alone(func)
+        with self._lock:
+            self._metrics["compartilhadas"] += 1
+        return call.result
+
+    def _run_alone(self, func):
+        result = func()
+        with self._lock:
+            self._metrics["execucoes"] += 1
+        return result
+
+    def metrics(self):
+        with self._lock:
+            result = dict(self._metrics)
+            result["em_andamento"] = len(self._calls)
+        total = result["execucoes"] + result["compartilhadas"]
+        result["taxa_coalescencia"] = round(result["compartilhadas"] / total, 3) if total else 0.0
+        result["timeout_s"] = self.timeout
+        result["habilitado"] = self.enabled
+        return result
+
+
+flight = SingleFlight()
@@ -0,0 +1,336 @@
+# Compression - Compressão negociada (gzip/brotli) das respostas dos dois backends
+
+"""
+Comprime as respostas quando o cliente anuncia suporte em Accept-Encoding:
+brotli se o módulo `brotli` (ou `brotlicffi`) estiver instalado, senão gzip.
+
+- Corpos menores que MIN_SIZE bytes não são comprimidos (o cabeçalho e o
+  custo de CPU não compensam).
+- Respostas em streaming (geradores, arquivos) são comprimidas por partes,
+  com flush a cada parte para não atrasar a entrega.
+- Só tipos textuais (JSON, CSV, HTML, JS...) são comprimidos.
+- Rotas marcadas com @no_compression (ex.: o feed SSE) ficam de fora.
+
+Cada resposta comprimida soma bytes de entrada/saída e o tempo de CPU da
+compressão em `metrics`, para ajustar MIN_SIZE e os níveis por implantação.
+"""
+
+import os
+import threading
+import time
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+ENABLED = os.environ.get("ESCOLA_COMPRESSAO", "1") != "0"
+MIN_SIZE = int(os.environ.get("ESCOLA_COMPRESSAO_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.environ.get("ESCOLA_GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("ESCOLA_BROTLI_QUALITY", 4))
+
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/javascript", "application/xml", "image/svg+xml"
+)
+# Ordem de preferência do servidor
+SUPPORTED = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def no_compression(func):
+    """Marca a rota para nunca ter a resposta comprimida"""
+    func.sem_compressao = True
+    return func
+
+
+def is_opted_out(view):
+    return getattr(view, "sem_compressao", False)
+
+
+def is_compressible(content_type):
+    return (content_type or "").startswith(COMPRESSIBLE_TYPES)
+
+
+def negotiate(accept_encoding):
+    """Codificação a usar ('br', 'gzip') conforme Accept-Encoding, ou None"""
+    aceitas = {}
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            aceitas[coding] = q
+    melhor, melhor_q = None, 0.0
+    for coding in SUPPORTED:
+        q = aceitas.get(coding, aceitas.get("*", 0.0))
+        if q > melhor_q:
+            melhor, melhor_q = coding, q
+    return melhor
+
+
+# =====================================================
+# COMPRESSORES
+# =====================================================
+
+class StreamCompressor:
+    """Compressor incremental: compress(parte) para cada parte e finish() no fim"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu = 0.0
+        if encoding == "br":
+            self._obj = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # wbits=31: formato gzip (cabeçalho + trailer)
+            self._obj = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def _measure(self, func, data=b""):
+        start = time.thread_time()
+        out = func(data) if data else func()
+        self.cpu += time.thread_time() - start
+        self.bytes_out += len(out)
+        return out
+
+    def compress(self, chunk, flush=True):
+        self.bytes_in += len(chunk)
+        if self.encoding == "br":
+            out = self._measure(self._obj.process, chunk)
+            if flush:
+                out += self._measure(self._obj.flush)
+            return out
+        out = self._measure(self._obj.compress, chunk)
+        if flush:
+            out += self._measure(lambda: self._obj.flush(zlib.Z_SYNC_FLUSH))
+        return out
+
+    def finish(self):
+        if self.encoding == "br":
+            out = self._measure(self._obj.finish)
+        else:
+            out = self._measure(self._obj.flush)
+        metrics.record(self.encoding, self.bytes_in, self.bytes_out, self.cpu)
+        return out
+
+
+def compress(body, encoding):
+    """Comprime um corpo completo e registra a métrica"""
+    compressor = StreamCompressor(encoding)
+    return compressor.compress(body, flush=False) + compressor.finish()
+
+
+# =====================================================
+# MÉTRICAS
+# =====================================================
+
+class CompressionMetrics:
+    """Razão de compressão e custo de CPU por codificação"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._por_codificacao = {}
+            self._ignoradas = {"pequena": 0, "opt_out": 0, "sem_suporte": 0, "ja_codificada": 0}
+
+    def record(self, encoding, bytes_in, bytes_out, cpu_seconds):
+        with self._lock:
+            stats = self._por_codificacao.setdefault(
+                encoding, {"respostas": 0, "bytes_originais": 0, "bytes_comprimidos": 0, "cpu_ms": 0.0}
+            )
+            stats["respostas"] += 1
+            stats["bytes_originais"] += bytes_in
+            stats["bytes_comprimidos"] += bytes_out
+            stats["cpu_ms"] += cpu_seconds * 1000
+
+    def skip(self, motivo):
+        with self._lock:
+            self._ignoradas[motivo] += 1
+
+    def snapshot(self):
+        with self._lock:
+            result = {"min_size": MIN_SIZE, "codificacoes": list(SUPPORTED), "ignoradas": dict(self._ignoradas)}
+            por_codificacao = {}
+            for encoding, stats in self._por_codificacao.items():
+                stats = dict(stats)
+                originais = stats["bytes_originais"]
+                stats["razao"] = round(stats["bytes_comprimidos"] / originais, 3) if originais else None
+                stats["cpu_ms_por_mb"] = round(stats["cpu_ms"] / (originais / 1e6), 2) if originais else None
+                stats["cpu_ms"] = round(stats["cpu_ms"], 3)
+                por_codificacao[encoding] = stats
+            result["por_codificacao"] = por_codificacao
+            return result
+
+
+metrics = CompressionMetrics()
+
+
+# =====================================================
+# FLASK
+# =====================================================
+
+def compress_flask_response(response, accept_encoding, view=None):
+    """Hook after_request do Flask: comprime a resposta se compensar"""
+    if not ENABLED or response.status_code < 200 or response.status_code in (204, 206, 304):
+        return response
+    if not is_compressible(response.mimetype):
+        return response
+    response.vary.add("Accept-Encoding")
+    if "Content-Encoding" in response.headers:
+        metrics.skip("ja_codificada")
+        return response
+    if view is not None and is_opted_out(view):
+        metrics.skip("opt_out")
+        return response
+    encoding = negotiate(accept_encoding)
+    if encoding is None:
+        metrics.skip("sem_suporte")
+        return response
+
+    if response.is_streamed or response.direct_passthrough:
+        compressor = StreamCompressor(encoding)
+        source = response.response
+
+        def generate():
+            try:
+                for chunk in source:
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode(response.charset or "utf-8")
+                    if chunk:
+                        yield compressor.compress(chunk)
+                yield compressor.finish()
+            finally:
+                if hasattr(source, "close"):
+                    source.close()
+
+        response.direct_passthrough = False
+        response.response = generate()
+        response.headers.pop("Content-Length", None)
+    else:
+        body = response.get_data()
+        if len(body) < MIN_SIZE:
+            metrics.skip("pequena")
+            return response
+        response.set_data(compress(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    # O conteúdo muda com a codificação: ETag forte deixaria de valer
+    if response.get_etag()[0]:
+        response.set_etag(response.get_etag()[0], weak=True)
+    return response
+
+
+# =====================================================
+# ASGI (FASTAPI)
+# =====================================================
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI. A rota é conhecida quando a resposta começa (o roteador
+    grava o endpoint no scope), então @no_compression também vale aqui.
+    """
+
+    def __init__(self, app, min_size=None):
+        self.app = app
+        self.min_size = MIN_SIZE if min_size is None else min_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+        encoding = negotiate(accept)
+
+        state = {"start": None, "compressor": None, "passthrough": False, "buffer": []}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # Status, tipo, opt-out e codificação já são conhecidos aqui: quem
+                # não vai ser comprimido sai direto, sem acumular (ex.: SSE)
+                headers = list(message["headers"])
+                header_names = {k.lower() for k, _ in headers}
+                content_type = next((v.decode("latin-1") for k, v in headers if k.lower() == b"content-type"), "")
+                motivo = None
+                if message["status"] < 200 or message["status"] in (204, 206, 304) or not is_compressible(content_type):
+                    motivo = "tipo"
+                elif b"content-encoding" in header_names:
+                    motivo = "ja_codificada"
+                elif is_opted_out(scope.get("endpoint")):
+                    motivo = "opt_out"
+                elif encoding is None:
+                    motivo = "sem_suporte"
+                if motivo is None:
+                    state["start"] = dict(message, headers=headers)
+                    return
+                if motivo != "tipo":
+                    metrics.skip(motivo)
+                    if b"vary" not in header_names:
+                        message = dict(message, headers=headers + [(b"vary", b"Accept-Encoding")])
+                state["passthrough"] = True
+                await send(message)
+                return
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if state["compressor"] is not None:
+                compressor = state["compressor"]
+                out = compressor.compress(body) if body else b""
+                if not more:
+                    out += compressor.finish()
+                await send({"type": "http.response.body", "body": out, "more_body": more})
+                return
+
+            # Acumula até MIN_SIZE (ou o fim) antes de decidir: middlewares como
+            # BaseHTTPMiddleware entregam qualquer corpo em partes
+            state["buffer"].append(body)
+            buffered = sum(len(part) for part in state["buffer"])
+            if more and buffered < self.min_size:
+                return
+            body = b"".join(state["buffer"])
+            state["buffer"] = []
+
+            start = state["start"]
+            headers = start["headers"]
+            if not more and len(body) < self.min_size:
+                metrics.skip("pequena")
+                if b"vary" not in {k.lower() for k, _ in headers}:
+                    start["headers"] = headers + [(b"vary", b"Accept-Encoding")]
+                state["passthrough"] = True
+                await send(start)
+                await send({"type": "http.response.body", "body": body, "more_body": False})
+                return
+
+            headers = [(k, v) for k, v in headers if k.lower() != b"content-length"]
+            headers += [(b"content-encoding", encoding.encode()), (b"vary", b"Accept-Encoding")]
+            if not more:
+                out = compress(body, encoding)
+                headers.append((b"content-length", str(len(out)).encode()))
+                start["headers"] = headers
+                await send(start)
+                await send({"type": "http.response.body", "body": out, "more_body": False})
+                return
+
+            compressor = state["compressor"] = StreamCompressor(encoding)
+            start["headers"] = headers
+            await send(start)
+            await send({"type": "http.response.body", "body": compressor.compress(body), "more_body": True})
+
+        await self.app(scope, receive, send_wrapper)
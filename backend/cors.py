@@ -0,0 +1,113 @@
+# CORS - Origens permitidas e cabeçalhos pré-montados para os dois backends
+
+"""
+Só origens da lista ESCOLA_CORS_ORIGINS (separadas por vírgula) recebem os
+cabeçalhos CORS; as demais não têm a origem refletida e o navegador bloqueia
+a resposta. A lista vira um frozenset na importação e os blocos de
+cabeçalhos são montados uma única vez: por requisição resta apenas um teste
+de pertinência e a cópia da tupla.
+
+Os preflights (OPTIONS) respondem 204 com Access-Control-Max-Age longo, de
+modo que o navegador reaproveita a permissão em vez de repetir o preflight
+antes de cada POST/DELETE do frontend servido em outra origem.
+
+ESCOLA_CORS_ORIGINS=* volta a aceitar qualquer origem (apenas desenvolvimento).
+"""
+
+import os
+
+DEFAULT_ORIGINS = "http://localhost:3000,http://127.0.0.1:3000,http://localhost:8000,http://127.0.0.1:8000"
+
+ALLOWED_ORIGINS = frozenset(
+    origin.strip().rstrip("/")
+    for origin in os.environ.get("ESCOLA_CORS_ORIGINS", DEFAULT_ORIGINS).split(",")
+    if origin.strip()
+)
+ALLOW_ANY = "*" in ALLOWED_ORIGINS
+# Navegadores limitam o valor (Chromium: 2h, Firefox: 24h)
+MAX_AGE = int(os.environ.get("ESCOLA_CORS_MAX_AGE", 86400))
+
+ALLOW_METHODS = "GET,PUT,POST,DELETE,OPTIONS"
+ALLOW_HEADERS = "Content-Type,Authorization,X-Requested-With,Last-Event-ID"
+
+PREFLIGHT_HEADERS = (
+    ("Access-Control-Allow-Methods", ALLOW_METHODS),
+    ("Access-Control-Allow-Headers", ALLOW_HEADERS),
+    ("Access-Control-Allow-Credentials", "true"),
+    ("Access-Control-Max-Age", str(MAX_AGE)),
+    ("Vary", "Origin"),
+)
+RESPONSE_HEADERS = (
+    ("Access-Control-Allow-Credentials", "true"),
+    # Expor Set-Cookie para ferramentas de debug no navegador
+    ("Access-Control-Expose-Headers", "Set-Cookie"),
+    ("Vary", "Origin"),
+)
+VARY_ONLY = (("Vary", "Origin"),)
+
+_RAW_PREFLIGHT = tuple((k.lower().encode(), v.encode()) for k, v in PREFLIGHT_HEADERS)
+_RAW_RESPONSE = tuple((k.lower().encode(), v.encode()) for k, v in RESPONSE_HEADERS)
+
+
+def is_allowed(origin):
+    return bool(origin) and (ALLOW_ANY or origin in ALLOWED_ORIGINS)
+
+
+def preflight_headers(origin):
+    """Cabeçalhos do preflight para a origem (só Vary se não permitida)"""
+    if not is_allowed(origin):
+        return VARY_ONLY
+    return (("Access-Control-Allow-Origin", origin),) + PREFLIGHT_HEADERS
+
+
+def response_headers(origin):
+    """Cabeçalhos CORS de uma resposta comum"""
+    if not origin:
+        return ()
+    if not is_allowed(origin):
+        return VARY_ONLY
+    return (("Access-Control-Allow-Origin", origin),) + RESPONSE_HEADERS
+
+
+class CORSMiddleware:
+    """Middleware ASGI com a mesma lista de origens e os mesmos blocos de cabeçalhos"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin = None
+        preflight = False
+        for name, value in scope.get("headers", []):
+            if name == b"origin":
+                origin = value.decode("latin-1")
+            elif name == b"access-control-request-method":
+                preflight = True
+
+        if scope["method"] == "OPTIONS" and origin and preflight:
+            headers = [(b"vary", b"Origin")]
+            if is_allowed(origin):
+                headers = [(b"access-control-allow-origin", origin.encode("latin-1"))] + list(_RAW_PREFLIGHT)
+            await send({"type": "http.response.start", "status": 204, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if not origin:
+            await self.app(scope, receive, send)
+            return
+
+        if is_allowed(origin):
+            extra = [(b"access-control-allow-origin", origin.encode("latin-1"))] + list(_RAW_RESPONSE)
+        else:
+            extra = [(b"vary", b"Origin")]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + extra
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,33 +1,180 @@
 # Database - Configuração do SQLAlchemy e SQLite
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import QueuePool
 import os
+import threading
+import time
+import weakref
+
+import slow_queries
 
 # Configuração do banco de dados SQLite
 SQLALCHEMY_DATABASE_URL = "sqlite:///./app.db"
 
+# Pool de leitura separado (somente leitura) para as rotas GET
+READ_POOL_SIZE = int(os.environ.get("ESCOLA_READ_POOL_SIZE", 5))
+READ_MAX_OVERFLOW = int(os.environ.get("ESCOLA_READ_MAX_OVERFLOW", 10))
+# Cada sessão de leitura enxerga um snapshot único (transação de leitura explícita)
+READ_SNAPSHOT = os.environ.get("ESCOLA_READ_SNAPSHOT") == "1"
+
+def enable_wal(engine):
+    """Ativa WAL para que leitores não esperem pelo escritor"""
+    @event.listens_for(engine, "connect")
+    def _set_wal(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+
+# Métricas de checkout por engine (contagem, conexões em uso, tempo de uso)
+_pool_metrics = weakref.WeakKeyDictionary()
+
+def instrument_pool(engine):
+    """Registra eventos de checkout/checkin do pool do engine"""
+    metrics = {"checkouts": 0, "em_uso": 0, "pico_em_uso": 0, "tempo_total_ms": 0.0, "tempo_max_ms": 0.0}
+    lock = threading.Lock()
+    _pool_metrics[engine] = (metrics, lock)
+    
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checkout_em"] = time.perf_counter()
+        with lock:
+            metrics["checkouts"] += 1
+            metrics["em_uso"] += 1
+            metrics["pico_em_uso"] = max(metrics["pico_em_uso"], metrics["em_uso"])
+    
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        inicio = connection_record.info.pop("checkout_em", None)
+        if inicio is None:
+            return
+        duracao = (time.perf_counter() - inicio) * 1000
+        with lock:
+            metrics["em_uso"] -= 1
+            metrics["tempo_total_ms"] += duracao
+            metrics["tempo_max_ms"] = max(metrics["tempo_max_ms"], duracao)
+
+def pool_metrics(engine):
+    """Cópia das métricas de checkout do engine"""
+    metrics, lock = _pool_metrics[engine]
+    with lock:
+        result = dict(metrics)
+    result["tempo_medio_ms"] = round(result["tempo_total_ms"] / result["checkouts"], 3) if result["checkouts"] else 0.0
+    result["tempo_total_ms"] = round(result["tempo_total_ms"], 3)
+    result["tempo_max_ms"] = round(result["tempo_max_ms"], 3)
+    result["pool"] = engine.pool.status()
+    return result
+
+def read_only_url(path):
+    """URL SQLite aberta com mode=ro"""
+    return f"sqlite:///file:{os.path.abspath(path)}?mode=ro&uri=true"
+
+def create_read_engine(url, pool_size=READ_POOL_SIZE, max_overflow=READ_MAX_OVERFLOW, snapshot=READ_SNAPSHOT):
+    """Engine somente leitura com pool próprio"""
+    read_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow
+    )
+    
+    @event.listens_for(read_engine, "connect")
+    def _set_query_only(dbapi_connection, connection_record):
+        # Transações controladas pelo evento "begin" abaixo
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    
+    instrument_pool(read_engine)
+    slow_queries.recorder.attach(read_engine)
+    if snapshot:
+        @event.listens_for(read_engine, "begin")
+        def _begin_snapshot(conn):
+            conn.exec_driver_sql("BEGIN")
+    
+    return read_engine
+
 # Criar engine do SQLAlchemy
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, 
     connect_args={"check_same_thread": False},  # Necessário para SQLite
     echo=False  # Set to True for SQL query logging during development
 )
+enable_wal(engine)
+instrument_pool(engine)
+# Log de consultas lentas (ESCOLA_CONSULTAS_LENTAS=1)
+slow_queries.recorder.attach(engine)
+
+# Engine de leitura: abre o mesmo arquivo em modo somente leitura
+read_engine = create_read_engine(read_only_url(engine.url.database))
 
 # Criar SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 # Base class para os models
 Base = declarative_base()
 
+# Sessão roteada para o banco da escola atual (modo multi-escola)
+def get_session():
+    """
+    Retorna uma nova sessão no banco da escola da requisição atual,
+    ou no banco padrão quando o modo multi-escola está desligado
+    """
+    import tenancy
+    tenant = tenancy.current_tenant.get()
+    if tenant is None or not tenancy.enabled():
+        return SessionLocal()
+    return tenancy.router.session(tenant)
+
+# Sessão somente leitura (pool separado), roteada como get_session
+def get_read_session():
+    """
+    Retorna uma nova sessão no pool somente leitura do banco da escola atual
+    """
+    import tenancy
+    tenant = tenancy.current_tenant.get()
+    if tenant is None or not tenancy.enabled():
+        return ReadSessionLocal()
+    return tenancy.router.read_session(tenant)
+
+# Dependency para rotas somente leitura
+def get_read_db():
+    """
+    Dependency que fornece uma sessão do pool de leitura
+    e garante que ela seja fechada após o uso
+    """
+    db = get_read_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def startup():
+    """
+    Hook de inicialização dos apps: garante o esquema (verificação completa só
+    quando o hash muda) e liga a captura de consultas, se configurada
+    """
+    import migrate
+    migrate.ensure_schema(engine)
+    
+    # Captura das consultas executadas para o index_advisor (desligada por padrão)
+    if os.environ.get("ESCOLA_CAPTURA_CONSULTAS"):
+        import index_advisor
+        index_advisor.capture_to_file(os.environ["ESCOLA_CAPTURA_CONSULTAS"], [engine, read_engine])
+
 # Dependency para obter sessão do banco de dados
 def get_db():
     """
     Dependency que fornece uma sessão do banco de dados
     e garante que ela seja fechada após o uso
     """
-    db = SessionLocal()
+    db = get_session()
     try:
         yield db
     finally:
@@ -56,5 +203,6 @@ def get_database_info():
     return {
         "database_url": SQLALCHEMY_DATABASE_URL,
         "database_exists": database_exists(),
-        "engine_info": str(engine.url)
+        "engine_info": str(engine.url),
+        "read_engine_info": str(read_engine.url)
     }
@@ -0,0 +1,103 @@
+# Events - Pub/sub em processo para o feed de mudanças (Server-Sent Events)
+
+"""
+Os handlers de escrita publicam deltas compactos (aluno criado, excluído ou
+matriculado; turma criada ou excluída) em um único buffer circular
+compartilhado. Cada cliente SSE apenas guarda o número do último evento que
+leu, de modo que a entrega para N clientes não copia o evento N vezes: todos
+leem do mesmo buffer, acordados por uma única Condition.
+
+Clientes que reconectam com o cabeçalho Last-Event-ID recebem os eventos
+perdidos enquanto eles ainda estiverem no buffer; se ficaram para trás demais
+recebem um evento `resync` e devem recarregar as listas.
+"""
+
+import json
+import threading
+from collections import deque
+
+BUFFER_SIZE = 1024
+KEEPALIVE_SECONDS = 15
+
+
+class EventBus:
+    """Buffer circular de eventos com numeração monotônica"""
+
+    def __init__(self, size=BUFFER_SIZE):
+        self._events = deque(maxlen=size)
+        self._last_id = 0
+        self._cond = threading.Condition()
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def publish(self, tipo, data):
+        """Publica um evento e acorda todos os assinantes"""
+        with self._cond:
+            self._last_id += 1
+            payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+            self._events.append((self._last_id, tipo, payload))
+            self._cond.notify_all()
+        return self._last_id
+
+    def read_since(self, last_seen, timeout):
+        """
+        Retorna os eventos posteriores a `last_seen`, esperando até `timeout`
+        segundos por novidades. Retorna None se `last_seen` já saiu do buffer.
+        """
+        with self._cond:
+            if self._last_id <= last_seen:
+                self._cond.wait(timeout)
+            if not self._events or self._last_id <= last_seen:
+                return []
+            oldest = self._events[0][0]
+            if last_seen < oldest - 1:
+                return None
+            return [event for event in self._events if event[0] > last_seen]
+
+    def stream(self, last_seen=None, keepalive=KEEPALIVE_SECONDS):
+        """Gerador de mensagens no formato text/event-stream"""
+        if last_seen is None:
+            last_seen = self._last_id
+        yield f"retry: 3000\nid: {last_seen}\nevent: hello\ndata: {{}}\n\n"
+        if last_seen > self._last_id:
+            # Numeração reiniciada (servidor reiniciou): o cliente deve recarregar
+            last_seen = self._last_id
+            yield f"id: {last_seen}\nevent: resync\ndata: {{}}\n\n"
+        while True:
+            events = self.read_since(last_seen, keepalive)
+            if events is None:
+                last_seen = self._last_id
+                yield f"id: {last_seen}\nevent: resync\ndata: {{}}\n\n"
+                continue
+            if not events:
+                yield ": keepalive\n\n"
+                continue
+            for event_id, tipo, payload in events:
+                yield f"id: {event_id}\nevent: {tipo}\ndata: {payload}\n\n"
+            last_seen = events[-1][0]
+
+
+bus = EventBus()
+
+# Um barramento por escola no modo multi-escola
+_tenant_buses = {}
+_tenant_lock = threading.Lock()
+
+
+def bus_for(tenant):
+    """Barramento da escola (ou o padrão quando tenant é None)"""
+    if tenant is None:
+        return bus
+    with _tenant_lock:
+        tenant_bus = _tenant_buses.get(tenant)
+        if tenant_bus is None:
+            tenant_bus = _tenant_buses[tenant] = EventBus()
+        return tenant_bus
+
+
+def publish(tipo, data):
+    """Publica no barramento da escola da requisição atual"""
+    import tenancy
+    return bus_for(tenancy.current_tenant.get()).publish(tipo, data)
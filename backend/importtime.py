@@ -0,0 +1,99 @@
+# Import Time - Mede o custo de importar os backends e verifica o orçamento
+
+"""
+Importa cada módulo em um processo novo com `python -X importtime`, em um
+diretório temporário vazio, e falha (código de saída 1) se:
+  - o tempo cumulativo de importação (menor de N execuções) passar do orçamento
+  - a importação criar o banco de dados (o esquema só deve ser verificado em
+    create_app(), não ao importar o módulo)
+
+Uso:
+    python importtime.py
+    python importtime.py --orcamento app_flask=400 --repeticoes 5
+"""
+
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Orçamento em milissegundos (cumulativo, inclui Flask/FastAPI/SQLAlchemy)
+DEFAULT_BUDGETS = {
+    "app_flask": 600,
+    "app": 800,
+}
+
+LINE_PATTERN = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def measure(module, workdir):
+    """Retorna (cumulativo_ms, [(self_ms, nome)]) de uma importação"""
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=workdir, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Falha ao importar {module}:\n{result.stderr[-2000:]}")
+
+    cumulative = None
+    modules = []
+    for line in result.stderr.splitlines():
+        match = LINE_PATTERN.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        modules.append((int(self_us) / 1000, name))
+        if name == module and len(indent) == 1:
+            cumulative = int(cumulative_us) / 1000
+    return cumulative, modules
+
+
+def check(module, budget, repeticoes, top):
+    workdir = tempfile.mkdtemp(prefix="escola-importtime-")
+    try:
+        runs = [measure(module, workdir) for _ in range(repeticoes)]
+        created = [name for name in os.listdir(workdir) if name.endswith(".db")]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    best, modules = min(runs, key=lambda run: run[0])
+    ok = best <= budget and not created
+    print(f"{'✅' if ok else '❌'} {module}: {best:.1f} ms (orçamento {budget} ms)")
+    for self_ms, name in sorted(modules, reverse=True)[:top]:
+        print(f"     {self_ms:8.1f} ms  {name}")
+    if created:
+        print(f"   ❌ a importação criou {', '.join(created)}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Orçamento de tempo de importação dos backends")
+    parser.add_argument("--orcamento", action="append", default=[], metavar="MODULO=MS",
+                        help="Sobrescreve o orçamento de um módulo")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5, help="Módulos mais lentos a listar")
+    args = parser.parse_args(argv)
+
+    budgets = dict(DEFAULT_BUDGETS)
+    for item in args.orcamento:
+        module, _, ms = item.partition("=")
+        budgets[module] = float(ms)
+
+    results = []
+    for module, budget in budgets.items():
+        try:
+            results.append(check(module, budget, args.repeticoes, args.top))
+        except RuntimeError as e:
+            print(f"⚠️  {e}")
+            results.append(False)
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+# Index Advisor - Sugere índices a partir das consultas realmente executadas
+
+"""
+Captura o formato (SQL com parâmetros `?`) de cada consulta executada pelos
+engines, roda `EXPLAIN QUERY PLAN` em cada uma com os parâmetros de uma
+execução real e aponta as varreduras completas (SCAN) e ordenações em
+B-tree temporária. Para tabelas varridas com filtros, sugere um índice
+simples ou composto (colunas de igualdade primeiro, depois a primeira de
+intervalo) que ainda não exista, e pode gravá-los como migração.
+
+A carga vem de uma de duas fontes:
+  - um arquivo gravado pelos apps com ESCOLA_CAPTURA_CONSULTAS=<arquivo.json>
+  - uma carga sintética (--carga) contra um banco temporário populado
+
+Uso:
+    python index_advisor.py --carga
+    python index_advisor.py --entrada consultas.json --gerar-migracao
+"""
+
+import argparse
+import atexit
+import json
+import os
+import re
+import sys
+import threading
+
+from sqlalchemy import event
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SCAN_PATTERN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?")
+# tabela.coluna <operador>; igualdade entra primeiro no índice, intervalo por último
+PREDICATE_PATTERN = re.compile(
+    r"\b(\w+)\.(\w+)\s*(=|>=|<=|<>|!=|>|<|IS NOT NULL|IS NULL|IN\b)", re.IGNORECASE
+)
+EQUALITY_OPERATORS = {"=", "IS NULL", "IN"}
+RANGE_OPERATORS = {">=", "<=", ">", "<", "IS NOT NULL"}
+
+
+class QueryCapture:
+    """Registra formatos de consulta distintos executados pelos engines"""
+
+    def __init__(self):
+        self.shapes = {}
+        self._lock = threading.Lock()
+
+    def attach(self, engine):
+        event.listen(engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+        if verb not in ("SELECT", "UPDATE", "DELETE"):
+            return
+        shape = " ".join(statement.split())
+        if "schema_migrations" in shape:
+            return
+        with self._lock:
+            entry = self.shapes.get(shape)
+            if entry is None:
+                # Guarda os parâmetros da primeira execução para o EXPLAIN
+                params = list(parameters[0] if executemany else parameters or ())
+                self.shapes[shape] = entry = {"sql": shape, "parametros": params, "execucoes": 0}
+            entry["execucoes"] += 1
+
+    def to_list(self):
+        with self._lock:
+            return sorted(self.shapes.values(), key=lambda entry: -entry["execucoes"])
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_list(), f, ensure_ascii=False, indent=2, default=str)
+
+
+def capture_to_file(path, engines):
+    """Captura as consultas dos engines e grava o arquivo ao encerrar o processo"""
+    capture = QueryCapture()
+    for engine in engines:
+        capture.attach(engine)
+    atexit.register(capture.dump, path)
+    return capture
+
+
+# =====================================================
+# ANÁLISE
+# =====================================================
+
+def explain(conn, sql, parametros):
+    """Linhas de detalhe do EXPLAIN QUERY PLAN"""
+    cursor = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", tuple(parametros))
+    return [row[-1] for row in cursor]
+
+
+def existing_indexes(conn, table):
+    """Listas de colunas dos índices existentes da tabela"""
+    result = []
+    for index in conn.exec_driver_sql(f"PRAGMA index_list('{table}')").fetchall():
+        columns = [row[2] for row in conn.exec_driver_sql(f"PRAGMA index_info('{index[1]}')")]
+        result.append(columns)
+    return result
+
+
+def candidate_columns(sql, table):
+    """Colunas de `table` usadas no WHERE, na ordem de um índice composto"""
+    parts = re.split(r"\bWHERE\b", sql, maxsplit=1, flags=re.IGNORECASE)
+    if len(parts) == 1:
+        return []
+    equality, ranges = [], []
+    for match in PREDICATE_PATTERN.finditer(parts[1]):
+        tabela, coluna, operador = match.group(1), match.group(2), match.group(3).upper()
+        if tabela != table:
+            continue
+        if operador in EQUALITY_OPERATORS and coluna not in equality:
+            equality.append(coluna)
+        elif operador in RANGE_OPERATORS and coluna not in ranges:
+            ranges.append(coluna)
+    return equality + [coluna for coluna in ranges[:1] if coluna not in equality]
+
+
+def _covered(columns, indexes):
+    return any(index[:len(columns)] == columns for index in indexes)
+
+
+def analyze(engine, shapes):
+    """
+    Retorna (relatorio, sugestoes): uma entrada por consulta com varredura
+    completa ou B-tree temporária, e os índices sugeridos {(tabela, colunas)}.
+    """
+    relatorio = []
+    sugestoes = {}
+    with engine.connect() as conn:
+        for shape in shapes:
+            try:
+                plano = explain(conn, shape["sql"], shape["parametros"])
+            except Exception as e:
+                relatorio.append({**shape, "erro": str(e)})
+                continue
+
+            # (tabela, nome usado no SQL): o ORM pode usar aliases como alunos_1
+            scans = [(match.group(1), match.group(2) or match.group(1))
+                     for match in map(SCAN_PATTERN.match, plano) if match]
+            temp = [linha for linha in plano if linha.startswith("USE TEMP B-TREE")]
+            if not scans and not temp:
+                continue
+
+            entry = {**shape, "plano": plano, "varreduras": [table for table, _ in scans], "sugestoes": []}
+            for table, alias in scans:
+                columns = candidate_columns(shape["sql"], alias)
+                if not columns or _covered(columns, existing_indexes(conn, table)):
+                    continue
+                key = (table, tuple(columns))
+                sugestoes[key] = sugestoes.get(key, 0) + shape["execucoes"]
+                entry["sugestoes"].append(index_name(table, columns))
+            relatorio.append(entry)
+    return relatorio, sugestoes
+
+
+def index_name(table, columns):
+    return f"ix_{table}_{'_'.join(columns)}"
+
+
+def create_index_sql(table, columns):
+    return f"CREATE INDEX IF NOT EXISTS {index_name(table, columns)} ON {table} ({', '.join(columns)})"
+
+
+def print_report(relatorio, sugestoes):
+    if not relatorio:
+        print("✅ Nenhuma varredura completa nas consultas capturadas")
+    for entry in relatorio:
+        print(f"\n[{entry['execucoes']}x] {entry['sql']}")
+        if "erro" in entry:
+            print(f"   ⚠️  EXPLAIN falhou: {entry['erro']}")
+            continue
+        for linha in entry["plano"]:
+            print(f"   {linha}")
+        if entry["varreduras"] and not entry["sugestoes"]:
+            print("   ↳ varredura sem filtro indexável (lista completa ou LIKE '%...%')")
+        for nome in entry["sugestoes"]:
+            print(f"   💡 {nome}")
+
+    if sugestoes:
+        print("\nÍndices sugeridos (por execuções afetadas):")
+        for (table, columns), execucoes in sorted(sugestoes.items(), key=lambda item: -item[1]):
+            print(f"   {create_index_sql(table, list(columns))};  -- {execucoes} execuções")
+
+
+# =====================================================
+# CARGA SINTÉTICA
+# =====================================================
+
+# Requisições representativas das telas do frontend
+WORKLOAD = [
+    ("get", "/alunos", None),
+    ("get", "/alunos?status=ativo", None),
+    ("get", "/alunos?turma_id=1", None),
+    ("get", "/alunos?search=silva", None),
+    ("get", "/alunos/changes?since=0", None),
+    ("get", "/turmas", None),
+    ("get", "/estatisticas", None),
+    ("post", "/alunos", {"nome": "Aluno Carga", "data_nascimento": "2012-03-04", "status": "inativo"}),
+    ("post", "/matriculas", {"aluno_id": 1, "turma_id": 2}),
+    ("post", "/turmas", {"nome": "Turma Carga", "capacidade": 10}),
+    ("delete", "/turmas/1", None),
+    ("get", "/auth/me", None),
+]
+
+
+def run_workload(alunos, turmas):
+    """Popula um banco temporário e executa WORKLOAD pelo app Flask"""
+    import benchmark
+    import database
+
+    capture = QueryCapture()
+    benchmark.seed(alunos, turmas)
+    capture.attach(database.engine)
+    capture.attach(database.read_engine)
+
+    import app_flask
+    import migrate
+    migrate.upgrade(database.engine)
+    client = app_flask.app.test_client()
+    client.post("/auth/login", json={"username": "admin", "password": "admin123"})
+    for method, path, body in WORKLOAD:
+        getattr(client, method)(path, json=body)
+    return capture.to_list()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sugere índices a partir da carga real de consultas")
+    fonte = parser.add_mutually_exclusive_group(required=True)
+    fonte.add_argument("--entrada", help="Arquivo JSON gravado com ESCOLA_CAPTURA_CONSULTAS")
+    fonte.add_argument("--carga", action="store_true", help="Executa a carga sintética em um banco temporário")
+    parser.add_argument("--alunos", type=int, default=2000)
+    parser.add_argument("--turmas", type=int, default=20)
+    parser.add_argument("--gerar-migracao", action="store_true", help="Grava os índices sugeridos em migrations/")
+    args = parser.parse_args(argv)
+
+    import shutil
+    import tempfile
+    sys.path.insert(0, BACKEND_DIR)
+    workdir = None
+    try:
+        if args.carga:
+            workdir = tempfile.mkdtemp(prefix="escola-advisor-")
+            # database.py usa caminho relativo: o banco temporário fica no diretório atual
+            os.chdir(workdir)
+            os.environ.setdefault("ESCOLA_LOGIN_BURST", "1000")
+            os.environ.setdefault("ESCOLA_LOGIN_IP_BURST", "1000")
+            print(f"🌱 Executando carga sintética com {args.alunos} alunos...")
+            shapes = run_workload(args.alunos, args.turmas)
+        else:
+            with open(args.entrada, encoding="utf-8") as f:
+                shapes = json.load(f)
+
+        import database
+        relatorio, sugestoes = analyze(database.engine, shapes)
+        print_report(relatorio, sugestoes)
+
+        if args.gerar_migracao and sugestoes:
+            import migrate
+            statements = [create_index_sql(table, list(columns)) for table, columns in sugestoes]
+            path = migrate.write_migration(
+                "indices sugeridos",
+                statements,
+                "Índices sugeridos pelo index_advisor a partir da carga de consultas"
+            )
+            print(f"\n📝 Migração gravada em {path}")
+    finally:
+        if workdir:
+            os.chdir(BACKEND_DIR)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+# Jobs - Fila de tarefas em segundo plano persistida no SQLite
+
+"""
+Operações lentas (importação, exportação, recálculo de estatísticas) são
+gravadas na tabela `jobs` e executadas por um pool de processos worker, sem
+ocupar a thread da requisição nem sua conexão com o banco.
+
+Os workers podem ser iniciados pela própria aplicação (sob demanda, no
+primeiro POST /jobs) ou separadamente:
+
+    python jobs.py worker --processes 2
+
+Com ESCOLA_JOBS_EXTERNAL=1 a aplicação não inicia workers próprios.
+
+Um job fica em "executando" se o worker morrer no meio dele. Ao iniciar e a
+cada ciclo da fila, o worker marca como erro os jobs em execução cujo
+processo (`worker_pid`) não existe mais ou que começaram há mais de
+ESCOLA_JOBS_LEASE segundos. Não são reenfileirados: uma importação
+interrompida já gravou parte dos lotes e rodar de novo duplicaria alunos.
+Se um worker além do prazo ainda terminar, o resultado dele prevalece.
+"""
+
+import atexit
+import csv
+import io
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+import archive
+import backup
+import database
+import migrate
+import models
+import services
+import tenancy
+import turma_cache
+
+POLL_INTERVAL = float(os.environ.get("ESCOLA_JOBS_POLL", 0.5))
+DEFAULT_PROCESSES = int(os.environ.get("ESCOLA_JOBS_PROCESSES", 2))
+IMPORT_BATCH_SIZE = 500
+STATUS_ALUNO = ("ativo", "inativo")
+LEASE_SECONDS = float(os.environ.get("ESCOLA_JOBS_LEASE", 3600))
+
+# Registro de tipos de job: nome -> função(db, parametros, progresso)
+HANDLERS = {}
+
+
+class JobError(Exception):
+    """Erro de validação ao criar ou executar um job"""
+
+
+def job(name):
+    """Decorator que registra uma função como tipo de job"""
+    def register(func):
+        HANDLERS[name] = func
+        return func
+    return register
+
+
+# =====================================================
+# FILA
+# =====================================================
+
+def enqueue(db, tipo, parametros=None, user_id=None):
+    """Grava um novo job pendente e retorna o objeto"""
+    if tipo not in HANDLERS:
+        raise JobError(f"Tipo de job desconhecido: {tipo}")
+    db_job = models.Job(
+        tipo=tipo,
+        status="pendente",
+        parametros=json.dumps(parametros or {}),
+        criado_por=user_id
+    )
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+
+def job_to_dict(db_job):
+    """Representação pública do job (sem o resultado)"""
+    return {
+        "id": db_job.id,
+        "tipo": db_job.tipo,
+        "status": db_job.status,
+        "progresso": db_job.progresso,
+        "erro": db_job.erro,
+        "data_criacao": db_job.data_criacao.isoformat() if db_job.data_criacao else None,
+        "data_inicio": db_job.data_inicio.isoformat() if db_job.data_inicio else None,
+        "data_conclusao": db_job.data_conclusao.isoformat() if db_job.data_conclusao else None,
+        "resultado_disponivel": db_job.status == "concluido" and db_job.resultado is not None
+    }
+
+
+def claim_next(db):
+    """Reserva atomicamente o próximo job pendente para este processo"""
+    while True:
+        candidate = db.query(models.Job.id).filter(
+            models.Job.status == "pendente"
+        ).order_by(models.Job.id).first()
+        if candidate is None:
+            return None
+        claimed = db.execute(
+            update(models.Job)
+            .where(models.Job.id == candidate.id, models.Job.status == "pendente")
+            .values(status="executando", worker_pid=os.getpid(), data_inicio=datetime.utcnow())
+        ).rowcount
+        db.commit()
+        if claimed:
+            return db.query(models.Job).filter(models.Job.id == candidate.id).first()
+        # Outro worker reservou antes: tentar o próximo
+
+
+def _worker_alive(pid):
+    """O processo ainda existe? (o próprio processo conta como morto: ele não está executando nada)"""
+    if not pid or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        # Existe mas é de outro usuário, ou a plataforma não permite verificar
+        return True
+    return True
+
+
+def reclaim_stale(db, lease=LEASE_SECONDS):
+    """Marca como erro os jobs "executando" de workers mortos ou além do prazo; retorna quantos"""
+    limite = datetime.utcnow() - timedelta(seconds=lease)
+    stale = []
+    for job_id, pid, inicio in db.query(
+        models.Job.id, models.Job.worker_pid, models.Job.data_inicio
+    ).filter(models.Job.status == "executando"):
+        if not _worker_alive(pid):
+            stale.append((job_id, pid, f"Worker {pid} encerrado durante a execução"))
+        elif inicio is None or inicio < limite:
+            stale.append((job_id, pid, f"Execução excedeu o prazo de {lease:g} s"))
+    for job_id, pid, motivo in stale:
+        # Só se ainda for o mesmo worker: outro pode ter recuperado o job antes
+        db.execute(
+            update(models.Job)
+            .where(models.Job.id == job_id, models.Job.status == "executando", models.Job.worker_pid == pid)
+            .values(status="erro", erro=motivo, data_conclusao=datetime.utcnow())
+        )
+    if stale:
+        db.commit()
+    return len(stale)
+
+
+class Progress:
+    """Callback de progresso que grava no máximo a cada `interval` segundos"""
+
+    def __init__(self, job_id, session_factory, interval=0.5):
+        self.job_id = job_id
+        self.session_factory = session_factory
+        self.interval = interval
+        self._last = 0.0
+
+    def __call__(self, done, total):
+        now = time.monotonic()
+        if now - self._last < self.interval and done < total:
+            return
+        self._last = now
+        pct = int(done * 100 / total) if total else 100
+        db = self.session_factory()
+        try:
+            db.execute(update(models.Job).where(models.Job.id == self.job_id).values(progresso=pct))
+            db.commit()
+        finally:
+            db.close()
+
+
+def run_job(db, db_job, session_factory=None):
+    """Executa um job já reservado e grava o resultado ou o erro"""
+    handler = HANDLERS.get(db_job.tipo)
+    try:
+        if handler is None:
+            raise JobError(f"Tipo de job desconhecido: {db_job.tipo}")
+        parametros = json.loads(db_job.parametros or "{}")
+        progresso = Progress(db_job.id, session_factory or database.SessionLocal)
+        resultado, resultado_tipo = handler(db, parametros, progresso)
+        db_job.resultado = resultado
+        db_job.resultado_tipo = resultado_tipo
+        db_job.status = "concluido"
+        db_job.progresso = 100
+    except Exception as e:
+        db.rollback()
+        db_job.status = "erro"
+        db_job.erro = str(e)
+    db_job.data_conclusao = datetime.utcnow()
+    db.commit()
+
+
+def _session_factories():
+    """Bancos a consultar: o padrão ou, no modo multi-escola, o de cada escola"""
+    if not tenancy.enabled():
+        return [database.SessionLocal]
+    return [tenancy.router.sessionmaker_for(tenant) for tenant in tenancy.router.known_tenants()]
+
+
+def worker_loop(parent_pid=None):
+    """Laço principal de um processo worker (termina se o processo pai morrer)"""
+    # Conexões herdadas do processo pai não podem ser reutilizadas
+    database.engine.dispose()
+    migrate.ensure_schema(database.engine)
+    while parent_pid is None or os.getppid() == parent_pid:
+        executed = False
+        for session_factory in _session_factories():
+            db = session_factory()
+            try:
+                reclaim_stale(db)
+                db_job = claim_next(db)
+                if db_job is not None:
+                    run_job(db, db_job, session_factory)
+                    executed = True
+            except Exception as e:
+                print(f"[JOBS] erro no worker {os.getpid()}: {e}")
+            finally:
+                db.close()
+        if not executed:
+            time.sleep(POLL_INTERVAL)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def ensure_worker_pool(processes=DEFAULT_PROCESSES):
+    """Inicia (uma única vez por processo) o pool de workers em segundo plano"""
+    global _pool
+    if os.environ.get("ESCOLA_JOBS_EXTERNAL") == "1":
+        return
+    with _pool_lock:
+        if _pool is not None and _pool.poll() is None:
+            return
+        # Processo separado via CLI: não reimporta o módulo principal da aplicação
+        _pool = subprocess.Popen([
+            sys.executable, os.path.abspath(__file__), "worker", "--processes", str(processes)
+        ])
+        atexit.register(_pool.terminate)
+
+
+# =====================================================
+# TIPOS DE JOB
+# =====================================================
+
+@job("importar_alunos")
+def importar_alunos(db, parametros, progresso):
+    """
+    Importa uma lista de alunos em lotes, respeitando a capacidade das turmas.
+    Linhas inválidas (status, turma, email repetido no banco ou na própria
+    lista) vão para `erros` sem interromper a importação; cada lote é
+    gravado inteiro ou, se ainda assim falhar, reportado inteiro em `erros`.
+    """
+    alunos = parametros.get("alunos") or []
+    turmas = {t.id: t for t in turma_cache.current().all(db)}
+    ocupacao = {turma_id: 0 for turma_id in turmas}
+    for (turma_id,) in db.query(models.Aluno.turma_id).filter(models.Aluno.turma_id.isnot(None)):
+        ocupacao[turma_id] = ocupacao.get(turma_id, 0) + 1
+    emails = {email for (email,) in db.query(models.Aluno.email).filter(models.Aluno.email.isnot(None))}
+
+    criados = 0
+    erros = []
+    lote = []  # (linha, turma_id, email) das linhas adicionadas e ainda não gravadas
+    for index, data in enumerate(alunos):
+        try:
+            status = data.get("status", "inativo")
+            if status not in STATUS_ALUNO:
+                raise JobError(f"Status inválido: {status} (use {' ou '.join(STATUS_ALUNO)})")
+            email = data.get("email") or None
+            if email is not None and email in emails:
+                raise JobError(f"Email já cadastrado: {email}")
+            turma_id = data.get("turma_id")
+            if turma_id:
+                if turma_id not in turmas:
+                    raise JobError("Turma não encontrada")
+                if ocupacao[turma_id] >= turmas[turma_id].capacidade:
+                    raise JobError("Turma já atingiu sua capacidade máxima")
+            db.add(models.Aluno(
+                nome=data["nome"],
+                data_nascimento=datetime.strptime(data["data_nascimento"], "%Y-%m-%d").date(),
+                email=email,
+                status=status,
+                turma_id=turma_id
+            ))
+            if turma_id:
+                ocupacao[turma_id] += 1
+            if email is not None:
+                emails.add(email)
+            lote.append((index, turma_id, email))
+        except (KeyError, ValueError, JobError) as e:
+            erros.append({"linha": index, "detail": str(e)})
+
+        if (index + 1) % IMPORT_BATCH_SIZE == 0:
+            criados += _commit_import_batch(db, lote, ocupacao, emails, erros)
+            lote = []
+            progresso(index + 1, len(alunos))
+    criados += _commit_import_batch(db, lote, ocupacao, emails, erros)
+    erros.sort(key=lambda erro: erro["linha"])
+    return json.dumps({"criados": criados, "erros": erros}), "application/json"
+
+
+def _commit_import_batch(db, lote, ocupacao, emails, erros):
+    """Grava o lote; em conflito (ex.: email criado por outra requisição no meio) descarta o lote inteiro"""
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        for index, turma_id, email in lote:
+            if turma_id:
+                ocupacao[turma_id] -= 1
+            emails.discard(email)
+            erros.append({"linha": index, "detail": f"Lote não gravado: {e.orig}"})
+        return 0
+    return len(lote)
+
+
+@job("exportar_alunos")
+def exportar_alunos(db, parametros, progresso):
+    """Exporta alunos (opcionalmente filtrados) em CSV ou JSON"""
+    formato = parametros.get("formato", "csv")
+    if formato not in ("csv", "json"):
+        raise JobError("Formato deve ser csv ou json")
+
+    modelos = [models.Aluno]
+    if parametros.get("incluir_arquivados"):
+        modelos.append(models.AlunoArquivo)
+    turma_nomes = services.turma_nomes(db)
+
+    rows = []
+    total = 0
+    for modelo in modelos:
+        query = db.query(modelo)
+        if parametros.get("turma_id"):
+            query = query.filter(modelo.turma_id == int(parametros["turma_id"]))
+        if parametros.get("status"):
+            query = query.filter(modelo.status == parametros["status"])
+        total += query.count()
+        for aluno in query.order_by(modelo.id).yield_per(1000):
+            rows.append(services.aluno_to_dict(aluno, turma_nomes.get(aluno.turma_id)))
+            if len(rows) % 1000 == 0:
+                progresso(len(rows), total)
+    rows.sort(key=lambda row: row["id"])
+
+    if formato == "json":
+        return json.dumps(rows, ensure_ascii=False), "application/json"
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["ID", "Nome", "Data de Nascimento", "Email", "Status", "Turma"])
+    for row in rows:
+        writer.writerow([row["id"], row["nome"], row["data_nascimento"], row["email"] or "",
+                         row["status"], row["turma_nome"] or ""])
+    return buffer.getvalue(), "text/csv"
+
+
+@job("arquivar_alunos")
+def arquivar_alunos(db, parametros, progresso):
+    """Move alunos inativos há mais de `dias` dias para alunos_arquivo, em lotes"""
+    total = archive.archive_inactive(
+        sessionmaker(bind=db.get_bind()),
+        dias=int(parametros.get("dias", archive.ARQUIVO_DIAS)),
+        lote=int(parametros.get("lote", archive.ARQUIVO_LOTE)),
+        progresso=progresso
+    )
+    return json.dumps({"arquivados": total}), "application/json"
+
+
+@job("backup")
+def criar_backup(db, parametros, progresso):
+    """Snapshot online do banco (da escola do job) com rotação dos antigos"""
+    resumo = backup.create_backup(
+        db.get_bind().url.database,
+        manter=int(parametros.get("manter", backup.MANTER)),
+        progresso=progresso
+    )
+    return json.dumps(resumo), "application/json"
+
+
+@job("recalcular_estatisticas")
+def recalcular_estatisticas(db, parametros, progresso):
+    """Recalcula as estatísticas gerais e por turma"""
+    return json.dumps(services.estatisticas(db)), "application/json"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Workers da fila de jobs")
+    parser.add_argument("command", choices=["worker"])
+    parser.add_argument("--processes", type=int, default=DEFAULT_PROCESSES)
+    args = parser.parse_args()
+
+    print(f"⚙️  Iniciando {args.processes} workers de jobs...")
+    # SIGTERM vira SystemExit para que os workers daemon sejam encerrados junto
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    ctx = multiprocessing.get_context("spawn")
+    workers = [
+        ctx.Process(target=worker_loop, args=(os.getpid(),), daemon=True, name="escola-job-worker")
+        for _ in range(args.processes)
+    ]
+    for proc in workers:
+        proc.start()
+    try:
+        for proc in workers:
+            proc.join()
+    except KeyboardInterrupt:
+        print("\n🛑 Workers parados!")
@@ -0,0 +1,416 @@
+# Load Test - Gerador de carga HTTP concorrente com replay de sessões de login
+
+"""
+Reproduz o pico de segunda-feira de manhã contra um backend local.
+
+Cada username (admins e professores do seed.py) faz login uma vez em
+/auth/login; os usuários virtuais com o mesmo username compartilham o cookie
+de sessão, como abas do mesmo professor, de modo que o limite de tentativas
+de login do backend não interfere. Cada um repete uma mistura ponderada de
+leituras do dashboard e escritas de matrícula, em um ritmo alvo de
+requisições por segundo. Ao final imprime a distribuição de latência e o
+detalhamento dos erros (401/403/500/"database is locked").
+
+Uso:
+    python loadtest.py --users 40 --rate 200 --duration 30
+    python loadtest.py --spawn flask --users 20 --rate 100
+    python loadtest.py --spawn fastapi --port 8001
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import date, timedelta
+from urllib.parse import urlsplit
+
+# Credenciais criadas por seed.py
+SEED_USERS = [
+    ("admin", "admin123", "admin"),
+    ("prof.maria", "prof123", "professor"),
+    ("prof.joao", "prof123", "professor"),
+    ("prof.ana", "prof123", "professor"),
+]
+
+# Mistura padrão: nome da operação -> peso
+DEFAULT_MIX = {
+    "alunos": 40,
+    "turmas": 20,
+    "estatisticas": 20,
+    "criar_aluno": 10,
+    "matricular": 10,
+}
+
+# Operações que só administradores podem executar
+WRITE_OPS = {"criar_aluno", "matricular"}
+
+
+class HttpConnection:
+    """Conexão HTTP/1.1 keep-alive mínima sobre asyncio, com cookies"""
+
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.cookies = {}
+        self.reader = None
+        self.writer = None
+
+    async def _connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None):
+        """Envia uma requisição e retorna (status, corpo em bytes)"""
+        try:
+            return await asyncio.wait_for(self._request(method, path, body), self.timeout)
+        except Exception:
+            # Conexão em estado desconhecido: descartar para a próxima requisição
+            await self.close()
+            raise
+
+    async def _request(self, method, path, body):
+        if self.writer is None:
+            await self._connect()
+
+        payload = json.dumps(body).encode() if body is not None else b""
+        headers = [
+            f"{method} {path} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            "Connection: keep-alive",
+            "Accept: application/json",
+            f"Content-Length: {len(payload)}",
+        ]
+        if body is not None:
+            headers.append("Content-Type: application/json")
+        if self.cookies:
+            headers.append("Cookie: " + "; ".join(f"{k}={v}" for k, v in self.cookies.items()))
+        self.writer.write(("\r\n".join(headers) + "\r\n\r\n").encode() + payload)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("conexão fechada pelo servidor")
+        status = int(status_line.split()[1])
+
+        length = None
+        chunked = False
+        keep_alive = True
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            value = value.strip()
+            if name == "content-length":
+                length = int(value)
+            elif name == "transfer-encoding" and "chunked" in value.lower():
+                chunked = True
+            elif name == "connection" and value.lower() == "close":
+                keep_alive = False
+            elif name == "set-cookie":
+                cookie = value.split(";", 1)[0]
+                key, _, val = cookie.partition("=")
+                self.cookies[key.strip()] = val.strip()
+
+        if chunked:
+            data = b""
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                data += await self.reader.readexactly(size)
+                await self.reader.readline()
+        elif length is not None:
+            data = await self.reader.readexactly(length)
+        else:
+            data = await self.reader.read()
+            keep_alive = False
+
+        if not keep_alive:
+            await self.close()
+        return status, data
+
+
+class Stats:
+    """Acumula latências e erros por operação"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = Counter()
+        self.statuses = Counter()
+
+    def record(self, op, latency, status, body):
+        self.latencies.setdefault(op, []).append(latency)
+        self.statuses[status] += 1
+        if status >= 400 or status == 0:
+            self.errors[classify_error(status, body)] += 1
+
+    def report(self, elapsed):
+        all_latencies = [lat for lats in self.latencies.values() for lat in lats]
+        total = len(all_latencies)
+        print("\n📊 Resultado do teste de carga")
+        print(f"   Requisições: {total} em {elapsed:.1f}s ({total / elapsed if elapsed else 0:.1f} req/s)")
+        print(f"   Status: {dict(sorted(self.statuses.items()))}")
+        print(f"\n   {'operação':<14}{'n':>7}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)")
+        for op, lats in sorted(self.latencies.items()):
+            print(_latency_row(op, lats))
+        if all_latencies:
+            print(_latency_row("TOTAL", all_latencies))
+        print("\n   Erros:")
+        if not self.errors:
+            print("      nenhum")
+        for kind, count in self.errors.most_common():
+            print(f"      {kind:<22}{count:>7}")
+
+
+def percentile(sorted_values, pct):
+    """Percentil por vizinho mais próximo de uma lista já ordenada"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def _latency_row(op, lats):
+    values = sorted(lats)
+    cols = [percentile(values, p) * 1000 for p in (50, 90, 95, 99)] + [values[-1] * 1000]
+    return f"   {op:<14}{len(values):>7}" + "".join(f"{c:>9.1f}" for c in cols)
+
+
+def classify_error(status, body):
+    """Agrupa um erro em uma das categorias reportadas"""
+    if b"database is locked" in (body or b""):
+        return "database is locked"
+    if status == 0:
+        return "conexão/timeout"
+    if status in (401, 403, 500):
+        return str(status)
+    return f"outro ({status})"
+
+
+def parse_mix(text):
+    """Converte 'alunos=40,turmas=20' em dicionário de pesos"""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"operação desconhecida: {name}")
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"peso inválido para {name}: {weight}")
+        if mix[name] < 0:
+            raise argparse.ArgumentTypeError(f"peso negativo para {name}")
+    return mix
+
+
+def role_mix(mix, tipo):
+    """Pesos que o papel pode executar (professores não escrevem)"""
+    return {op: w for op, w in mix.items() if tipo == "admin" or op not in WRITE_OPS}
+
+
+def positive_int(text):
+    value = int(text)
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"deve ser maior que zero: {text}")
+    return value
+
+
+def positive_float(text):
+    value = float(text)
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"deve ser maior que zero: {text}")
+    return value
+
+
+class VirtualUser:
+    """Usuário virtual com sessão própria"""
+
+    def __init__(self, index, credentials, args, stats, turma_ids):
+        self.index = index
+        self.username, self.password, self.tipo = credentials
+        self.conn = HttpConnection(args.host, args.port, args.timeout)
+        self.stats = stats
+        self.turma_ids = turma_ids
+        self.pending_alunos = []
+        self.rng = random.Random(args.seed + index)
+
+        mix = role_mix(args.mix, self.tipo)
+        self.ops = list(mix)
+        self.weights = [mix[op] for op in self.ops]
+
+    async def login(self):
+        status, body = await self.conn.request(
+            "POST", "/auth/login", {"username": self.username, "password": self.password}
+        )
+        # O backend FastAPI não tem autenticação: seguir sem sessão
+        return status in (200, 404)
+
+    async def run_op(self, op):
+        if op == "alunos":
+            return await self.conn.request("GET", "/alunos")
+        if op == "turmas":
+            return await self.conn.request("GET", "/turmas")
+        if op == "estatisticas":
+            return await self.conn.request("GET", "/estatisticas")
+        if op == "criar_aluno":
+            nascimento = date(2008, 1, 1) + timedelta(days=self.rng.randrange(365 * 8))
+            status, body = await self.conn.request("POST", "/alunos", {
+                "nome": f"Carga {self.index}-{self.rng.randrange(10**9)}",
+                "data_nascimento": nascimento.isoformat(),
+                "status": "inativo",
+            })
+            if status in (200, 201):
+                self.pending_alunos.append(json.loads(body)["id"])
+            return status, body
+        if op == "matricular":
+            if not self.pending_alunos or not self.turma_ids:
+                return await self.run_op("criar_aluno")
+            return await self.conn.request("POST", "/matriculas", {
+                "aluno_id": self.pending_alunos.pop(),
+                "turma_id": self.rng.choice(self.turma_ids),
+            })
+        raise ValueError(op)
+
+    async def run(self, start, interval, deadline):
+        # Defasagem inicial para espalhar os usuários dentro do intervalo
+        next_at = start + self.rng.random() * interval
+        loop = asyncio.get_running_loop()
+        while next_at < deadline:
+            delay = next_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            op = self.rng.choices(self.ops, self.weights)[0]
+            try:
+                status, body = await self.run_op(op)
+            except Exception as e:
+                status, body = 0, str(e).encode()
+            # Latência medida a partir do horário agendado (evita omissão coordenada)
+            self.stats.record(op, loop.time() - next_at, status, body)
+            next_at += interval
+        await self.conn.close()
+
+
+async def fetch_turma_ids(args):
+    conn = HttpConnection(args.host, args.port, args.timeout)
+    try:
+        await conn.request("POST", "/auth/login", {"username": "admin", "password": "admin123"})
+        status, body = await conn.request("GET", "/turmas")
+        if status != 200:
+            return []
+        return [t["id"] for t in json.loads(body)]
+    finally:
+        await conn.close()
+
+
+async def run_load(args):
+    stats = Stats()
+    turma_ids = await fetch_turma_ids(args)
+
+    users = []
+    for i in range(args.users):
+        # Um a cada `admin_every` usuários é admin; os demais alternam entre professores
+        if i % args.admin_every == 0:
+            credentials = SEED_USERS[0]
+        else:
+            credentials = SEED_USERS[1 + i % (len(SEED_USERS) - 1)]
+        users.append(VirtualUser(i, credentials, args, stats, turma_ids))
+
+    # Um login por username; os demais usuários virtuais reaproveitam a sessão
+    sessions = {}
+    for u in users:
+        sessions.setdefault(u.username, u)
+    print(f"🔑 Fazendo login de {len(sessions)} usernames para {len(users)} usuários...")
+    logins = await asyncio.gather(*(u.login() for u in sessions.values()), return_exceptions=True)
+    failed = sum(1 for ok in logins if ok is not True)
+    if failed:
+        print(f"⚠️  {failed} logins falharam")
+    for u in users:
+        u.conn.cookies = dict(sessions[u.username].conn.cookies)
+
+    loop = asyncio.get_running_loop()
+    interval = args.users / args.rate
+    start = loop.time()
+    deadline = start + args.duration
+    print(f"🚀 {args.rate} req/s por {args.duration}s em {args.base_url}")
+    await asyncio.gather(*(u.run(start, interval, deadline) for u in users))
+    stats.report(loop.time() - start)
+    return stats
+
+
+def spawn_backend(kind, port):
+    """Inicia o backend escolhido via função serve() em um subprocesso"""
+    module = "app_flask" if kind == "flask" else "app"
+    code = f"import {module}; {module}.serve(host='127.0.0.1', port={port})"
+    proc = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.DEVNULL)
+    # Aguarda o servidor responder em /health
+    import urllib.request
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+            return proc
+        except Exception:
+            if proc.poll() is not None:
+                raise RuntimeError(f"backend {kind} terminou durante a inicialização")
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError(f"backend {kind} não respondeu em /health")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gerador de carga para o Sistema de Gestão Escolar")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", choices=["flask", "fastapi"], help="iniciar o backend localmente")
+    parser.add_argument("--port", type=int, default=None, help="porta do backend iniciado com --spawn")
+    parser.add_argument("--users", type=positive_int, default=20, help="usuários virtuais")
+    parser.add_argument("--admin-every", type=positive_int, default=4, help="1 admin a cada N usuários")
+    parser.add_argument("--rate", type=positive_float, default=50.0, help="requisições por segundo (total)")
+    parser.add_argument("--duration", type=positive_float, default=10.0, help="duração em segundos")
+    parser.add_argument("--timeout", type=positive_float, default=10.0, help="timeout por requisição")
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX),
+                        help="pesos, ex.: alunos=40,turmas=20,estatisticas=20,criar_aluno=10,matricular=10")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    # Cada papel presente precisa de ao menos uma operação com peso
+    tipos = {"admin"} | ({"professor"} if args.admin_every > 1 and args.users > 1 else set())
+    for tipo in sorted(tipos):
+        if not any(role_mix(args.mix, tipo).values()):
+            detalhe = " (professores só fazem leituras)" if tipo == "professor" else ""
+            parser.error(f"--mix sem operações com peso para {tipo}{detalhe}")
+
+    proc = None
+    if args.spawn:
+        args.port = args.port or 8000
+        args.base_url = f"http://127.0.0.1:{args.port}"
+        proc = spawn_backend(args.spawn, args.port)
+
+    url = urlsplit(args.base_url)
+    args.host = url.hostname
+    args.port = url.port or 80
+
+    try:
+        asyncio.run(run_load(args))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
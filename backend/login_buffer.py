@@ -0,0 +1,136 @@
+# Login Buffer - Gravação adiada (write-behind) de Usuario.ultimo_login
+
+"""
+Gravar `ultimo_login` a cada login tomava o lock de escrita do SQLite
+justamente no horário em que toda a equipe entra no sistema. Agora o login
+só registra o instante neste buffer em memória, e uma thread grava todos os
+pendentes em um único UPDATE em lote a cada FLUSH_SECONDS e ao encerrar o
+processo.
+
+- `/auth/me` e `/auth/usuarios` combinam o valor do banco com o do buffer
+  (`latest`), então enxergam o login mais recente antes da gravação.
+- O UPDATE só avança o valor (`ultimo_login < novo`): vários processos podem
+  gravar o mesmo usuário em qualquer ordem.
+- Se a gravação falhar (ex.: banco ocupado), os valores voltam ao buffer e
+  são tentados de novo no próximo ciclo.
+
+Uma queda abrupta do processo perde no máximo FLUSH_SECONDS de logins
+(apenas o horário do último acesso; nenhum dado de negócio).
+"""
+
+import atexit
+import os
+import threading
+
+from sqlalchemy import bindparam, or_, update
+
+import models
+
+FLUSH_SECONDS = float(os.environ.get("ESCOLA_ULTIMO_LOGIN_FLUSH", 5))
+
+_Usuario = models.Usuario.__table__
+ATUALIZAR_ULTIMO_LOGIN = update(_Usuario).where(
+    _Usuario.c.id == bindparam("usuario_id"),
+    or_(_Usuario.c.ultimo_login.is_(None), _Usuario.c.ultimo_login < bindparam("momento"))
+).values(ultimo_login=bindparam("momento"))
+
+
+def _session_for(tenant):
+    import database
+    import tenancy
+    if tenant is None:
+        return database.SessionLocal()
+    return tenancy.router.session(tenant)
+
+
+class LoginBuffer:
+    """Últimos logins pendentes por (escola, usuário), gravados em lote"""
+
+    def __init__(self, flush_seconds=FLUSH_SECONDS, session_for=_session_for):
+        self.flush_seconds = flush_seconds
+        self._session_for = session_for
+        self._pendentes = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.metrics = {"registrados": 0, "gravacoes": 0, "linhas": 0, "falhas": 0}
+
+    def record(self, tenant, usuario_id, momento):
+        """Registra o login; a gravação acontece no próximo ciclo"""
+        with self._lock:
+            key = (tenant, usuario_id)
+            atual = self._pendentes.get(key)
+            if atual is None or momento > atual:
+                self._pendentes[key] = momento
+            self.metrics["registrados"] += 1
+        self._start()
+
+    def latest(self, tenant, usuario_id, gravado):
+        """Valor mais recente entre o gravado no banco e o pendente no buffer"""
+        with self._lock:
+            pendente = self._pendentes.get((tenant, usuario_id))
+        if pendente is None or (gravado is not None and gravado >= pendente):
+            return gravado
+        return pendente
+
+    def flush(self):
+        """Grava os pendentes (um UPDATE em lote por escola); retorna as linhas"""
+        with self._flush_lock:
+            with self._lock:
+                pendentes, self._pendentes = self._pendentes, {}
+            if not pendentes:
+                return 0
+
+            por_escola = {}
+            for (tenant, usuario_id), momento in pendentes.items():
+                por_escola.setdefault(tenant, []).append({"usuario_id": usuario_id, "momento": momento})
+
+            gravadas = 0
+            for tenant, params in por_escola.items():
+                db = self._session_for(tenant)
+                try:
+                    db.execute(ATUALIZAR_ULTIMO_LOGIN, params)
+                    db.commit()
+                    gravadas += len(params)
+                except Exception:
+                    db.rollback()
+                    self._requeue(tenant, params)
+                finally:
+                    db.close()
+
+            with self._lock:
+                self.metrics["gravacoes"] += 1
+                self.metrics["linhas"] += gravadas
+            return gravadas
+
+    def _requeue(self, tenant, params):
+        with self._lock:
+            self.metrics["falhas"] += 1
+            for item in params:
+                key = (tenant, item["usuario_id"])
+                atual = self._pendentes.get(key)
+                if atual is None or item["momento"] > atual:
+                    self._pendentes[key] = item["momento"]
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="ultimo-login", daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def _loop(self):
+        while not self._stop.wait(self.flush_seconds):
+            self.flush()
+
+    def stop(self):
+        """Encerra a thread e grava o que estiver pendente"""
+        self._stop.set()
+        self.flush()
+
+
+buffer = LoginBuffer()
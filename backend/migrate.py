@@ -0,0 +1,195 @@
+# Migrate - Migrações de esquema versionadas (arquivos SQL em migrations/)
+
+"""
+`create_all` só cria tabelas que ainda não existem; mudanças em tabelas já
+existentes (novos índices, colunas) ficam em arquivos `NNNN_descricao.sql` no
+diretório migrations/, aplicados em ordem e registrados na tabela
+`schema_migrations`. As instruções devem ser idempotentes (IF NOT EXISTS), pois
+bancos novos já recebem parte do esquema via `create_all`. O SQLite não tem
+`ADD COLUMN IF NOT EXISTS`: um `ALTER TABLE ... ADD COLUMN` de coluna que o
+`create_all` já criou é ignorado.
+
+Na inicialização dos apps, `ensure_schema` só executa `create_all` e as
+migrações quando o hash do esquema (modelos + arquivos de migração) difere
+do gravado em `PRAGMA user_version`; nos demais casos custa uma consulta.
+
+Uso:
+    python migrate.py status
+    python migrate.py upgrade
+    python migrate.py nova "descricao"
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+from datetime import datetime
+
+from sqlalchemy.exc import OperationalError
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATION_PATTERN = re.compile(r"^(\d{4})_([a-z0-9_]+)\.sql$")
+ADD_COLUMN_PATTERN = re.compile(r"^\s*ALTER\s+TABLE\s+\S+\s+ADD\s+(COLUMN\s+)?", re.IGNORECASE)
+
+
+def available():
+    """Lista (versao, nome, caminho) das migrações em ordem"""
+    if not os.path.isdir(MIGRATIONS_DIR):
+        return []
+    result = []
+    for name in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = MIGRATION_PATTERN.match(name)
+        if match:
+            result.append((match.group(1), name[:-4], os.path.join(MIGRATIONS_DIR, name)))
+    return result
+
+
+def _statements(path):
+    """
+    Instruções do arquivo (comentários '--' ignorados). Um ';' só encerra a
+    instrução quando ela está completa, o que preserva corpos de trigger.
+    """
+    result, buffer = [], ""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.lstrip().startswith("--"):
+                continue
+            buffer += line
+            if sqlite3.complete_statement(buffer):
+                result.append(buffer.strip().rstrip(";"))
+                buffer = ""
+    if buffer.strip():
+        result.append(buffer.strip().rstrip(";"))
+    return result
+
+
+def _ensure_table(conn):
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "versao VARCHAR(4) PRIMARY KEY, nome VARCHAR(100) NOT NULL, aplicada_em DATETIME NOT NULL)"
+    )
+
+
+def applied(engine):
+    """Versões já aplicadas no banco"""
+    with engine.begin() as conn:
+        _ensure_table(conn)
+        return {row[0] for row in conn.exec_driver_sql("SELECT versao FROM schema_migrations")}
+
+
+def pending(engine):
+    done = applied(engine)
+    return [migration for migration in available() if migration[0] not in done]
+
+
+def upgrade(engine):
+    """Aplica as migrações pendentes, cada uma em sua própria transação"""
+    aplicadas = []
+    for versao, nome, path in pending(engine):
+        with engine.begin() as conn:
+            for statement in _statements(path):
+                _execute(conn, statement)
+            # OR IGNORE: outro processo pode ter aplicado a mesma versão em paralelo
+            conn.exec_driver_sql(
+                "INSERT OR IGNORE INTO schema_migrations (versao, nome, aplicada_em) VALUES (?, ?, ?)",
+                (versao, nome, datetime.utcnow())
+            )
+        aplicadas.append(nome)
+    return aplicadas
+
+
+def _execute(conn, statement):
+    if not ADD_COLUMN_PATTERN.match(statement):
+        conn.exec_driver_sql(statement)
+        return
+    # No SQLite o erro desfaz só a instrução, não a transação da migração
+    try:
+        conn.exec_driver_sql(statement)
+    except OperationalError as e:
+        if "duplicate column name" not in str(e.orig):
+            raise
+
+
+def schema_hash(metadata):
+    """Hash de 31 bits do esquema dos modelos e das migrações disponíveis"""
+    digest = hashlib.sha256()
+    for table in metadata.sorted_tables:
+        digest.update(table.name.encode())
+        for column in table.columns:
+            digest.update(f"{column.name}:{column.type}:{column.nullable}".encode())
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            digest.update(f"{index.name}:{[column.name for column in index.columns]}".encode())
+    for _, nome, path in available():
+        digest.update(nome.encode())
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    # user_version é um inteiro de 32 bits com sinal
+    return int(digest.hexdigest()[:8], 16) & 0x7FFFFFFF
+
+
+def ensure_schema(engine, metadata=None):
+    """
+    Cria tabelas e aplica migrações se o esquema mudou desde a última
+    verificação. Retorna True se houve verificação completa.
+    """
+    if metadata is None:
+        import models
+        metadata = models.Base.metadata
+    expected = schema_hash(metadata)
+    with engine.connect() as conn:
+        if conn.exec_driver_sql("PRAGMA user_version").scalar() == expected:
+            return False
+    metadata.create_all(bind=engine)
+    upgrade(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"PRAGMA user_version = {expected}")
+    return True
+
+
+def write_migration(descricao, statements, comentario=None):
+    """Cria o próximo arquivo de migração e retorna seu caminho"""
+    versoes = [int(versao) for versao, _, _ in available()]
+    versao = (max(versoes) if versoes else 0) + 1
+    slug = re.sub(r"[^a-z0-9]+", "_", descricao.lower()).strip("_")[:60] or "migracao"
+    path = os.path.join(MIGRATIONS_DIR, f"{versao:04d}_{slug}.sql")
+    os.makedirs(MIGRATIONS_DIR, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for line in (comentario or descricao).splitlines():
+            f.write(f"-- {line}\n")
+        for statement in statements:
+            f.write(statement.rstrip(";") + ";\n")
+    return path
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Migrações de esquema")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("status", help="Mostra migrações aplicadas e pendentes")
+    sub.add_parser("upgrade", help="Aplica as migrações pendentes")
+    nova = sub.add_parser("nova", help="Cria um arquivo de migração vazio")
+    nova.add_argument("descricao")
+    args = parser.parse_args(argv)
+
+    if args.comando == "nova":
+        print(f"📝 {write_migration(args.descricao, [])}")
+        return
+
+    import database
+    import models
+    models.Base.metadata.create_all(bind=database.engine)
+
+    if args.comando == "upgrade":
+        aplicadas = upgrade(database.engine)
+        for nome in aplicadas:
+            print(f"✅ {nome}")
+        if not aplicadas:
+            print("Nenhuma migração pendente")
+    else:
+        done = applied(database.engine)
+        for versao, nome, _ in available():
+            print(f"{'✅' if versao in done else '⏳'} {nome}")
+
+
+if __name__ == "__main__":
+    main()
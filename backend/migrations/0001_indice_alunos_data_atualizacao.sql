@@ -0,0 +1,2 @@
+-- Índice usado pela sincronização incremental (GET /alunos/changes)
+CREATE INDEX IF NOT EXISTS ix_alunos_data_atualizacao ON alunos (data_atualizacao);
@@ -0,0 +1,2 @@
+-- Contagens por turma, exclusão de turma e matrícula filtram por turma_id
+CREATE INDEX IF NOT EXISTS ix_alunos_turma_id ON alunos (turma_id);
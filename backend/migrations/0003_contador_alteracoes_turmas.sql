@@ -0,0 +1,16 @@
+-- Contador de alterações em turmas, lido pelo cache de turmas (turma_cache.py)
+-- para detectar escritas feitas por outros processos
+CREATE TABLE IF NOT EXISTS contadores (nome VARCHAR(50) PRIMARY KEY, valor INTEGER NOT NULL DEFAULT 0);
+INSERT OR IGNORE INTO contadores (nome, valor) VALUES ('turmas', 0);
+CREATE TRIGGER IF NOT EXISTS tr_turmas_contador_insert AFTER INSERT ON turmas
+BEGIN
+    UPDATE contadores SET valor = valor + 1 WHERE nome = 'turmas';
+END;
+CREATE TRIGGER IF NOT EXISTS tr_turmas_contador_update AFTER UPDATE ON turmas
+BEGIN
+    UPDATE contadores SET valor = valor + 1 WHERE nome = 'turmas';
+END;
+CREATE TRIGGER IF NOT EXISTS tr_turmas_contador_delete AFTER DELETE ON turmas
+BEGIN
+    UPDATE contadores SET valor = valor + 1 WHERE nome = 'turmas';
+END;
@@ -0,0 +1,15 @@
+-- Contador de alterações em alunos, lido pelo índice em memória (roster.py)
+-- para detectar escritas feitas por outros processos
+INSERT OR IGNORE INTO contadores (nome, valor) VALUES ('alunos', 0);
+CREATE TRIGGER IF NOT EXISTS tr_alunos_contador_insert AFTER INSERT ON alunos
+BEGIN
+    UPDATE contadores SET valor = valor + 1 WHERE nome = 'alunos';
+END;
+CREATE TRIGGER IF NOT EXISTS tr_alunos_contador_update AFTER UPDATE ON alunos
+BEGIN
+    UPDATE contadores SET valor = valor + 1 WHERE nome = 'alunos';
+END;
+CREATE TRIGGER IF NOT EXISTS tr_alunos_contador_delete AFTER DELETE ON alunos
+BEGIN
+    UPDATE contadores SET valor = valor + 1 WHERE nome = 'alunos';
+END;
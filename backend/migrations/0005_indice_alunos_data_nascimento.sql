@@ -0,0 +1,2 @@
+-- Filtros min_idade/max_idade de /alunos viram intervalo em data_nascimento
+CREATE INDEX IF NOT EXISTS ix_alunos_data_nascimento ON alunos (data_nascimento);
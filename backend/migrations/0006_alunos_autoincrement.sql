@@ -0,0 +1,50 @@
+-- alunos.id passa a ser AUTOINCREMENT: sem ele o SQLite gera max(id)+1 e, depois
+-- de excluir o aluno de maior id, reaproveitaria ids ainda presentes em
+-- alunos_arquivo ou já enviados como exclusão à sincronização incremental.
+-- O SQLite não altera a chave de uma tabela existente: a tabela é recriada,
+-- com os índices (models.py e migrações) e os triggers da migração 0004.
+CREATE TABLE alunos_autoincrement (
+    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    nome VARCHAR(80) NOT NULL,
+    data_nascimento DATE NOT NULL,
+    email VARCHAR(100),
+    status VARCHAR(20) NOT NULL,
+    turma_id INTEGER,
+    data_cadastro DATETIME,
+    data_atualizacao DATETIME,
+    FOREIGN KEY(turma_id) REFERENCES turmas (id)
+);
+INSERT INTO alunos_autoincrement (id, nome, data_nascimento, email, status, turma_id, data_cadastro, data_atualizacao)
+    SELECT id, nome, data_nascimento, email, status, turma_id, data_cadastro, data_atualizacao FROM alunos;
+DROP TABLE alunos;
+ALTER TABLE alunos_autoincrement RENAME TO alunos;
+CREATE INDEX IF NOT EXISTS ix_alunos_id ON alunos (id);
+CREATE INDEX IF NOT EXISTS ix_alunos_nome ON alunos (nome);
+CREATE INDEX IF NOT EXISTS ix_alunos_status ON alunos (status);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_alunos_email ON alunos (email);
+CREATE INDEX IF NOT EXISTS ix_alunos_turma_id ON alunos (turma_id);
+CREATE INDEX IF NOT EXISTS ix_alunos_data_nascimento ON alunos (data_nascimento);
+CREATE INDEX IF NOT EXISTS ix_alunos_data_atualizacao ON alunos (data_atualizacao);
+CREATE TRIGGER IF NOT EXISTS tr_alunos_contador_insert AFTER INSERT ON alunos
+BEGIN
+    UPDATE contadores SET valor = valor + 1 WHERE nome = 'alunos';
+END;
+CREATE TRIGGER IF NOT EXISTS tr_alunos_contador_update AFTER UPDATE ON alunos
+BEGIN
+    UPDATE contadores SET valor = valor + 1 WHERE nome = 'alunos';
+END;
+CREATE TRIGGER IF NOT EXISTS tr_alunos_contador_delete AFTER DELETE ON alunos
+BEGIN
+    UPDATE contadores SET valor = valor + 1 WHERE nome = 'alunos';
+END;
+-- A sequência começa acima de todo id já usado: em alunos, no arquivo e nas exclusões
+INSERT INTO sqlite_sequence (name, seq)
+    SELECT 'alunos', 0 WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'alunos');
+UPDATE sqlite_sequence SET seq = max(
+    seq,
+    (SELECT coalesce(max(id), 0) FROM alunos),
+    (SELECT coalesce(max(id), 0) FROM alunos_arquivo),
+    (SELECT coalesce(max(entidade_id), 0) FROM exclusoes WHERE entidade = 'aluno')
+) WHERE name = 'alunos';
+-- Toda alteração de esquema em alunos invalida os índices em memória (roster)
+UPDATE contadores SET valor = valor + 1 WHERE nome = 'alunos';
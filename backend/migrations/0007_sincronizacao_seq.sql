@@ -0,0 +1,34 @@
+-- Token da sincronização incremental (sync.py): toda inserção ou atualização
+-- em alunos e todo tombstone em exclusoes recebe `seq`, o próximo valor do
+-- contador 'sincronizacao', na mesma transação da escrita. O SQLite tem um
+-- único escritor, então a ordem de `seq` é a ordem de confirmação.
+-- 'sincronizacao_corte' é o menor token ainda aceito: sobe quando tombstones
+-- são removidos pela retenção e quando um backup é restaurado.
+INSERT OR IGNORE INTO contadores (nome, valor) VALUES ('sincronizacao', 0);
+INSERT OR IGNORE INTO contadores (nome, valor) VALUES ('sincronizacao_corte', 0);
+ALTER TABLE alunos ADD COLUMN seq INTEGER;
+ALTER TABLE exclusoes ADD COLUMN seq INTEGER;
+CREATE INDEX IF NOT EXISTS ix_alunos_seq ON alunos (seq);
+CREATE INDEX IF NOT EXISTS ix_exclusoes_seq ON exclusoes (seq);
+-- O UPDATE de `seq` feito pelos triggers não pode contar como alteração para
+-- o roster (contador 'alunos'): o trigger da migração 0004 passa a ignorá-lo
+DROP TRIGGER IF EXISTS tr_alunos_contador_update;
+CREATE TRIGGER tr_alunos_contador_update AFTER UPDATE ON alunos WHEN NEW.seq IS OLD.seq
+BEGIN
+    UPDATE contadores SET valor = valor + 1 WHERE nome = 'alunos';
+END;
+CREATE TRIGGER IF NOT EXISTS tr_alunos_seq_insert AFTER INSERT ON alunos
+BEGIN
+    UPDATE contadores SET valor = valor + 1 WHERE nome = 'sincronizacao';
+    UPDATE alunos SET seq = (SELECT valor FROM contadores WHERE nome = 'sincronizacao') WHERE id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS tr_alunos_seq_update AFTER UPDATE ON alunos WHEN NEW.seq IS OLD.seq
+BEGIN
+    UPDATE contadores SET valor = valor + 1 WHERE nome = 'sincronizacao';
+    UPDATE alunos SET seq = (SELECT valor FROM contadores WHERE nome = 'sincronizacao') WHERE id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS tr_exclusoes_seq_insert AFTER INSERT ON exclusoes
+BEGIN
+    UPDATE contadores SET valor = valor + 1 WHERE nome = 'sincronizacao';
+    UPDATE exclusoes SET seq = (SELECT valor FROM contadores WHERE nome = 'sincronizacao') WHERE id = NEW.id;
+END;
@@ -1,10 +1,10 @@
 # Models - SQLAlchemy ORM Models para o Sistema de Gestão Escolar
 
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, DateTime, Boolean, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
-import hashlib
+import security
 
 Base = declarative_base()
 
@@ -26,12 +26,17 @@ class Usuario(Base):
         return f"<Usuario(id={self.id}, username='{self.username}', tipo='{self.tipo}')>"
     
     def set_password(self, password):
-        """Define a senha do usuário com hash"""
-        self.password_hash = hashlib.sha256(password.encode()).hexdigest()
+        """Define a senha do usuário com hash scrypt e salt"""
+        self.password_hash = security.hash_password(password)
     
     def check_password(self, password):
-        """Verifica se a senha está correta"""
-        return self.password_hash == hashlib.sha256(password.encode()).hexdigest()
+        """Verifica se a senha está correta (aceita também o hash SHA-256 legado)"""
+        return security.verify_password(password, self.password_hash)
+    
+    @property
+    def needs_rehash(self):
+        """Indica se o hash deve ser regravado com os parâmetros atuais"""
+        return security.needs_rehash(self.password_hash)
     
     @property
     def is_admin(self):
@@ -60,15 +65,18 @@ class Turma(Base):
 class Aluno(Base):
     """Modelo da entidade Aluno"""
     __tablename__ = "alunos"
+    # AUTOINCREMENT: ids nunca são reaproveitados (ids de alunos arquivados ou excluídos)
+    __table_args__ = {"sqlite_autoincrement": True}
     
     id = Column(Integer, primary_key=True, index=True)
     nome = Column(String(80), nullable=False, index=True)
-    data_nascimento = Column(Date, nullable=False)
+    data_nascimento = Column(Date, nullable=False, index=True)
     email = Column(String(100), nullable=True, unique=True, index=True)
     status = Column(String(20), nullable=False, default="inativo", index=True)
-    turma_id = Column(Integer, ForeignKey("turmas.id"), nullable=True)
+    turma_id = Column(Integer, ForeignKey("turmas.id"), nullable=True, index=True)
     data_cadastro = Column(DateTime, default=datetime.utcnow)
-    data_atualizacao = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    data_atualizacao = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    seq = Column(Integer, nullable=True, index=True)  # ordem da alteração para a sincronização (trigger)
     
     # Relacionamento com turma
     turma = relationship("Turma", back_populates="alunos")
@@ -84,3 +92,54 @@ class Aluno(Base):
         return today.year - self.data_nascimento.year - (
             (today.month, today.day) < (self.data_nascimento.month, self.data_nascimento.day)
         )
+
+class AlunoArquivo(Base):
+    """Aluno inativo movido da tabela principal pelo arquivamento (archive.py)"""
+    __tablename__ = "alunos_arquivo"
+    
+    id = Column(Integer, primary_key=True)  # mesmo id que tinha em alunos
+    nome = Column(String(80), nullable=False, index=True)
+    data_nascimento = Column(Date, nullable=False)
+    email = Column(String(100), nullable=True)
+    status = Column(String(20), nullable=False)
+    turma_id = Column(Integer, nullable=True)
+    data_cadastro = Column(DateTime)
+    data_atualizacao = Column(DateTime)
+    data_arquivamento = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<AlunoArquivo(id={self.id}, nome='{self.nome}')>"
+
+class Exclusao(Base):
+    """Tombstone de registros excluídos, usado pela sincronização incremental"""
+    __tablename__ = "exclusoes"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    entidade = Column(String(20), nullable=False)  # aluno ou turma
+    entidade_id = Column(Integer, nullable=False)
+    data_exclusao = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    seq = Column(Integer, nullable=True, index=True)  # ordem da exclusão para a sincronização (trigger)
+    
+    def __repr__(self):
+        return f"<Exclusao(entidade='{self.entidade}', entidade_id={self.entidade_id})>"
+
+class Job(Base):
+    """Modelo de tarefa em segundo plano (fila persistida no SQLite)"""
+    __tablename__ = "jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    tipo = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default="pendente", index=True)  # pendente, executando, concluido, erro
+    progresso = Column(Integer, nullable=False, default=0)
+    parametros = Column(Text, nullable=True)  # JSON
+    resultado = Column(Text, nullable=True)
+    resultado_tipo = Column(String(50), nullable=True)  # content-type do resultado
+    erro = Column(Text, nullable=True)
+    criado_por = Column(Integer, ForeignKey("usuarios.id"), nullable=True)
+    worker_pid = Column(Integer, nullable=True)
+    data_criacao = Column(DateTime, default=datetime.utcnow)
+    data_inicio = Column(DateTime, nullable=True)
+    data_conclusao = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<Job(id={self.id}, tipo='{self.tipo}', status='{self.status}')>"
@@ -0,0 +1,318 @@
+# Profiler - Perfil por amostragem e captura de requisições lentas
+
+"""
+Perfil opcional (ESCOLA_PERFIL=1) para descobrir por que uma rota ficou lenta
+em produção, com custo baixo o bastante para ficar ligado:
+
+- 1 a cada AMOSTRA requisições roda sob cProfile;
+- toda requisição registra as consultas SQL (texto com `?`, sem os valores) e
+  seus tempos, pelos eventos de cursor dos engines;
+- requisições amostradas e as mais lentas que LENTO_MS ficam nos últimos
+  CAPACIDADE traces (ring buffer). Uma requisição lenta que não estava sob
+  cProfile guarda só o SQL e "arma" a rota: a próxima requisição dela é
+  perfilada.
+
+`GET /debug/perf` lista os traces com as pilhas no formato "collapsed"
+(`a;b;c microssegundos`), que flamegraph.pl e speedscope leem direto;
+`?formato=texto` devolve só as pilhas, com método e rota como quadro raiz.
+
+O cProfile registra pares chamador→chamado, não pilhas completas: as pilhas
+são reconstruídas a partir do grafo de chamadas, dividindo o tempo de cada
+função entre os chamadores na proporção do tempo gasto a partir de cada um.
+
+O perfil é por thread. No FastAPI as rotas assíncronas rodam na thread do
+event loop e o trabalho síncrono em threads do pool (`profiled()`); uma
+segunda requisição amostrada na mesma thread enquanto a primeira ainda está
+sob cProfile fica só com o SQL.
+"""
+
+import contextvars
+import cProfile
+import itertools
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+ENABLED = os.environ.get("ESCOLA_PERFIL") == "1"
+AMOSTRA = int(os.environ.get("ESCOLA_PERFIL_AMOSTRA", 100))
+LENTO_MS = float(os.environ.get("ESCOLA_PERFIL_LENTO_MS", 500))
+CAPACIDADE = int(os.environ.get("ESCOLA_PERFIL_TRACES", 20))
+MAX_SQL = 200
+MAX_PROFUNDIDADE = 64
+
+_trace_atual = contextvars.ContextVar("perfil_trace", default=None)
+_thread = threading.local()
+
+
+class Trace:
+    """Uma requisição em andamento: SQL executado e perfis de cada thread"""
+
+    __slots__ = ("id", "metodo", "rota", "tenant", "momento", "inicio", "amostrada",
+                 "sql", "sql_omitidas", "perfis", "token", "status", "duracao_ms", "motivo", "_pilhas")
+
+    def __init__(self, trace_id, metodo, rota, tenant, amostrada):
+        self.id = trace_id
+        self.metodo = metodo
+        self.rota = rota
+        self.tenant = tenant
+        self.momento = datetime.utcnow()
+        self.inicio = time.perf_counter()
+        self.amostrada = amostrada
+        self.sql = []
+        self.sql_omitidas = 0
+        self.perfis = []
+        self.token = None
+        self.status = None
+        self.duracao_ms = None
+        self.motivo = None
+        self._pilhas = None
+
+    def add_sql(self, statement, ms):
+        if len(self.sql) < MAX_SQL:
+            self.sql.append((" ".join(statement.split()), ms))
+        else:
+            self.sql_omitidas += 1
+
+    def pilhas(self):
+        """Pilhas collapsed (calculadas uma vez, depois que o trace termina)"""
+        if self._pilhas is None:
+            self._pilhas = collapse(self.perfis)
+        return self._pilhas
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "momento": self.momento.isoformat(),
+            "metodo": self.metodo,
+            "rota": self.rota,
+            "escola": self.tenant,
+            "status": self.status,
+            "duracao_ms": round(self.duracao_ms, 3),
+            "motivo": self.motivo,
+            "sql_total_ms": round(sum(ms for _, ms in self.sql), 3),
+            "sql": [{"sql": sql, "ms": round(ms, 3)} for sql, ms in self.sql],
+            "sql_omitidas": self.sql_omitidas,
+            "pilhas": self.pilhas(),
+        }
+
+
+def _label(func):
+    arquivo, linha, nome = func
+    if arquivo == "~":
+        rotulo = nome
+    else:
+        pasta, base = os.path.split(arquivo)
+        rotulo = f"{os.path.basename(pasta)}/{base}:{nome}:{linha}"
+    # O formato collapsed separa quadros por ";" e o valor pelo último espaço
+    return rotulo.replace(";", ",")
+
+
+def collapse(perfis):
+    """Pilhas "a;b;c microssegundos" reconstruídas dos perfis cProfile"""
+    if not perfis:
+        return []
+    stats = pstats.Stats(perfis[0])
+    for perfil in perfis[1:]:
+        stats.add(perfil)
+    dados = stats.stats
+
+    chamados = {}
+    for func, (_, _, _, _, chamadores) in dados.items():
+        for chamador, aresta in chamadores.items():
+            chamados.setdefault(chamador, []).append((func, aresta[3]))
+    raizes = [func for func, valor in dados.items() if not any(c in dados for c in valor[4])]
+
+    pilhas = {}
+
+    def visit(func, caminho, fracao):
+        caminho = caminho + (_label(func),)
+        proprio = int(dados[func][2] * fracao * 1_000_000)
+        if proprio > 0:
+            chave = ";".join(caminho)
+            pilhas[chave] = pilhas.get(chave, 0) + proprio
+        if len(caminho) >= MAX_PROFUNDIDADE:
+            return
+        for filho, tempo in chamados.get(func, ()):
+            total = dados[filho][3]
+            if total <= 0 or _label(filho) in caminho:
+                continue
+            visit(filho, caminho, fracao * min(tempo / total, 1.0))
+
+    for raiz in raizes:
+        visit(raiz, (), 1.0)
+    return [f"{pilha} {valor}" for pilha, valor in sorted(pilhas.items())]
+
+
+class Profiler:
+    """Decide quais requisições perfilar e guarda os últimos traces"""
+
+    def __init__(self, amostra=AMOSTRA, lento_ms=LENTO_MS, capacidade=CAPACIDADE, enabled=ENABLED):
+        self.amostra = max(1, amostra)
+        self.lento_ms = lento_ms
+        self.enabled = enabled
+        self._traces = deque(maxlen=capacidade)
+        self._contador = itertools.count(1)
+        self._armadas = set()
+        self._lock = threading.Lock()
+        self._instalado = False
+        self.metrics = {"requisicoes": 0, "amostradas": 0, "lentas": 0, "armadas": 0, "perfis_ignorados": 0}
+
+    def install(self):
+        """Registra os eventos de cursor em todos os engines (inclusive os das escolas)"""
+        with self._lock:
+            if self._instalado:
+                return
+            self._instalado = True
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+    def begin(self, metodo, rota, tenant=None):
+        """Inicia o trace da requisição na thread atual; None se desligado"""
+        if not self.enabled:
+            return None
+        self.install()
+        numero = next(self._contador)
+        with self._lock:
+            armada = (metodo, rota) in self._armadas
+            self._armadas.discard((metodo, rota))
+            self.metrics["requisicoes"] += 1
+        trace = Trace(numero, metodo, rota, tenant, armada or numero % self.amostra == 0)
+        trace.token = _trace_atual.set(trace)
+        if trace.amostrada:
+            self._start_profile(trace)
+        return trace
+
+    def end(self, trace, status=None):
+        """Fecha o trace e o guarda se foi amostrado ou lento"""
+        if trace is None:
+            return
+        self._stop_profile(trace)
+        trace.duracao_ms = (time.perf_counter() - trace.inicio) * 1000
+        trace.status = status
+        try:
+            _trace_atual.reset(trace.token)
+        except ValueError:
+            # Contexto diferente (ex.: middleware ASGI); o trace já não é usado
+            _trace_atual.set(None)
+        lenta = trace.duracao_ms >= self.lento_ms
+        if not (trace.amostrada or lenta):
+            return
+        trace.motivo = "lenta" if lenta else "amostra"
+        with self._lock:
+            self.metrics["amostradas"] += trace.amostrada
+            self.metrics["lentas"] += lenta
+            if lenta and not trace.perfis:
+                # Sem cProfile desta vez: a próxima requisição da rota é perfilada
+                self._armadas.add((trace.metodo, trace.rota))
+                self.metrics["armadas"] += 1
+            self._traces.append(trace)
+
+    @contextmanager
+    def profiled(self):
+        """Perfila um trecho em outra thread (ex.: pool do FastAPI) no trace atual"""
+        trace = _trace_atual.get()
+        if trace is None or not trace.amostrada:
+            yield
+            return
+        perfil = self._enable(trace)
+        try:
+            yield
+        finally:
+            self._disable(perfil, trace)
+
+    def _start_profile(self, trace):
+        trace_perfil = self._enable(trace)
+        if trace_perfil is not None:
+            _thread.perfil_requisicao = (trace, trace_perfil)
+
+    def _stop_profile(self, trace):
+        atual = getattr(_thread, "perfil_requisicao", None)
+        if atual is not None and atual[0] is trace:
+            _thread.perfil_requisicao = None
+            self._disable(atual[1], trace)
+
+    def _enable(self, trace):
+        # Um cProfile por thread: outra requisição já perfilada aqui fica só com o SQL
+        if getattr(_thread, "ativo", False):
+            with self._lock:
+                self.metrics["perfis_ignorados"] += 1
+            return None
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            # Outro profiler ativo no processo (Python 3.12+ só permite um)
+            with self._lock:
+                self.metrics["perfis_ignorados"] += 1
+            return None
+        _thread.ativo = True
+        return perfil
+
+    def _disable(self, perfil, trace):
+        if perfil is None:
+            return
+        perfil.disable()
+        _thread.ativo = False
+        with self._lock:
+            trace.perfis.append(perfil)
+
+    def traces(self):
+        """Traces guardados, do mais recente para o mais antigo"""
+        with self._lock:
+            traces = list(self._traces)
+        return [trace.to_dict() for trace in reversed(traces)]
+
+    def collapsed(self, trace_id=None):
+        """Pilhas dos traces em texto, com "MÉTODO rota" como quadro raiz"""
+        linhas = []
+        for trace in self.traces():
+            if trace_id is not None and trace["id"] != trace_id:
+                continue
+            raiz = f"{trace['metodo']} {trace['rota']}".replace(";", ",")
+            linhas.extend(f"{raiz};{pilha}" for pilha in trace["pilhas"])
+        return "\n".join(linhas) + ("\n" if linhas else "")
+
+    def snapshot(self):
+        with self._lock:
+            metrics = dict(self.metrics)
+            armadas = sorted(f"{metodo} {rota}" for metodo, rota in self._armadas)
+        return {
+            "habilitado": self.enabled,
+            "amostra": self.amostra,
+            "lento_ms": self.lento_ms,
+            "capacidade": self._traces.maxlen,
+            "metricas": metrics,
+            "rotas_armadas": armadas,
+            "traces": self.traces(),
+        }
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _trace_atual.get() is not None:
+        conn.info.setdefault("perfil_inicio", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = _trace_atual.get()
+    inicios = conn.info.get("perfil_inicio")
+    if trace is None or not inicios:
+        return
+    trace.add_sql(statement, (time.perf_counter() - inicios.pop()) * 1000)
+
+
+def _handle_error(contexto):
+    # Consulta com erro não chega ao after_cursor_execute: descarta o início
+    conn = contexto.connection
+    if conn is not None and conn.info.get("perfil_inicio"):
+        conn.info["perfil_inicio"].pop()
+
+
+profiler = Profiler()
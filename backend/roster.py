@@ -0,0 +1,390 @@
+# Roster - Índice colunar em memória dos alunos para filtros e busca sem SQL
+
+"""
+Opcional (ESCOLA_ROSTER=1): mantém em cada processo uma cópia compacta da
+tabela `alunos` e atende GET /alunos sem consulta ao banco.
+
+Armazenamento (uma linha por aluno, na ordem de id):
+  - colunas `array`: id, data de nascimento (ordinal), código de status,
+    turma_id (0 = sem turma) e um byte de "linha viva";
+  - nome, nome normalizado para busca (text_search) e e-mail em blobs de
+    texto únicos, com os offsets em `array` (nenhum objeto Python por aluno);
+  - listas de posições (posting lists, `array` ordenado) por status e por turma.
+
+Status são internados em códigos de 1 byte. Exclusões só marcam a linha como
+morta; quando as mortas passam de metade, as colunas são compactadas.
+Memória aproximada: ~40 bytes por aluno além dos textos (ver `stats()`).
+
+Coerência: escritas em alunos incrementam a linha 'alunos' da tabela
+`contadores` (trigger da migração 0004). Os handlers de escrita deste
+processo leem o contador dentro da transação e aplicam o delta após o commit
+se ele for exatamente o próximo valor; caso contrário (escrita de outro
+processo no meio) o índice é recarregado. Leituras verificam o contador no
+máximo a cada POLL_SECONDS.
+"""
+
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+from datetime import date
+
+from sqlalchemy import select, text
+
+import models
+import text_search
+
+ENABLED = os.environ.get("ESCOLA_ROSTER") == "1"
+POLL_SECONDS = float(os.environ.get("ESCOLA_ROSTER_POLL", 1.0))
+# Proporção de linhas mortas que dispara a compactação
+COMPACT_RATIO = 0.5
+
+_Aluno = models.Aluno.__table__
+CARREGAR_ALUNOS = select(
+    _Aluno.c.id, _Aluno.c.nome, _Aluno.c.data_nascimento, _Aluno.c.email, _Aluno.c.status, _Aluno.c.turma_id
+).order_by(_Aluno.c.id)
+VERSAO_ALUNOS = text("SELECT valor FROM contadores WHERE nome = 'alunos'")
+
+_SEP = "\x00"
+
+AlunoRow = namedtuple("AlunoRow", ["id", "nome", "data_nascimento", "email", "status", "turma_id"])
+
+
+class _TextColumn:
+    """Textos concatenados em um único str, separados por \\x00, com offsets"""
+
+    def __init__(self):
+        self._blob = ""
+        self._pending = []
+        self.offsets = array("q", [0])
+
+    def append(self, value):
+        value = (value or "").replace(_SEP, "")
+        self._pending.append(value + _SEP)
+        self.offsets.append(self.offsets[-1] + len(value) + 1)
+
+    @property
+    def blob(self):
+        if self._pending:
+            self._blob += "".join(self._pending)
+            self._pending = []
+        return self._blob
+
+    def get(self, row):
+        return self.blob[self.offsets[row]:self.offsets[row + 1] - 1]
+
+    def find(self, needle):
+        """Linhas cujo texto contém `needle`, em ordem"""
+        blob, offsets = self.blob, self.offsets
+        result = []
+        pos = blob.find(needle)
+        while pos != -1:
+            row = bisect_right(offsets, pos) - 1
+            result.append(row)
+            pos = blob.find(needle, offsets[row + 1])
+        return result
+
+    def nbytes(self):
+        return len(self.blob.encode("utf-8")) + self.offsets.itemsize * len(self.offsets)
+
+
+class Roster:
+    """Alunos de uma escola em colunas, com listas de posições por status e turma"""
+
+    def __init__(self, poll_seconds=POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._lock = threading.RLock()
+        self._versao = None
+        self._verificado_em = 0.0
+        self._stale = True
+        self.metrics = {"cargas": 0, "deltas": 0, "compactacoes": 0}
+        self._clear()
+
+    def _clear(self):
+        self.ids = array("q")
+        self.nascimentos = array("l")
+        self.status = array("B")
+        self.turmas = array("q")
+        self.vivas = array("B")
+        self.nomes = _TextColumn()
+        self.nomes_busca = _TextColumn()
+        self.emails = _TextColumn()
+        self.status_nomes = []
+        self._status_codigos = {}
+        self.por_status = {}
+        self.por_turma = {}
+        self.mortas = 0
+
+    # ------------------------------------------------------------------
+    # Carga e coerência
+    # ------------------------------------------------------------------
+
+    def load(self, db):
+        """Recarrega tudo do banco (contador lido antes dos alunos)"""
+        versao = db.execute(VERSAO_ALUNOS).scalar()
+        rows = db.execute(CARREGAR_ALUNOS).all()
+        with self._lock:
+            self._clear()
+            for row in rows:
+                self._append(row.id, row.nome, row.data_nascimento, row.email, row.status, row.turma_id)
+            self._versao = versao
+            self._verificado_em = time.monotonic()
+            self._stale = False
+            self.metrics["cargas"] += 1
+
+    def _ensure(self, db):
+        agora = time.monotonic()
+        with self._lock:
+            if not self._stale and agora - self._verificado_em < self.poll_seconds:
+                return
+            versao_local = None if self._stale else self._versao
+        if versao_local is not None and db.execute(VERSAO_ALUNOS).scalar() == versao_local:
+            with self._lock:
+                self._verificado_em = agora
+            return
+        self.load(db)
+
+    def write_version(self, db):
+        """Contador de alunos visto pela transação de escrita (antes do commit)"""
+        return db.execute(VERSAO_ALUNOS).scalar()
+
+    def _apply(self, versao, mudancas):
+        """Aplica um delta local se ele for o próximo na sequência do contador"""
+        with self._lock:
+            if self._stale or self._versao is None or versao != self._versao + mudancas:
+                self._stale = True
+                return False
+            self._versao = versao
+            self.metrics["deltas"] += 1
+            return True
+
+    # ------------------------------------------------------------------
+    # Mutação
+    # ------------------------------------------------------------------
+
+    def _codigo_status(self, status):
+        codigo = self._status_codigos.get(status)
+        if codigo is None:
+            codigo = self._status_codigos[status] = len(self.status_nomes)
+            self.status_nomes.append(status)
+        return codigo
+
+    def _append(self, aluno_id, nome, data_nascimento, email, status, turma_id):
+        row = len(self.ids)
+        codigo = self._codigo_status(status)
+        self.ids.append(aluno_id)
+        self.nascimentos.append(data_nascimento.toordinal())
+        self.status.append(codigo)
+        self.turmas.append(turma_id or 0)
+        self.vivas.append(1)
+        self.nomes.append(nome)
+        self.nomes_busca.append(text_search.normalize(nome))
+        self.emails.append(email)
+        self.por_status.setdefault(codigo, array("q")).append(row)
+        if turma_id:
+            self.por_turma.setdefault(turma_id, array("q")).append(row)
+
+    def _row(self, aluno_id):
+        row = bisect_left(self.ids, aluno_id)
+        while row < len(self.ids) and self.ids[row] == aluno_id:
+            if self.vivas[row]:
+                return row
+            row += 1
+        return None
+
+    def inserted(self, versao, aluno):
+        with self._lock:
+            if not self._apply(versao, 1):
+                return
+            if self.ids and aluno["id"] < self.ids[-1]:
+                # Id reaproveitado abaixo de uma linha morta: recarregar mantém a ordem
+                self._stale = True
+                return
+            data_nascimento = aluno["data_nascimento"]
+            if isinstance(data_nascimento, str):
+                data_nascimento = date.fromisoformat(data_nascimento)
+            self._append(aluno["id"], aluno["nome"], data_nascimento, aluno["email"],
+                         aluno["status"], aluno["turma_id"])
+
+    def deleted(self, versao, aluno_id):
+        with self._lock:
+            if not self._apply(versao, 1):
+                return
+            row = self._row(aluno_id)
+            if row is None:
+                return
+            self.vivas[row] = 0
+            self.mortas += 1
+            self.por_status[self.status[row]].remove(row)
+            if self.turmas[row]:
+                self.por_turma[self.turmas[row]].remove(row)
+            if self.mortas > len(self.ids) * COMPACT_RATIO:
+                self._compact()
+
+    def enrolled(self, versao, aluno_id, turma_id, status):
+        with self._lock:
+            if not self._apply(versao, 1):
+                return
+            row = self._row(aluno_id)
+            if row is None:
+                self._stale = True
+                return
+            codigo = self._codigo_status(status)
+            if codigo != self.status[row]:
+                self.por_status[self.status[row]].remove(row)
+                insort(self.por_status.setdefault(codigo, array("q")), row)
+                self.status[row] = codigo
+            if turma_id != self.turmas[row]:
+                if self.turmas[row]:
+                    self.por_turma[self.turmas[row]].remove(row)
+                if turma_id:
+                    insort(self.por_turma.setdefault(turma_id, array("q")), row)
+                self.turmas[row] = turma_id or 0
+
+    def enrolled_many(self, versao, matriculas, status):
+        """Matrículas em lote [(aluno_id, turma_id)]: colunas por linha, listas refeitas uma vez"""
+        with self._lock:
+            if not self._apply(versao, len(matriculas)):
+                return
+            codigo = self._codigo_status(status)
+            for aluno_id, turma_id in matriculas:
+                row = self._row(aluno_id)
+                if row is None:
+                    self._stale = True
+                    return
+                self.status[row] = codigo
+                self.turmas[row] = turma_id or 0
+            self._rebuild_postings()
+
+    def _rebuild_postings(self):
+        por_status, por_turma = {}, {}
+        for row, viva in enumerate(self.vivas):
+            if not viva:
+                continue
+            por_status.setdefault(self.status[row], array("q")).append(row)
+            if self.turmas[row]:
+                por_turma.setdefault(self.turmas[row], array("q")).append(row)
+        self.por_status, self.por_turma = por_status, por_turma
+
+    def _compact(self):
+        """Reconstrói as colunas só com as linhas vivas (sem acessar o banco)"""
+        vivas = [row for row in range(len(self.ids)) if self.vivas[row]]
+        antigas = (self.ids, self.nascimentos, self.status, self.turmas,
+                   self.nomes, self.emails, self.status_nomes)
+        ids, nascimentos, status, turmas, nomes, emails, status_nomes = antigas
+        self._clear()
+        for row in vivas:
+            self._append(ids[row], nomes.get(row), date.fromordinal(nascimentos[row]),
+                         emails.get(row) or None, status_nomes[status[row]], turmas[row])
+        self.metrics["compactacoes"] += 1
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def query(self, db, search=None, turma_id=None, status=None, nascido_apos=None, nascido_ate=None):
+        """
+        AlunoRow (id, nome, data_nascimento, email, status, turma_id) que
+        atendem aos filtros, em ordem de id
+        """
+        self._ensure(db)
+        with self._lock:
+            codigo = None
+            if status:
+                codigo = self._status_codigos.get(status)
+                if codigo is None:
+                    return []
+            turma_id = int(turma_id) if turma_id else None
+
+            # Começa pela lista de posições mais seletiva
+            if turma_id:
+                rows = self.por_turma.get(turma_id, ())
+                if codigo is not None:
+                    rows = [row for row in rows if self.status[row] == codigo]
+            elif codigo is not None:
+                rows = self.por_status.get(codigo, ())
+            else:
+                rows = None
+
+            needle = text_search.normalize(search).replace(_SEP, "") if search else None
+            if needle:
+                if rows is None:
+                    rows = [row for row in self.nomes_busca.find(needle) if self.vivas[row]]
+                else:
+                    rows = [row for row in rows if needle in self.nomes_busca.get(row)]
+            elif rows is None:
+                rows = [row for row in range(len(self.ids)) if self.vivas[row]]
+
+            if nascido_apos is not None or nascido_ate is not None:
+                apos = nascido_apos.toordinal() if nascido_apos is not None else float("-inf")
+                ate = nascido_ate.toordinal() if nascido_ate is not None else float("inf")
+                nascimentos = self.nascimentos
+                rows = [row for row in rows if apos < nascimentos[row] <= ate]
+
+            return [self._record(row) for row in rows]
+
+    def _record(self, row):
+        return AlunoRow(
+            self.ids[row],
+            self.nomes.get(row),
+            date.fromordinal(self.nascimentos[row]),
+            self.emails.get(row) or None,
+            self.status_nomes[self.status[row]],
+            self.turmas[row] or None,
+        )
+
+    def stats(self):
+        with self._lock:
+            colunas = sum(col.itemsize * len(col) for col in
+                          (self.ids, self.nascimentos, self.status, self.turmas, self.vivas))
+            indices = sum(lst.itemsize * len(lst) for lst in
+                          list(self.por_status.values()) + list(self.por_turma.values()))
+            textos = self.nomes.nbytes() + self.nomes_busca.nbytes() + self.emails.nbytes()
+            return {
+                "linhas": len(self.ids),
+                "vivas": len(self.ids) - self.mortas,
+                "bytes_colunas": colunas,
+                "bytes_indices": indices,
+                "bytes_textos": textos,
+                "versao": self._versao,
+                **self.metrics,
+            }
+
+
+roster = Roster()
+
+# Um índice por escola no modo multi-escola
+_tenant_rosters = {}
+_tenant_lock = threading.Lock()
+
+
+def roster_for(tenant):
+    """Índice da escola (ou o padrão quando tenant é None)"""
+    if tenant is None:
+        return roster
+    with _tenant_lock:
+        tenant_roster = _tenant_rosters.get(tenant)
+        if tenant_roster is None:
+            tenant_roster = _tenant_rosters[tenant] = Roster()
+        return tenant_roster
+
+
+def current():
+    """Índice da escola da requisição atual, ou None se desabilitado"""
+    if not ENABLED:
+        return None
+    import tenancy
+    return roster_for(tenancy.current_tenant.get())
+
+
+def warm(session_factory):
+    """Carrega o índice padrão na inicialização (o das escolas, sob demanda)"""
+    if not ENABLED:
+        return
+    db = session_factory()
+    try:
+        roster.load(db)
+    finally:
+        db.close()
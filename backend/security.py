@@ -0,0 +1,208 @@
+# Security - Hash de senhas com KDF e pool de verificação fora da thread da requisição
+
+"""
+As senhas são gravadas no formato
+
+    scrypt$<n>$<r>$<p>$<salt base64>$<hash base64>
+
+Hashes antigos (SHA-256 hexadecimal sem salt) continuam sendo aceitos e são
+regravados no formato novo no próximo login bem-sucedido (`needs_rehash`).
+
+O custo do scrypt pode ser ajustado por variáveis de ambiente:
+ESCOLA_SCRYPT_N, ESCOLA_SCRYPT_R e ESCOLA_SCRYPT_P.
+
+No login, o limite de tentativas (por IP e por username) é aplicado antes de
+consultar o usuário, e um username inexistente é verificado contra um hash
+fixo: a resposta leva o mesmo tempo e consome o mesmo limite que uma senha
+errada, sem revelar quais usernames existem.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEME = "scrypt"
+SCRYPT_N = int(os.environ.get("ESCOLA_SCRYPT_N", 2 ** 14))
+SCRYPT_R = int(os.environ.get("ESCOLA_SCRYPT_R", 8))
+SCRYPT_P = int(os.environ.get("ESCOLA_SCRYPT_P", 1))
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+# Pool de verificação: workers simultâneos e fila máxima aguardando
+VERIFY_WORKERS = int(os.environ.get("ESCOLA_VERIFY_WORKERS", 2))
+VERIFY_QUEUE = int(os.environ.get("ESCOLA_VERIFY_QUEUE", 32))
+VERIFY_TIMEOUT = float(os.environ.get("ESCOLA_VERIFY_TIMEOUT", 5.0))
+
+# Limite de tentativas de login por username (token bucket)
+LOGIN_BURST = int(os.environ.get("ESCOLA_LOGIN_BURST", 5))
+LOGIN_PER_MINUTE = float(os.environ.get("ESCOLA_LOGIN_PER_MINUTE", 10))
+# Limite por IP: vários usernames tentados a partir do mesmo endereço. A escola
+# inteira costuma sair por um único IP (NAT), então os padrões comportam o pico
+# de logins do início do dia; o custo é que um atacante nesse IP ainda consegue
+# testar até esse número de usernames por minuto (cada um limitado ao seu bucket)
+LOGIN_IP_BURST = int(os.environ.get("ESCOLA_LOGIN_IP_BURST", 300))
+LOGIN_IP_PER_MINUTE = float(os.environ.get("ESCOLA_LOGIN_IP_PER_MINUTE", 600))
+
+_dummy_hash = None
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p,
+        maxmem=256 * n * r, dklen=HASH_BYTES
+    )
+
+
+def hash_password(password):
+    """Gera o hash scrypt com salt aleatório para a senha"""
+    salt = os.urandom(SALT_BYTES)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"{SCHEME}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+
+
+def dummy_hash():
+    """Hash de uma senha aleatória com os parâmetros atuais (para usuários inexistentes)"""
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hash_password(_b64(os.urandom(SALT_BYTES)))
+    return _dummy_hash
+
+
+def _is_legacy(stored):
+    return "$" not in stored and len(stored) == 64
+
+
+def verify_password(password, stored):
+    """Verifica a senha contra o hash gravado (formato novo ou SHA-256 legado)"""
+    if not stored:
+        return False
+    if _is_legacy(stored):
+        candidate = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(candidate, stored)
+    try:
+        scheme, n, r, p, salt, digest = stored.split("$")
+        if scheme != SCHEME:
+            return False
+        candidate = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    except (ValueError, TypeError):
+        return False
+    return hmac.compare_digest(candidate, base64.b64decode(digest))
+
+
+def needs_rehash(stored):
+    """Indica se o hash está em formato antigo ou com parâmetros de custo desatualizados"""
+    if not stored or _is_legacy(stored):
+        return True
+    try:
+        scheme, n, r, p, _, _ = stored.split("$")
+    except ValueError:
+        return True
+    return scheme != SCHEME or (int(n), int(r), int(p)) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+class PoolBusyError(Exception):
+    """O pool de verificação está saturado"""
+
+
+class RateLimitedError(Exception):
+    """Muitas tentativas de login para o mesmo username ou do mesmo IP"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Tente novamente em {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class LoginRateLimiter:
+    """Token bucket por chave (username ou IP), protegido por lock"""
+
+    def __init__(self, burst=LOGIN_BURST, per_minute=LOGIN_PER_MINUTE, max_keys=10000):
+        self.burst = burst
+        self.rate = per_minute / 60.0
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """Consome uma tentativa ou levanta RateLimitedError"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                raise RateLimitedError((1 - tokens) / self.rate)
+            self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+
+    def _prune(self, now):
+        # Remove buckets que já teriam voltado a ficar cheios
+        full_after = self.burst / self.rate
+        for key, (_, last) in list(self._buckets.items()):
+            if now - last > full_after:
+                del self._buckets[key]
+
+
+class PasswordVerifier:
+    """
+    Executa verificações de senha em um pool limitado de threads.
+
+    hashlib.scrypt libera o GIL durante o cálculo, então as threads do pool
+    não impedem as demais requisições de avançar. Quando a fila está cheia a
+    verificação falha imediatamente com PoolBusyError em vez de acumular
+    threads de requisição esperando.
+    """
+
+    def __init__(self, workers=VERIFY_WORKERS, queue=VERIFY_QUEUE, timeout=VERIFY_TIMEOUT):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="senha")
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        self.limiter = LoginRateLimiter()
+        self.ip_limiter = LoginRateLimiter(burst=LOGIN_IP_BURST, per_minute=LOGIN_IP_PER_MINUTE)
+        # Calculado de antemão: o primeiro usuário inexistente não pode demorar mais
+        self._executor.submit(dummy_hash)
+
+    def _run(self, password, stored):
+        try:
+            return verify_password(password, stored)
+        finally:
+            self._slots.release()
+
+    def limit(self, username, ip=None):
+        """Consome uma tentativa do IP e do username (antes de consultar o usuário)"""
+        # IP primeiro: uma tentativa barrada pelo IP não gasta o limite do username
+        # (senão um atacante bloquearia o login de qualquer usuário)
+        if ip:
+            self.ip_limiter.acquire(ip)
+        self.limiter.acquire(username)
+
+    def verify(self, password, stored):
+        """Verifica a senha no pool; sem hash (usuário inexistente) usa o hash fixo e retorna False"""
+        if stored is None:
+            self._verify(password, dummy_hash())
+            return False
+        return self._verify(password, stored)
+
+    def _verify(self, password, stored):
+        if not self._slots.acquire(blocking=False):
+            raise PoolBusyError("Servidor ocupado verificando senhas")
+        try:
+            future = self._executor.submit(self._run, password, stored)
+        except Exception:
+            self._slots.release()
+            raise
+        return future.result(timeout=self.timeout)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+password_verifier = PasswordVerifier()
@@ -8,7 +8,7 @@ from sqlalchemy.orm import Session
 # Adicionar o diretório backend ao path para importar os módulos
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from database import SessionLocal, engine
+from database import get_session, engine
 import models
 
 def create_seed_data():
@@ -18,7 +18,7 @@ def create_seed_data():
     # Criar as tabelas se não existirem
     models.Base.metadata.create_all(bind=engine)
     
-    db = SessionLocal()
+    db = get_session()
     
     try:
         # Verificar se já existem dados
@@ -195,7 +195,7 @@ def clear_database():
     """
     Limpa todos os dados do banco de dados
     """
-    db = SessionLocal()
+    db = get_session()
     try:
         print("🗑️  Limpando banco de dados...")
         db.query(models.Aluno).delete()
@@ -214,7 +214,7 @@ def show_database_stats():
     """
     Mostra estatísticas do banco de dados
     """
-    db = SessionLocal()
+    db = get_session()
     try:
         turmas_count = db.query(models.Turma).count()
         alunos_count = db.query(models.Aluno).count()
@@ -245,6 +245,15 @@ if __name__ == "__main__":
     if len(sys.argv) > 1:
         command = sys.argv[1]
         
+        # Modo multi-escola: python seed.py create <escola>
+        if len(sys.argv) > 2:
+            import tenancy
+            if not tenancy.enabled():
+                print("❌ Defina ESCOLA_TENANTS_DIR para usar o modo multi-escola")
+                sys.exit(1)
+            tenancy.router.autocreate = True
+            tenancy.current_tenant.set(sys.argv[2])
+        
         if command == "create":
             print("🌱 Iniciando criação de dados de exemplo...")
             create_seed_data()
@@ -261,3 +270,4 @@ if __name__ == "__main__":
         print("  python seed.py create  - Criar dados de exemplo")
         print("  python seed.py clear   - Limpar banco de dados")
         print("  python seed.py stats   - Mostrar estatísticas")
+        print("  python seed.py create <escola> - Criar dados no banco da escola (multi-escola)")
@@ -0,0 +1,650 @@
+# Services - Camada de serviço compartilhada pelos backends FastAPI e Flask
+
+"""
+Regras de negócio e consultas usadas por app.py e app_flask.py. As consultas
+quentes são statements Core construídos uma única vez, com parâmetros
+vinculados (bindparam): a cada requisição só os valores mudam, e o SQLAlchemy
+reaproveita a compilação do seu cache em vez de reconstruir objetos Query.
+
+Erros de regra de negócio são sinalizados com ServiceError, que carrega o
+status HTTP e a mensagem; cada aplicação converte para sua resposta de erro.
+"""
+
+import heapq
+from datetime import date, datetime
+
+from sqlalchemy import Integer, String, bindparam, case, cast, delete, func, select, text, update
+
+import allocation
+import events
+import models
+import roster
+import sync
+import text_search
+import turma_cache
+
+
+class ServiceError(Exception):
+    """Erro de regra de negócio com status HTTP correspondente"""
+
+    def __init__(self, detail, status_code=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+class NotFoundError(ServiceError):
+    def __init__(self, detail):
+        super().__init__(detail, 404)
+
+
+# =====================================================
+# STATEMENTS PRÉ-CONSTRUÍDOS
+# =====================================================
+
+Aluno = models.Aluno.__table__
+AlunoArquivo = models.AlunoArquivo.__table__
+Turma = models.Turma.__table__
+
+TURMA_POR_NOME = select(Turma.c.id).where(Turma.c.nome == bindparam("nome"))
+LISTAR_TURMAS = turma_cache.LISTAR_TURMAS
+EXCLUIR_TURMA = delete(Turma).where(Turma.c.id == bindparam("turma_id"))
+CONTAR_ALUNOS_TURMA = select(func.count()).select_from(Aluno).where(
+    Aluno.c.turma_id == bindparam("turma_id")
+)
+CONTAR_POR_STATUS = select(Aluno.c.status, func.count()).group_by(Aluno.c.status)
+CONTAR_POR_TURMA = select(Aluno.c.turma_id, func.count()).where(
+    Aluno.c.turma_id.isnot(None)
+).group_by(Aluno.c.turma_id)
+
+# Matrícula automática (POST /matriculas/auto)
+ALUNOS_SEM_TURMA = select(Aluno.c.id, Aluno.c.data_nascimento).where(
+    Aluno.c.turma_id.is_(None)
+).order_by(Aluno.c.id)
+NASCIMENTO_MEDIO_POR_TURMA = select(Aluno.c.turma_id, func.avg(func.julianday(Aluno.c.data_nascimento))).where(
+    Aluno.c.turma_id.isnot(None)
+).group_by(Aluno.c.turma_id)
+MATRICULAR_EM_LOTE = update(Aluno).where(
+    Aluno.c.id == bindparam("aluno"), Aluno.c.turma_id.is_(None)
+).values(turma_id=bindparam("turma"), status="ativo", data_atualizacao=bindparam("agora"))
+# Escrita sem efeito que abre a transação já com o lock de escrita do SQLite:
+# as contagens lidas depois não mudam até o commit
+TRAVAR_ESCRITA = text("UPDATE contadores SET valor = valor WHERE nome = 'alunos'")
+
+# Idade completa calculada no SQLite (mesma regra de Aluno.idade) a partir de
+# uma data de referência vinculada, para não depender do fuso do 'now' do SQLite
+_HOJE = bindparam("hoje", type_=String)
+_IDADE = (
+    cast(func.strftime("%Y", _HOJE), Integer)
+    - cast(func.strftime("%Y", Aluno.c.data_nascimento), Integer)
+    - case((func.strftime("%m-%d", _HOJE) < func.strftime("%m-%d", Aluno.c.data_nascimento), 1), else_=0)
+).label("idade")
+HISTOGRAMA_IDADES = select(Aluno.c.turma_id, _IDADE, func.count().label("quantidade")).group_by(
+    Aluno.c.turma_id, _IDADE
+).order_by(Aluno.c.turma_id, _IDADE)
+
+# Turmas com contagem de alunos em uma única consulta agrupada
+_ALUNOS_COUNT = func.count(Aluno.c.id).label("alunos_count")
+_VAGAS = case((Turma.c.capacidade > _ALUNOS_COUNT, Turma.c.capacidade - _ALUNOS_COUNT), else_=0).label("vagas")
+_OCUPACAO = case(
+    (Turma.c.capacidade > 0, func.round(_ALUNOS_COUNT * 100.0 / Turma.c.capacidade, 1)), else_=0
+).label("ocupacao")
+_TURMAS_AGREGADAS = select(
+    Turma.c.id, Turma.c.nome, Turma.c.capacidade, _ALUNOS_COUNT, _VAGAS, _OCUPACAO
+).select_from(Turma.outerjoin(Aluno, Aluno.c.turma_id == Turma.c.id)).group_by(Turma.c.id)
+
+TURMA_INCLUDES = ("ocupacao", "alunos_count", "vagas")
+TURMA_ORDENACAO = {
+    "id": Turma.c.id,
+    "nome": Turma.c.nome,
+    "capacidade": Turma.c.capacidade,
+    "alunos_count": _ALUNOS_COUNT,
+    "vagas": _VAGAS,
+    "ocupacao": _OCUPACAO,
+}
+# Um statement por combinação de (agregado, ordenação, filtro de vagas)
+_TURMAS_POR_OPCAO = {}
+
+def _alunos_base(tabela):
+    return select(
+        tabela.c.id,
+        tabela.c.nome,
+        tabela.c.data_nascimento,
+        tabela.c.email,
+        tabela.c.status,
+        tabela.c.turma_id,
+    )
+
+
+# Um statement por combinação de (tabela, search, turma_id, status, faixa de nascimento)
+_ALUNOS_POR_FILTRO = {}
+
+
+def _alunos_statement(search, turma_id, status, nascido_apos=None, nascido_ate=None, tabela=Aluno):
+    key = (tabela.name, bool(search), bool(turma_id), bool(status),
+           nascido_apos is not None, nascido_ate is not None)
+    stmt = _ALUNOS_POR_FILTRO.get(key)
+    if stmt is None:
+        stmt = _alunos_base(tabela)
+        if search:
+            stmt = stmt.where(func.escola_normaliza(tabela.c.nome).like(
+                bindparam("search"), escape=text_search.LIKE_ESCAPE
+            ))
+        if turma_id:
+            stmt = stmt.where(tabela.c.turma_id == bindparam("turma_id"))
+        if status:
+            stmt = stmt.where(tabela.c.status == bindparam("status"))
+        # Faixa de idade vira intervalo em data_nascimento (ix_alunos_data_nascimento)
+        if nascido_apos is not None:
+            stmt = stmt.where(tabela.c.data_nascimento > bindparam("nascido_apos"))
+        if nascido_ate is not None:
+            stmt = stmt.where(tabela.c.data_nascimento <= bindparam("nascido_ate"))
+        stmt = stmt.order_by(tabela.c.id)
+        _ALUNOS_POR_FILTRO[key] = stmt
+    return stmt
+
+
+def _alunos_rows(db, search, turma_id, status, min_idade=None, max_idade=None, incluir_arquivados=False):
+    """
+    Linhas de alunos filtradas: do índice em memória (roster) ou do banco.
+    Com incluir_arquivados, retorna pares (linha, arquivado) intercalando
+    por id as linhas de alunos e de alunos_arquivo.
+    """
+    nascido_apos, nascido_ate = faixa_nascimento(min_idade, max_idade)
+    indice = roster.current()
+    if indice is not None:
+        rows = indice.query(db, search=search, turma_id=turma_id, status=status,
+                            nascido_apos=nascido_apos, nascido_ate=nascido_ate)
+    else:
+        rows = db.execute(*_alunos_query(search, turma_id, status, nascido_apos, nascido_ate, Aluno))
+    if not incluir_arquivados:
+        return rows
+    arquivados = db.execute(*_alunos_query(search, turma_id, status, nascido_apos, nascido_ate, AlunoArquivo))
+    return heapq.merge(
+        ((row, False) for row in rows), ((row, True) for row in arquivados), key=lambda item: item[0].id
+    )
+
+
+def _alunos_query(search, turma_id, status, nascido_apos, nascido_ate, tabela):
+    params = {}
+    if search:
+        params["search"] = text_search.like_pattern(search)
+    if turma_id:
+        params["turma_id"] = int(turma_id)
+    if status:
+        params["status"] = status
+    if nascido_apos is not None:
+        params["nascido_apos"] = nascido_apos
+    if nascido_ate is not None:
+        params["nascido_ate"] = nascido_ate
+    return _alunos_statement(search, turma_id, status, nascido_apos, nascido_ate, tabela), params
+
+
+def _roster_version(db):
+    """Contador de alunos na transação de escrita, se o roster estiver ativo"""
+    indice = roster.current()
+    if indice is None:
+        return None
+    db.flush()
+    return indice.write_version(db)
+
+
+def _to_int(value):
+    return int(value) if value not in (None, "") else None
+
+
+def _anos_antes(dia, anos):
+    """Mesmo dia `anos` anos antes (29/02 vira 28/02 em ano não bissexto)"""
+    try:
+        return dia.replace(year=dia.year - anos)
+    except ValueError:
+        return dia.replace(year=dia.year - anos, day=28)
+
+
+def faixa_nascimento(min_idade=None, max_idade=None, hoje=None):
+    """
+    Converte idades completas em (nascido_apos, nascido_ate), com as mesmas
+    regras de Aluno.idade: idade >= min_idade equivale a nascimento <=
+    nascido_ate e idade <= max_idade a nascimento > nascido_apos.
+    """
+    try:
+        min_idade, max_idade = _to_int(min_idade), _to_int(max_idade)
+    except (TypeError, ValueError):
+        raise ServiceError("min_idade e max_idade devem ser números inteiros")
+    if (min_idade is not None and min_idade < 0) or (max_idade is not None and max_idade < 0):
+        raise ServiceError("min_idade e max_idade não podem ser negativos")
+    if min_idade is not None and max_idade is not None and min_idade > max_idade:
+        raise ServiceError("min_idade não pode ser maior que max_idade")
+
+    hoje = hoje or date.today()
+    nascido_ate = _anos_antes(hoje, min_idade) if min_idade is not None else None
+    nascido_apos = _anos_antes(hoje, max_idade + 1) if max_idade is not None else None
+    return nascido_apos, nascido_ate
+
+
+# =====================================================
+# SERIALIZAÇÃO
+# =====================================================
+
+def aluno_to_dict(aluno, turma_nome=None):
+    """Representação JSON de um aluno (objeto ORM ou linha Core)"""
+    return {
+        "id": aluno.id,
+        "nome": aluno.nome,
+        "data_nascimento": aluno.data_nascimento.isoformat(),
+        "email": aluno.email,
+        "status": aluno.status,
+        "turma_id": aluno.turma_id,
+        "turma_nome": turma_nome
+    }
+
+
+def turma_to_dict(turma):
+    return {
+        "id": turma.id,
+        "nome": turma.nome,
+        "capacidade": turma.capacidade
+    }
+
+
+# =====================================================
+# TURMAS
+# =====================================================
+
+def get_turma(db, turma_id):
+    """Turma por id (TurmaInfo com id, nome, capacidade) ou None, via cache"""
+    return turma_cache.current().get(db, turma_id)
+
+
+def count_alunos_turma(db, turma_id):
+    return db.execute(CONTAR_ALUNOS_TURMA, {"turma_id": turma_id}).scalar()
+
+
+def turma_nomes(db):
+    """Mapa id -> nome de todas as turmas, via cache"""
+    return turma_cache.current().nomes(db)
+
+
+def _parse_ordenar(ordenar):
+    """'campo' ou '-campo' (decrescente) -> (campo, descendente)"""
+    if not ordenar:
+        return "id", False
+    campo = ordenar.lstrip("-")
+    if campo not in TURMA_ORDENACAO:
+        raise ServiceError(f"Ordenação inválida: {ordenar}. Use um de: {', '.join(TURMA_ORDENACAO)}")
+    return campo, ordenar.startswith("-")
+
+
+def _turmas_statement(agregado, campo, descendente, com_vagas):
+    key = (agregado, campo, descendente, com_vagas)
+    stmt = _TURMAS_POR_OPCAO.get(key)
+    if stmt is None:
+        stmt = _TURMAS_AGREGADAS if agregado else LISTAR_TURMAS.order_by(None)
+        if com_vagas:
+            stmt = stmt.having(Turma.c.capacidade > _ALUNOS_COUNT)
+        coluna = TURMA_ORDENACAO[campo]
+        stmt = stmt.order_by(coluna.desc() if descendente else coluna, Turma.c.id)
+        _TURMAS_POR_OPCAO[key] = stmt
+    return stmt
+
+
+def list_turmas(db, include=None, ordenar=None, com_vagas=False):
+    """
+    Lista turmas. `include` (lista ou 'a,b') acrescenta ocupacao (%),
+    alunos_count e vagas, calculados no banco junto com `ordenar` e
+    `com_vagas` em uma única consulta agrupada.
+    """
+    if isinstance(include, str):
+        include = [campo.strip() for campo in include.split(",") if campo.strip()]
+    include = list(include or [])
+    invalidos = [campo for campo in include if campo not in TURMA_INCLUDES]
+    if invalidos:
+        raise ServiceError(f"include inválido: {', '.join(invalidos)}. Use: {', '.join(TURMA_INCLUDES)}")
+
+    campo, descendente = _parse_ordenar(ordenar)
+    agregado = bool(include) or com_vagas or campo in TURMA_INCLUDES
+    if not agregado and not ordenar:
+        return [turma_to_dict(turma) for turma in turma_cache.current().all(db)]
+
+    result = []
+    for row in db.execute(_turmas_statement(agregado, campo, descendente, com_vagas)):
+        turma = turma_to_dict(row)
+        for campo_extra in include:
+            turma[campo_extra] = row._mapping[campo_extra]
+        result.append(turma)
+    return result
+
+
+def create_turma(db, nome, capacidade):
+    if db.execute(TURMA_POR_NOME, {"nome": nome}).first():
+        raise ServiceError("Já existe uma turma com este nome")
+
+    turma = models.Turma(nome=nome, capacidade=int(capacidade))
+    db.add(turma)
+    db.commit()
+    db.refresh(turma)
+    turma_cache.current().invalidate()
+
+    result = turma_to_dict(turma)
+    events.publish("turma_criada", result)
+    return result
+
+
+def delete_turma(db, turma_id):
+    if not get_turma(db, turma_id):
+        raise NotFoundError("Turma não encontrada")
+
+    # Verificar se há alunos matriculados
+    if count_alunos_turma(db, turma_id) > 0:
+        raise ServiceError("Não é possível excluir turma com alunos matriculados")
+
+    # rowcount 0: outro processo excluiu a turma antes de o cache perceber
+    if db.execute(EXCLUIR_TURMA, {"turma_id": turma_id}).rowcount == 0:
+        db.rollback()
+        turma_cache.current().invalidate()
+        raise NotFoundError("Turma não encontrada")
+    sync.record_deletion(db, "turma", turma_id)
+    db.commit()
+    turma_cache.current().invalidate()
+    events.publish("turma_excluida", {"id": turma_id})
+
+
+def _check_capacidade(db, turma_id):
+    """Retorna a turma se existir e tiver vaga; senão levanta ServiceError"""
+    turma = get_turma(db, turma_id)
+    if not turma:
+        raise NotFoundError("Turma não encontrada")
+    if count_alunos_turma(db, turma_id) >= turma.capacidade:
+        raise ServiceError("Turma já atingiu sua capacidade máxima")
+    return turma
+
+
+# =====================================================
+# ALUNOS
+# =====================================================
+
+def list_alunos(db, search=None, turma_id=None, status=None, min_idade=None, max_idade=None,
+                incluir_arquivados=False):
+    """
+    Lista alunos em uma única consulta; o nome da turma vem do cache de
+    turmas. Com incluir_arquivados cada aluno traz também `arquivado`.
+    """
+    nomes = turma_nomes(db)
+    rows = _alunos_rows(db, search, turma_id, status, min_idade, max_idade, incluir_arquivados)
+    if not incluir_arquivados:
+        return [aluno_to_dict(row, nomes.get(row.turma_id)) for row in rows]
+
+    result = []
+    for row, arquivado in rows:
+        aluno = aluno_to_dict(row, nomes.get(row.turma_id))
+        aluno["arquivado"] = arquivado
+        result.append(aluno)
+    return result
+
+
+# Datas no formato colunar: dias desde 1970-01-01
+EPOCA_COLUNAR = date(1970, 1, 1)
+_EPOCA_ORDINAL = EPOCA_COLUNAR.toordinal()
+
+
+def list_alunos_columnar(db, search=None, turma_id=None, status=None, min_idade=None, max_idade=None,
+                         incluir_arquivados=False):
+    """
+    Mesmo resultado de list_alunos em formato colunar: um array por campo,
+    nomes de turma codificados por dicionário (índice em
+    dicionarios.turma_nome) e datas como inteiros (dias desde EPOCA_COLUNAR).
+    """
+    turmas = turma_nomes(db)
+    ids, nomes, nascimentos, emails, status_col, turma_ids, turma_codigos = [], [], [], [], [], [], []
+    dicionario = {}
+    rows = _alunos_rows(db, search, turma_id, status, min_idade, max_idade, incluir_arquivados)
+    if incluir_arquivados:
+        pares = list(rows)
+        rows = [row for row, _ in pares]
+        arquivados = [arquivado for _, arquivado in pares]
+    for row in rows:
+        ids.append(row.id)
+        nomes.append(row.nome)
+        nascimentos.append(row.data_nascimento.toordinal() - _EPOCA_ORDINAL)
+        emails.append(row.email)
+        status_col.append(row.status)
+        turma_ids.append(row.turma_id)
+        turma_nome = turmas.get(row.turma_id)
+        if turma_nome is None:
+            turma_codigos.append(None)
+        else:
+            turma_codigos.append(dicionario.setdefault(turma_nome, len(dicionario)))
+
+    result = {
+        "formato": "columnar",
+        "total": len(ids),
+        "epoca": EPOCA_COLUNAR.isoformat(),
+        "colunas": {
+            "id": ids,
+            "nome": nomes,
+            "data_nascimento": nascimentos,
+            "email": emails,
+            "status": status_col,
+            "turma_id": turma_ids,
+            "turma_nome": turma_codigos
+        },
+        "dicionarios": {"turma_nome": list(dicionario)}
+    }
+    if incluir_arquivados:
+        result["colunas"]["arquivado"] = arquivados
+    return result
+
+
+def create_aluno(db, nome, data_nascimento, status, email=None, turma_id=None):
+    if isinstance(data_nascimento, str):
+        data_nascimento = datetime.strptime(data_nascimento, "%Y-%m-%d").date()
+    turma_id = _to_int(turma_id)
+
+    turma = _check_capacidade(db, turma_id) if turma_id else None
+
+    aluno = models.Aluno(
+        nome=nome,
+        data_nascimento=data_nascimento,
+        email=email or None,
+        status=status,
+        turma_id=turma_id
+    )
+    db.add(aluno)
+    versao = _roster_version(db)
+    db.commit()
+    db.refresh(aluno)
+
+    result = aluno_to_dict(aluno, turma.nome if turma else None)
+    if versao is not None:
+        roster.current().inserted(versao, result)
+    events.publish("aluno_criado", result)
+    return result
+
+
+def delete_aluno(db, aluno_id):
+    aluno = db.query(models.Aluno).filter(models.Aluno.id == aluno_id).first()
+    if not aluno:
+        raise NotFoundError("Aluno não encontrado")
+
+    db.delete(aluno)
+    versao = _roster_version(db)
+    sync.record_deletion(db, "aluno", aluno_id)
+    sync.purge_tombstones(db)
+    db.commit()
+    if versao is not None:
+        roster.current().deleted(versao, aluno_id)
+    events.publish("aluno_excluido", {"id": aluno_id})
+
+
+def alunos_changes(db, since):
+    nomes = turma_nomes(db)
+    return sync.changes_since(db, since, lambda aluno: aluno_to_dict(aluno, nomes.get(aluno.turma_id)))
+
+
+# =====================================================
+# MATRÍCULAS
+# =====================================================
+
+def matricular(db, aluno_id, turma_id):
+    """Matricula o aluno na turma e retorna o delta aplicado"""
+    aluno = db.query(models.Aluno).filter(models.Aluno.id == int(aluno_id)).first()
+    if not aluno:
+        raise NotFoundError("Aluno não encontrado")
+
+    turma_id = int(turma_id)
+    turma = get_turma(db, turma_id)
+    if not turma:
+        raise NotFoundError("Turma não encontrada")
+
+    # Verificar se o aluno já está matriculado em alguma turma
+    if aluno.turma_id:
+        raise ServiceError("Aluno já está matriculado em uma turma")
+
+    if count_alunos_turma(db, turma_id) >= turma.capacidade:
+        raise ServiceError("Turma já atingiu sua capacidade máxima")
+
+    aluno.turma_id = turma_id
+    aluno.status = "ativo"  # Alterar status para ativo ao matricular
+    versao = _roster_version(db)
+    db.commit()
+    if versao is not None:
+        roster.current().enrolled(versao, aluno.id, turma_id, aluno.status)
+
+    delta = {
+        "id": aluno.id,
+        "status": aluno.status,
+        "turma_id": turma.id,
+        "turma_nome": turma.nome
+    }
+    events.publish("aluno_matriculado", delta)
+    return delta
+
+
+def matricular_automatico(db, politica="equilibrar", simular=False, turma_ids=None, ordem=None):
+    """
+    Distribui todos os alunos sem turma entre as turmas com vagas segundo a
+    política (allocation.POLITICAS) e grava tudo em uma transação. Com
+    `simular`, só devolve a prévia. `turma_ids` restringe (e, na política
+    "ordem", ordena) as turmas; `ordem` dá a ordem dos alunos.
+    """
+    if politica not in allocation.POLITICAS:
+        raise ServiceError(f"Política inválida: {politica}. Use uma de: {', '.join(allocation.POLITICAS)}")
+    try:
+        turma_ids = [int(turma_id) for turma_id in turma_ids or ()]
+        ordem = [int(aluno_id) for aluno_id in ordem or ()]
+    except (TypeError, ValueError):
+        raise ServiceError("turmas e ordem devem ser listas de ids")
+
+    if not simular:
+        db.execute(TRAVAR_ESCRITA)
+
+    turmas = {row.id: row for row in db.execute(_TURMAS_AGREGADAS)}
+    if turma_ids:
+        faltando = [turma_id for turma_id in turma_ids if turma_id not in turmas]
+        if faltando:
+            raise NotFoundError(f"Turma não encontrada: {', '.join(map(str, faltando))}")
+        selecionadas = [turmas[turma_id] for turma_id in dict.fromkeys(turma_ids)]
+    else:
+        selecionadas = sorted(turmas.values(), key=lambda row: row.id)
+
+    medias = dict(db.execute(NASCIMENTO_MEDIO_POR_TURMA).all()) if politica == "faixa_etaria" else {}
+    vagas = [
+        allocation.TurmaVagas(row.id, row.capacidade, row.alunos_count, medias.get(row.id))
+        for row in selecionadas
+    ]
+    alunos = [allocation.AlunoSemTurma(row.id, row.data_nascimento) for row in db.execute(ALUNOS_SEM_TURMA)]
+    alocacoes, sem_vaga = allocation.allocate(alunos, vagas, politica, ordem)
+
+    if not simular and alocacoes:
+        agora = datetime.utcnow()
+        result = db.execute(MATRICULAR_EM_LOTE, [
+            {"aluno": aluno_id, "turma": turma_id, "agora": agora} for aluno_id, turma_id in alocacoes
+        ])
+        if result.rowcount != len(alocacoes):
+            db.rollback()
+            raise ServiceError("Alunos alterados durante a alocação; tente novamente", 409)
+        versao = _roster_version(db)
+        db.commit()
+        if versao is not None:
+            roster.current().enrolled_many(versao, alocacoes, "ativo")
+    elif not simular:
+        db.rollback()
+
+    por_turma = {}
+    for _, turma_id in alocacoes:
+        por_turma[turma_id] = por_turma.get(turma_id, 0) + 1
+    resumo = {
+        "politica": politica,
+        "simulacao": bool(simular),
+        "alocados": len(alocacoes),
+        "sem_vaga": len(sem_vaga),
+        "turmas": [
+            {
+                "turma_id": row.id,
+                "turma_nome": row.nome,
+                "capacidade": row.capacidade,
+                "alunos_antes": row.alunos_count,
+                "alocados": por_turma.get(row.id, 0),
+                "alunos_depois": row.alunos_count + por_turma.get(row.id, 0),
+            }
+            for row in selecionadas
+        ],
+    }
+    if not simular and alocacoes:
+        # Uma notificação para o lote: os clientes recarregam as listas
+        events.publish("matriculas_automaticas", {k: resumo[k] for k in ("politica", "alocados", "sem_vaga")})
+    resumo["alocacoes"] = [{"aluno_id": aluno_id, "turma_id": turma_id} for aluno_id, turma_id in alocacoes]
+    resumo["nao_alocados"] = sem_vaga
+    return resumo
+
+
+# =====================================================
+# ESTATÍSTICAS
+# =====================================================
+
+def estatisticas(db):
+    """Estatísticas gerais e por turma em duas consultas agregadas (turmas via cache)"""
+    por_status = dict(db.execute(CONTAR_POR_STATUS).all())
+    ocupacao = dict(db.execute(CONTAR_POR_TURMA).all())
+    turmas = turma_cache.current().all(db)
+
+    turmas_stats = []
+    for turma in turmas:
+        alunos_na_turma = ocupacao.get(turma.id, 0)
+        turmas_stats.append({
+            "turma_id": turma.id,
+            "turma_nome": turma.nome,
+            "capacidade": turma.capacidade,
+            "ocupacao": alunos_na_turma,
+            "percentual_ocupacao": round((alunos_na_turma / turma.capacidade) * 100, 1) if turma.capacidade > 0 else 0
+        })
+
+    return {
+        "total_alunos": sum(por_status.values()),
+        "alunos_ativos": por_status.get("ativo", 0),
+        "alunos_inativos": por_status.get("inativo", 0),
+        "total_turmas": len(turmas),
+        "turmas": turmas_stats
+    }
+
+
+def estatisticas_idades(db, hoje=None):
+    """Histograma de idades por turma, agrupado no banco (alunos sem turma por último)"""
+    hoje = hoje or date.today()
+    histogramas = {}
+    for row in db.execute(HISTOGRAMA_IDADES, {"hoje": hoje.isoformat()}):
+        histogramas.setdefault(row.turma_id, []).append({"idade": row.idade, "quantidade": row.quantidade})
+
+    def entrada(turma_id, turma_nome):
+        idades = histogramas.get(turma_id, [])
+        return {
+            "turma_id": turma_id,
+            "turma_nome": turma_nome,
+            "total": sum(item["quantidade"] for item in idades),
+            "idades": idades
+        }
+
+    turmas = [entrada(turma.id, turma.nome) for turma in turma_cache.current().all(db)]
+    if None in histogramas:
+        turmas.append(entrada(None, None))
+    return {"data_referencia": hoje.isoformat(), "turmas": turmas}
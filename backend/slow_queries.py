@@ -0,0 +1,204 @@
+# Slow Queries - Log de consultas lentas agregado por impressão digital
+
+"""
+Com ESCOLA_CONSULTAS_LENTAS=1, os eventos de cursor dos engines (escrita,
+leitura e os de cada escola) cronometram toda consulta executada. Cada uma é
+reduzida a uma impressão digital (fingerprint): espaços normalizados,
+literais de texto e números trocados por `?` e listas `IN (?, ?, ...)` de
+qualquer tamanho reduzidas a `IN (?+)`, de modo que a mesma consulta com
+valores diferentes cai na mesma entrada.
+
+Por fingerprint são agregados execuções, tempo total e máximo. Na primeira
+vez que uma execução passa de LENTA_MS, o `EXPLAIN QUERY PLAN` dela é
+capturado (na mesma conexão, com os parâmetros daquela execução) e guardado
+junto da entrada. Os valores dos parâmetros nunca são guardados.
+
+`GET /debug/consultas` mostra o relatório do processo. Com
+ESCOLA_CONSULTAS_LENTAS_ARQUIVO=<arquivo.json> (aceita `{pid}`) o relatório é
+gravado ao encerrar o processo e pode ser lido depois:
+
+    python slow_queries.py consultas.json --ordem max --limite 10
+"""
+
+import argparse
+import atexit
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from sqlalchemy import event
+
+ENABLED = os.environ.get("ESCOLA_CONSULTAS_LENTAS") == "1"
+LENTA_MS = float(os.environ.get("ESCOLA_CONSULTAS_LENTAS_MS", 100))
+ARQUIVO = os.environ.get("ESCOLA_CONSULTAS_LENTAS_ARQUIVO")
+MAX_FINGERPRINTS = 1000
+MAX_CACHE = 5000
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+VALUES_LIST = re.compile(r"\bVALUES\s*(\([^()]*\))(?:\s*,\s*\([^()]*\))+", re.IGNORECASE)
+EXPLICAVEIS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+ORDENS = ("total", "max", "execucoes", "media")
+
+
+def fingerprint(sql):
+    """Consulta normalizada: mesma estrutura, quaisquer valores"""
+    sql = " ".join(sql.split())
+    sql = STRING_LITERAL.sub("?", sql)
+    sql = NUMBER_LITERAL.sub("?", sql)
+    sql = IN_LIST.sub("IN (?+)", sql)
+    return VALUES_LIST.sub(r"VALUES \1", sql)
+
+
+class SlowQueryLog:
+    """Execuções, tempo total e máximo por fingerprint, com o plano das lentas"""
+
+    def __init__(self, lenta_ms=LENTA_MS, enabled=ENABLED):
+        self.lenta_ms = lenta_ms
+        self.enabled = enabled
+        self._entradas = {}
+        self._cache = {}
+        self._descartadas = 0
+        self._lock = threading.Lock()
+
+    def attach(self, engine):
+        """Cronometra as consultas do engine (nada a fazer se desligado)"""
+        if not self.enabled:
+            return
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+        event.listen(engine, "handle_error", self._error)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("consulta_inicio", []).append(time.perf_counter())
+
+    def _error(self, contexto):
+        conn = contexto.connection
+        if conn is not None and conn.info.get("consulta_inicio"):
+            conn.info["consulta_inicio"].pop()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        inicios = conn.info.get("consulta_inicio")
+        if not inicios:
+            return
+        ms = (time.perf_counter() - inicios.pop()) * 1000
+        if self.record(statement, ms) and statement.lstrip()[:7].upper().startswith(EXPLICAVEIS):
+            parametros = parameters[0] if executemany and parameters else parameters
+            self._explain(cursor.connection, statement, parametros)
+
+    def record(self, statement, ms):
+        """Agrega a execução; True se for a primeira lenta da fingerprint (plano a capturar)"""
+        chave = self._cache.get(statement)
+        if chave is None:
+            chave = fingerprint(statement)
+            if len(self._cache) >= MAX_CACHE:
+                self._cache.clear()
+            self._cache[statement] = chave
+        lenta = ms >= self.lenta_ms
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                if len(self._entradas) >= MAX_FINGERPRINTS:
+                    self._descartadas += 1
+                    return False
+                entrada = self._entradas[chave] = {
+                    "fingerprint": chave, "execucoes": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "lentas": 0, "plano": None, "plano_ms": None,
+                }
+            entrada["execucoes"] += 1
+            entrada["total_ms"] += ms
+            if ms > entrada["max_ms"]:
+                entrada["max_ms"] = ms
+            if not lenta:
+                return False
+            entrada["lentas"] += 1
+            if entrada["plano_ms"] is not None:
+                return False
+            entrada["plano_ms"] = ms
+            return True
+
+    def _explain(self, dbapi_connection, statement, parametros):
+        chave = self._cache.get(statement) or fingerprint(statement)
+        try:
+            linhas = dbapi_connection.execute(f"EXPLAIN QUERY PLAN {statement}", parametros or ()).fetchall()
+            plano = [linha[-1] for linha in linhas]
+        except Exception as e:
+            plano = [f"erro: {e}"]
+        with self._lock:
+            if chave in self._entradas:
+                self._entradas[chave]["plano"] = plano
+
+    def report(self, ordem="total", limite=None):
+        """Entradas ordenadas (total, max, execucoes ou media), com médias em ms"""
+        with self._lock:
+            entradas = [dict(entrada) for entrada in self._entradas.values()]
+            descartadas = self._descartadas
+        for entrada in entradas:
+            entrada["media_ms"] = entrada["total_ms"] / entrada["execucoes"]
+            for campo in ("total_ms", "max_ms", "media_ms"):
+                entrada[campo] = round(entrada[campo], 3)
+        return {
+            "habilitado": self.enabled,
+            "lenta_ms": self.lenta_ms,
+            "fingerprints": len(entradas),
+            "descartadas": descartadas,
+            "consultas": sort_entries(entradas, ordem)[:limite],
+        }
+
+    def dump(self, path):
+        with open(path.replace("{pid}", str(os.getpid())), "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+    def reset(self):
+        with self._lock:
+            self._entradas.clear()
+            self._descartadas = 0
+
+
+def sort_entries(entradas, ordem="total"):
+    if ordem not in ORDENS:
+        raise ValueError(f"Ordem inválida: {ordem} (use {', '.join(ORDENS)})")
+    campo = ordem if ordem == "execucoes" else f"{ordem}_ms"
+    return sorted(entradas, key=lambda entrada: -entrada[campo])
+
+
+def print_report(relatorio, ordem="total", limite=20):
+    """Tabela do relatório, com o plano das fingerprints que ficaram lentas"""
+    consultas = sort_entries(relatorio["consultas"], ordem)[:limite]
+    print(f"{len(consultas)} de {relatorio['fingerprints']} consultas (lenta ≥ {relatorio['lenta_ms']} ms)\n")
+    print(f"{'execuções':>10} {'total ms':>12} {'média ms':>10} {'máx ms':>10} {'lentas':>7}")
+    for entrada in consultas:
+        print(f"{entrada['execucoes']:>10} {entrada['total_ms']:>12.1f} {entrada['media_ms']:>10.2f} "
+              f"{entrada['max_ms']:>10.2f} {entrada['lentas']:>7}")
+        print(f"    {entrada['fingerprint']}")
+        for linha in entrada["plano"] or ():
+            print(f"      ↳ {linha}")
+
+
+recorder = SlowQueryLog()
+if recorder.enabled and ARQUIVO:
+    atexit.register(recorder.dump, ARQUIVO)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Relatório do log de consultas lentas")
+    parser.add_argument("arquivo", help="JSON gravado com ESCOLA_CONSULTAS_LENTAS_ARQUIVO")
+    parser.add_argument("--ordem", choices=ORDENS, default="total")
+    parser.add_argument("--limite", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    try:
+        with open(args.arquivo, encoding="utf-8") as f:
+            relatorio = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"❌ Não foi possível ler {args.arquivo}: {e}")
+        sys.exit(1)
+    print_report(relatorio, args.ordem, args.limite)
+
+
+if __name__ == "__main__":
+    main()
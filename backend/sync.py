@@ -0,0 +1,103 @@
+# Sync - Sincronização incremental de alunos (delta desde um token)
+
+"""
+O token é o valor do contador 'sincronizacao' (tabela `contadores`) visto
+pelo cliente. Os triggers da migração 0007 incrementam esse contador e gravam
+o novo valor em `seq` na mesma transação de cada inserção/atualização em
+`alunos` e de cada tombstone em `exclusoes`. Como o SQLite tem um único
+escritor, `seq` segue a ordem de confirmação: depois de ler o contador, toda
+linha com `seq` menor ou igual a ele já está visível, e o delta é exatamente
+o que tem `seq > token`, sem janela de segurança nem relógio.
+
+O contador é lido antes das linhas: uma escrita confirmada entre as duas
+leituras pode vir no delta e de novo no próximo (o cliente aplica os deltas
+de forma idempotente), mas nenhuma mudança é perdida.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, text
+
+import models
+
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+VERSAO = text("SELECT valor FROM contadores WHERE nome = 'sincronizacao'")
+CORTE = text("SELECT valor FROM contadores WHERE nome = 'sincronizacao_corte'")
+AVANCAR_CORTE = text(
+    "UPDATE contadores SET valor = max(valor, :seq) WHERE nome = 'sincronizacao_corte'"
+)
+
+
+class InvalidTokenError(ValueError):
+    """Token de sincronização malformado"""
+
+
+def encode_token(seq):
+    return str(seq)
+
+
+def decode_token(token):
+    try:
+        seq = int(token)
+    except (TypeError, ValueError):
+        raise InvalidTokenError("Token de sincronização inválido")
+    if seq < 0:
+        raise InvalidTokenError("Token de sincronização inválido")
+    return seq
+
+
+def record_deletion(db, entidade, entidade_id):
+    """Registra um tombstone na mesma transação da exclusão"""
+    db.add(models.Exclusao(entidade=entidade, entidade_id=entidade_id))
+
+
+def purge_tombstones(db, now=None):
+    """Remove tombstones mais antigos que a retenção; tokens anteriores a eles deixam de valer"""
+    limite = (now or datetime.utcnow()) - TOMBSTONE_RETENTION
+    antigos = db.query(models.Exclusao).filter(models.Exclusao.data_exclusao < limite)
+    maior_seq = antigos.with_entities(func.max(models.Exclusao.seq)).scalar()
+    if antigos.delete(synchronize_session=False) and maior_seq is not None:
+        db.execute(AVANCAR_CORTE, {"seq": maior_seq})
+
+
+def changes_since(db, token, serialize):
+    """
+    Retorna os alunos inseridos/atualizados e os ids excluídos desde o token.
+
+    Sem token, com token anterior ao corte (tombstones já removidos pela
+    retenção, backup restaurado) ou maior que o contador (token de outro banco
+    ou do formato antigo, baseado em horário) retorna o conjunto completo com
+    "completo": True, e o cliente deve substituir sua cópia local. Caso
+    contrário o cliente aplica primeiro `excluidos` e depois os `alunos`
+    (upsert por id).
+    """
+    since = decode_token(token) if token else None
+    versao = db.execute(VERSAO).scalar() or 0
+    corte = db.execute(CORTE).scalar() or 0
+    completo = since is None or since < corte or since > versao
+
+    query = db.query(models.Aluno)
+    if not completo:
+        query = query.filter(models.Aluno.seq > since)
+    alunos = query.order_by(models.Aluno.id).all()
+
+    excluidos = []
+    turmas_excluidas = []
+    if not completo:
+        tombstones = db.query(models.Exclusao.entidade, models.Exclusao.entidade_id).filter(
+            models.Exclusao.seq > since
+        ).order_by(models.Exclusao.seq)
+        for entidade, entidade_id in tombstones:
+            if entidade == "aluno":
+                excluidos.append(entidade_id)
+            elif entidade == "turma":
+                turmas_excluidas.append(entidade_id)
+
+    return {
+        "token": encode_token(versao),
+        "completo": completo,
+        "alunos": [serialize(aluno) for aluno in alunos],
+        "excluidos": excluidos,
+        "turmas_excluidas": turmas_excluidas
+    }
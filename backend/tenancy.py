@@ -0,0 +1,191 @@
+# Tenancy - Modo multi-escola: um arquivo SQLite por escola com pool de engines roteado
+
+"""
+Com ESCOLA_TENANTS_DIR definido, cada escola (tenant) tem seu próprio arquivo
+`<tenant>.db` nesse diretório, e portanto seu próprio lock de escrita: a vazão
+de escrita cresce com o número de escolas em vez de serializar em um único
+arquivo.
+
+A escola é resolvida pelo subdomínio do Host (escola1.<ESCOLA_TENANT_DOMAIN>)
+ou pela sessão do usuário. Os engines ficam em um LRU limitado a
+ESCOLA_MAX_TENANTS entradas, cada um com pools pequenos e fixos (escrita e
+somente leitura), então o número de arquivos abertos é no máximo
+MAX_OPEN_TENANTS * 2 * (POOL_SIZE + MAX_OVERFLOW), mais as conexões ainda em
+uso de engines despejados. Bancos novos são criados e atualizados no primeiro
+acesso.
+
+Abrir e migrar um banco acontece fora do lock do roteador: só quem pede a
+mesma escola espera por ela (um Future por escola em abertura), as demais
+seguem atendidas. Um engine despejado do LRU vai para a lista de
+aposentados e só recebe `dispose()` quando não tem mais conexões em uso
+(`dispose()` não fecha conexões emprestadas); a lista é verificada a cada
+acesso ao roteador.
+
+Sem ESCOLA_TENANTS_DIR tudo continua usando database.SessionLocal.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextvars import ContextVar
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+import slow_queries
+
+TENANTS_DIR = os.environ.get("ESCOLA_TENANTS_DIR")
+TENANT_DOMAIN = os.environ.get("ESCOLA_TENANT_DOMAIN", "")
+MAX_OPEN_TENANTS = int(os.environ.get("ESCOLA_MAX_TENANTS", 32))
+POOL_SIZE = int(os.environ.get("ESCOLA_TENANT_POOL_SIZE", 2))
+MAX_OVERFLOW = int(os.environ.get("ESCOLA_TENANT_MAX_OVERFLOW", 2))
+# Criar bancos para escolas ainda inexistentes (desligado: só arquivos existentes)
+AUTOCREATE = os.environ.get("ESCOLA_TENANT_AUTOCREATE") == "1"
+
+TENANT_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+# Escola da requisição atual (None = modo de banco único)
+current_tenant = ContextVar("current_tenant", default=None)
+
+
+class TenantNotFoundError(Exception):
+    """A escola não existe ou o nome é inválido"""
+
+
+class TenantRouter:
+    """LRU de engines/sessionmakers por escola"""
+
+    def __init__(self, directory, max_open=MAX_OPEN_TENANTS, autocreate=AUTOCREATE):
+        self.directory = directory
+        self.max_open = max_open
+        self.autocreate = autocreate
+        self._entries = OrderedDict()
+        self._opening = {}  # escola -> Future do banco sendo aberto
+        self._retired = []  # engines despejados com conexões ainda em uso
+        self._lock = threading.Lock()
+
+    def path_for(self, tenant):
+        return os.path.join(self.directory, f"{tenant}.db")
+
+    def is_valid(self, tenant):
+        if not tenant or not TENANT_PATTERN.match(tenant):
+            return False
+        return self.autocreate or os.path.exists(self.path_for(tenant))
+
+    def known_tenants(self):
+        """Escolas com banco já criado no diretório"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-3] for name in os.listdir(self.directory)
+                      if name.endswith(".db") and TENANT_PATTERN.match(name[:-3]))
+
+    def resolve(self, host=None, session_tenant=None):
+        """Escola pelo subdomínio do host; senão a gravada na sessão"""
+        hostname = (host or "").split(":")[0].lower()
+        if TENANT_DOMAIN and hostname.endswith("." + TENANT_DOMAIN):
+            candidate = hostname[: -len(TENANT_DOMAIN) - 1]
+            if self.is_valid(candidate):
+                return candidate
+        if session_tenant and self.is_valid(session_tenant):
+            return session_tenant
+        return None
+
+    def sessionmaker_for(self, tenant):
+        """Retorna o sessionmaker da escola, abrindo (e migrando) o banco se preciso"""
+        return self._entry(tenant)["write"]
+
+    def read_sessionmaker_for(self, tenant):
+        """Sessionmaker somente leitura da escola"""
+        return self._entry(tenant)["read"]
+
+    def _entry(self, tenant):
+        if self._retired:
+            self._dispose_retired()
+        with self._lock:
+            entry = self._entries.get(tenant)
+            if entry is not None:
+                self._entries.move_to_end(tenant)
+                return entry
+            if not self.is_valid(tenant):
+                raise TenantNotFoundError(f"Escola não encontrada: {tenant}")
+            future = self._opening.get(tenant)
+            opener = future is None
+            if opener:
+                future = self._opening[tenant] = Future()
+        if not opener:
+            # Outra thread está abrindo a mesma escola
+            return future.result()
+
+        try:
+            entry = self._open(tenant)
+        except BaseException as e:
+            with self._lock:
+                del self._opening[tenant]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._opening[tenant]
+            self._entries[tenant] = entry
+            while len(self._entries) > self.max_open:
+                _, old = self._entries.popitem(last=False)
+                self._retired.extend(old["engines"])
+        future.set_result(entry)
+        self._dispose_retired()
+        return entry
+
+    def _dispose_retired(self):
+        """Fecha os engines despejados que já não têm conexões em uso"""
+        livres = []
+        with self._lock:
+            retired, self._retired = self._retired, []
+            for engine in retired:
+                (livres if engine.pool.checkedout() == 0 else self._retired).append(engine)
+        for engine in livres:
+            engine.dispose()
+
+    def _open(self, tenant):
+        import database
+        import migrate
+
+        os.makedirs(self.directory, exist_ok=True)
+        engine = create_engine(
+            f"sqlite:///{self.path_for(tenant)}",
+            connect_args={"check_same_thread": False},
+            poolclass=QueuePool,
+            pool_size=POOL_SIZE,
+            max_overflow=MAX_OVERFLOW
+        )
+        database.enable_wal(engine)
+        database.instrument_pool(engine)
+        slow_queries.recorder.attach(engine)
+        migrate.ensure_schema(engine)
+        read_engine = database.create_read_engine(
+            database.read_only_url(self.path_for(tenant)),
+            pool_size=POOL_SIZE,
+            max_overflow=MAX_OVERFLOW
+        )
+        return {
+            "engines": (engine, read_engine),
+            "write": sessionmaker(autocommit=False, autoflush=False, bind=engine),
+            "read": sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+        }
+
+    def session(self, tenant):
+        return self.sessionmaker_for(tenant)()
+
+    def read_session(self, tenant):
+        return self.read_sessionmaker_for(tenant)()
+
+    def open_tenants(self):
+        with self._lock:
+            return list(self._entries)
+
+
+router = TenantRouter(TENANTS_DIR) if TENANTS_DIR else None
+
+
+def enabled():
+    return router is not None
@@ -0,0 +1,33 @@
+# Testes do backend: os módulos são importados como em `python app.py` (diretório backend/)
+
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Banco SQLite temporário com o esquema e as migrações aplicados"""
+    import migrate
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}", connect_args={"check_same_thread": False})
+    migrate.ensure_schema(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def Session(engine):
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def db(Session):
+    db = Session()
+    yield db
+    db.close()
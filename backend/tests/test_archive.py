@@ -0,0 +1,67 @@
+# Testes do arquivamento: ids de alunos arquivados nunca são reaproveitados
+
+from datetime import date, datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import archive
+import migrate
+import models
+import services
+
+ANTIGO = datetime(2020, 1, 1)
+
+
+def _alunos(db, ids, inativos):
+    db.add_all([
+        models.Aluno(id=aluno_id, nome=f"Aluno {aluno_id}", data_nascimento=date(2010, 1, 1),
+                     status="inativo" if aluno_id in inativos else "ativo", data_atualizacao=ANTIGO)
+        for aluno_id in ids
+    ])
+    db.commit()
+
+
+def test_excluir_maior_id_e_inserir_nao_reaproveita_id_arquivado(Session, db):
+    _alunos(db, range(1, 11), inativos=range(3, 10))
+    assert archive.archive_inactive(Session) == 7
+
+    services.delete_aluno(db, 10)
+    novo = services.create_aluno(db, "Aluno Novo", "2011-05-05", "ativo")
+
+    assert novo["id"] == 11
+    assert db.get(models.AlunoArquivo, novo["id"]) is None
+    # Sem ids duplicados entre as tabelas: listagem e novo arquivamento continuam válidos
+    ids = [row["id"] for row in services.list_alunos(db, incluir_arquivados=True)]
+    assert len(ids) == len(set(ids))
+    db.execute(models.Aluno.__table__.update().values(status="inativo", data_atualizacao=ANTIGO))
+    db.commit()
+    assert archive.archive_inactive(Session) == 3
+
+
+def test_migracao_leva_sequencia_acima_dos_ids_arquivados(tmp_path):
+    # Banco anterior à migração 0006: alunos sem AUTOINCREMENT
+    engine = create_engine(f"sqlite:///{tmp_path / 'legado.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE alunos")
+        conn.exec_driver_sql(
+            "CREATE TABLE alunos (id INTEGER NOT NULL PRIMARY KEY, nome VARCHAR(80) NOT NULL, "
+            "data_nascimento DATE NOT NULL, email VARCHAR(100), status VARCHAR(20) NOT NULL, "
+            "turma_id INTEGER, data_cadastro DATETIME, data_atualizacao DATETIME)"
+        )
+        conn.exec_driver_sql("DELETE FROM sqlite_sequence")
+        conn.exec_driver_sql(
+            "INSERT INTO alunos (id, nome, data_nascimento, status) VALUES (1, 'A', '2010-01-01', 'ativo')"
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO alunos_arquivo (id, nome, data_nascimento, status, data_arquivamento) "
+            "VALUES (7, 'B', '2010-01-01', 'inativo', '2020-01-01 00:00:00')"
+        )
+    migrate.ensure_schema(engine)
+
+    db = sessionmaker(bind=engine)()
+    novo = services.create_aluno(db, "Aluno Novo", "2011-05-05", "ativo")
+    assert novo["id"] == 8
+    db.close()
+    engine.dispose()
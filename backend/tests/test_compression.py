@@ -0,0 +1,79 @@
+# Testes do middleware ASGI de compressão: o que não vai ser comprimido não fica retido
+
+import asyncio
+import gzip
+
+import compression
+
+
+@compression.no_compression
+def feed_sse():
+    """Endpoint falso marcado com opt-out, como o feed SSE"""
+
+
+def run(app, accept_encoding="gzip"):
+    """Executa o middleware e devolve as mensagens enviadas antes de cada parte do app"""
+    enviadas = []
+    observadas = []
+
+    async def send(message):
+        enviadas.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def stub(scope, receive, send):
+        for message in app(scope):
+            await send(message)
+            observadas.append(list(enviadas))
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    middleware = compression.CompressionMiddleware(stub, min_size=1024)
+    asyncio.run(middleware(scope, receive, send))
+    return enviadas, observadas
+
+
+def stream(content_type, parts, endpoint=None):
+    def app(scope):
+        scope["endpoint"] = endpoint
+        yield {"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type)]}
+        for i, part in enumerate(parts):
+            yield {"type": "http.response.body", "body": part, "more_body": i < len(parts) - 1}
+    return app
+
+
+def test_sse_com_opt_out_entrega_cada_parte_sem_acumular():
+    app = stream(b"text/event-stream", [b"data: hello\n\n", b"data: bye\n\n"], endpoint=feed_sse)
+
+    enviadas, observadas = run(app)
+
+    # Logo depois da primeira parte o cliente já recebeu o início e o "hello"
+    assert [m["type"] for m in observadas[1]] == ["http.response.start", "http.response.body"]
+    assert observadas[1][1]["body"] == b"data: hello\n\n"
+    assert (b"vary", b"Accept-Encoding") in enviadas[0]["headers"]
+    assert not any(k == b"content-encoding" for k, _ in enviadas[0]["headers"])
+
+
+def test_tipo_nao_textual_em_streaming_passa_direto():
+    app = stream(b"application/octet-stream", [b"x" * 10, b"y" * 10])
+
+    _, observadas = run(app)
+
+    assert observadas[1][1]["body"] == b"x" * 10
+
+
+def test_json_em_partes_pequenas_e_comprimido_no_fim():
+    partes = [b'{"a": "' + b"x" * 600, b"y" * 600 + b'"}']
+    enviadas, _ = run(stream(b"application/json", partes))
+
+    headers = dict(enviadas[0]["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    corpo = b"".join(m["body"] for m in enviadas[1:])
+    assert gzip.decompress(corpo) == b"".join(partes)
+
+
+def test_json_pequeno_sai_sem_compressao():
+    enviadas, _ = run(stream(b"application/json", [b'{"a": 1}']))
+
+    assert not any(k == b"content-encoding" for k, _ in enviadas[0]["headers"])
+    assert enviadas[1]["body"] == b'{"a": 1}'
@@ -0,0 +1,17 @@
+# Testes do orçamento de importação: cada backend importa dentro do orçamento e sem criar o banco
+
+import pytest
+
+import importtime
+
+REPETICOES = 5
+
+
+@pytest.mark.parametrize("module", sorted(importtime.DEFAULT_BUDGETS))
+def test_importacao_dentro_do_orcamento_e_sem_criar_banco(module, tmp_path):
+    runs = [importtime.measure(module, str(tmp_path)) for _ in range(REPETICOES)]
+
+    assert not list(tmp_path.glob("*.db*"))
+    best = min(cumulative for cumulative, _ in runs)
+    assert best is not None
+    assert best <= importtime.DEFAULT_BUDGETS[module]
@@ -0,0 +1,58 @@
+# Testes da fila de jobs
+
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+import jobs
+import models
+
+
+def _dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def _executando(db, pid, inicio):
+    db_job = models.Job(tipo="recalcular_estatisticas", status="executando", worker_pid=pid, data_inicio=inicio)
+    db.add(db_job)
+    db.commit()
+    return db_job.id
+
+
+def test_reclaim_stale_marca_erro_em_jobs_de_workers_mortos_ou_vencidos(db):
+    agora = datetime.utcnow()
+    morto = _executando(db, _dead_pid(), agora)
+    vencido = _executando(db, os.getppid(), agora - timedelta(hours=2))
+    vivo = _executando(db, os.getppid(), agora)
+
+    assert jobs.reclaim_stale(db, lease=3600) == 2
+
+    status = {job.id: (job.status, job.erro) for job in db.query(models.Job)}
+    assert status[morto][0] == "erro" and "encerrado" in status[morto][1]
+    assert status[vencido][0] == "erro" and "prazo" in status[vencido][1]
+    assert status[vivo] == ("executando", None)
+    assert jobs.reclaim_stale(db, lease=3600) == 0
+
+
+def test_importar_alunos_reporta_email_repetido_e_status_invalido(db):
+    db.add(models.Aluno(nome="Existente", data_nascimento=datetime(2010, 1, 1).date(),
+                        email="ja@escola.com", status="ativo"))
+    db.commit()
+    alunos = [
+        {"nome": "A", "data_nascimento": "2011-01-01", "email": "a@escola.com", "status": "ativo"},
+        {"nome": "B", "data_nascimento": "2011-01-01", "email": "ja@escola.com"},
+        {"nome": "C", "data_nascimento": "2011-01-01", "email": "a@escola.com"},
+        {"nome": "D", "data_nascimento": "2011-01-01", "status": "suspenso"},
+        {"nome": "E", "data_nascimento": "2011-01-01"},
+    ]
+
+    resultado, _ = jobs.importar_alunos(db, {"alunos": alunos}, lambda done, total: None)
+
+    resultado = json.loads(resultado)
+    assert resultado["criados"] == 2
+    assert [erro["linha"] for erro in resultado["erros"]] == [1, 2, 3]
+    assert db.query(models.Aluno).count() == 3
@@ -0,0 +1,31 @@
+# Busca por nome: o SQL e o roster (índice em memória) dão o mesmo resultado
+
+import pytest
+
+import roster
+import services
+
+NOMES = ["Érica Souza", "ERICA Lima", "João 100%", "Ana_Maria", "Anabela", "Straße Nova"]
+
+
+@pytest.fixture
+def ids(db):
+    return {nome: services.create_aluno(db, nome, "2010-01-01", "ativo")["id"] for nome in NOMES}
+
+
+@pytest.mark.parametrize("search, esperados", [
+    ("érica", ["Érica Souza"]),
+    ("ÉRICA", ["Érica Souza"]),
+    ("erica", ["ERICA Lima"]),
+    ("%", ["João 100%"]),
+    ("_", ["Ana_Maria"]),
+    ("ana_", ["Ana_Maria"]),
+    ("STRASSE", ["Straße Nova"]),
+])
+def test_sql_e_roster_concordam(db, ids, search, esperados):
+    sql = [row.id for row in services._alunos_rows(db, search, None, None)]
+    indice = roster.Roster()
+    indice.load(db)
+    em_memoria = [row.id for row in indice.query(db, search=search)]
+
+    assert sql == em_memoria == sorted(ids[nome] for nome in esperados)
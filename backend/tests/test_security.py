@@ -0,0 +1,44 @@
+# Testes do login: limite por username/IP e verificação de usuários inexistentes
+
+import pytest
+
+import security
+
+
+def test_usuario_inexistente_verifica_contra_o_hash_fixo(monkeypatch):
+    verificados = []
+    monkeypatch.setattr(security, "verify_password", lambda password, stored: verificados.append(stored) or True)
+    verifier = security.PasswordVerifier(workers=1, queue=1)
+    try:
+        assert verifier.verify("senha", None) is False
+        assert verificados == [security.dummy_hash()]
+        assert verificados[0].startswith(f"{security.SCHEME}$")
+    finally:
+        verifier.shutdown()
+
+
+def test_limite_por_ip_vale_para_usernames_diferentes():
+    verifier = security.PasswordVerifier(workers=1, queue=1)
+    verifier.ip_limiter = security.LoginRateLimiter(burst=2, per_minute=1)
+    try:
+        verifier.limit("nao_existe_1", "10.0.0.1")
+        verifier.limit("nao_existe_2", "10.0.0.1")
+        with pytest.raises(security.RateLimitedError):
+            verifier.limit("nao_existe_3", "10.0.0.1")
+        verifier.limit("nao_existe_3", "10.0.0.2")
+    finally:
+        verifier.shutdown()
+
+
+def test_tentativa_barrada_pelo_ip_nao_gasta_o_limite_do_username():
+    verifier = security.PasswordVerifier(workers=1, queue=1)
+    verifier.limiter = security.LoginRateLimiter(burst=1, per_minute=1)
+    verifier.ip_limiter = security.LoginRateLimiter(burst=1, per_minute=1)
+    try:
+        verifier.limit("outro", "10.0.0.66")
+        with pytest.raises(security.RateLimitedError):
+            verifier.limit("vitima", "10.0.0.66")
+        # O username continua com sua tentativa a partir de outro endereço
+        verifier.limit("vitima", "10.0.0.1")
+    finally:
+        verifier.shutdown()
@@ -0,0 +1,63 @@
+# Testes da sincronização incremental (token = contador 'sincronizacao')
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+import models
+import services
+import sync
+
+
+def _contador(db, nome):
+    return db.execute(text("SELECT valor FROM contadores WHERE nome = :nome"), {"nome": nome}).scalar()
+
+
+def test_delta_desde_o_token(db):
+    primeiro = services.create_aluno(db, "A", "2010-01-01", "ativo")
+    inicial = services.alunos_changes(db, None)
+    assert inicial["completo"] and [aluno["id"] for aluno in inicial["alunos"]] == [primeiro["id"]]
+
+    segundo = services.create_aluno(db, "B", "2010-01-01", "ativo")
+    services.delete_aluno(db, primeiro["id"])
+    delta = services.alunos_changes(db, inicial["token"])
+
+    assert not delta["completo"]
+    assert [aluno["id"] for aluno in delta["alunos"]] == [segundo["id"]]
+    assert delta["excluidos"] == [primeiro["id"]]
+    vazio = services.alunos_changes(db, delta["token"])
+    assert vazio["alunos"] == [] and vazio["excluidos"] == [] and vazio["token"] == delta["token"]
+
+
+def test_ordem_de_confirmacao_independe_do_horario_gravado(db):
+    token = services.alunos_changes(db, None)["token"]
+    # data_atualizacao anterior ao token (relógio atrasado, transação longa): ainda entra no delta
+    db.add(models.Aluno(nome="Atrasado", data_nascimento=datetime(2010, 1, 1).date(), status="ativo",
+                        data_atualizacao=datetime.utcnow() - timedelta(hours=1)))
+    db.commit()
+    assert [aluno["nome"] for aluno in services.alunos_changes(db, token)["alunos"]] == ["Atrasado"]
+
+
+def test_seq_nao_conta_como_alteracao_para_o_roster(db):
+    antes = _contador(db, "alunos")
+    aluno = services.create_aluno(db, "A", "2010-01-01", "ativo")
+    db.query(models.Aluno).filter(models.Aluno.id == aluno["id"]).update({"status": "inativo"})
+    db.commit()
+    assert _contador(db, "alunos") == antes + 2
+    assert _contador(db, "sincronizacao") == 2
+
+
+def test_token_invalido_antigo_ou_anterior_ao_corte_devolve_completo(db):
+    services.create_aluno(db, "A", "2010-01-01", "ativo")
+    with pytest.raises(sync.InvalidTokenError):
+        services.alunos_changes(db, "abc")
+    # Token do formato antigo (microssegundos desde a época)
+    assert services.alunos_changes(db, "1700000000000000")["completo"]
+
+    token = services.alunos_changes(db, None)["token"]
+    aluno = services.create_aluno(db, "B", "2010-01-01", "ativo")
+    services.delete_aluno(db, aluno["id"])
+    sync.purge_tombstones(db, now=datetime.utcnow() + sync.TOMBSTONE_RETENTION + timedelta(days=1))
+    db.commit()
+    assert services.alunos_changes(db, token)["completo"]
@@ -0,0 +1,50 @@
+# Testes do roteador multi-escola
+
+import threading
+import time
+
+import tenancy
+
+
+def _router(tmp_path, max_open=32):
+    return tenancy.TenantRouter(str(tmp_path), max_open=max_open, autocreate=True)
+
+
+def test_abertura_lenta_nao_bloqueia_outras_escolas_nem_abre_duas_vezes(tmp_path):
+    router = _router(tmp_path)
+    abrir = router._open
+    liberar = threading.Event()
+    aberturas = []
+
+    def open_lento(tenant):
+        aberturas.append(tenant)
+        if tenant == "lenta":
+            liberar.wait(5)
+        return abrir(tenant)
+
+    router._open = open_lento
+    threads = [threading.Thread(target=router.sessionmaker_for, args=("lenta",)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+
+    # Enquanto "lenta" migra, outra escola é aberta normalmente
+    assert router.sessionmaker_for("rapida") is not None
+    liberar.set()
+    for thread in threads:
+        thread.join()
+    assert sorted(aberturas) == ["lenta", "rapida"]
+
+
+def test_engine_despejado_so_e_fechado_sem_conexoes_em_uso(tmp_path):
+    router = _router(tmp_path, max_open=1)
+    engine = router.sessionmaker_for("a").kw["bind"]
+    conexao = engine.connect()
+
+    router.sessionmaker_for("b")
+    assert router.open_tenants() == ["b"]
+    assert engine in router._retired
+
+    conexao.close()
+    router.sessionmaker_for("b")
+    assert engine not in router._retired
@@ -0,0 +1,40 @@
+# Text Search - Normalização da busca por nome, a mesma no SQL e no roster
+
+"""
+GET /alunos?search= é atendido pelo SQL ou pelo índice em memória
+(roster.py, ESCOLA_ROSTER=1), e os dois caminhos precisam dar o mesmo
+resultado. O `lower()`/`LIKE` do SQLite só dobra maiúsculas ASCII ("ÉRICA"
+não casaria com "érica"), então a comparação usa `normalize` dos dois lados:
+no roster diretamente e no SQL pela função `escola_normaliza`, registrada em
+toda conexão SQLite aberta pelo processo.
+
+O termo buscado é sempre literal: `%` e `_` digitados pelo usuário são
+escapados no padrão LIKE.
+"""
+
+import unicodedata
+
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+
+SQL_FUNCTION = "escola_normaliza"
+LIKE_ESCAPE = "\\"
+
+
+def normalize(texto):
+    """Forma comparável do texto: Unicode NFC e casefold"""
+    return unicodedata.normalize("NFC", texto or "").casefold()
+
+
+def like_pattern(search):
+    """Padrão LIKE que casa `search` (normalizado) como substring literal"""
+    termo = normalize(search)
+    for especial in (LIKE_ESCAPE, "%", "_"):
+        termo = termo.replace(especial, LIKE_ESCAPE + especial)
+    return f"%{termo}%"
+
+
+@event.listens_for(Pool, "connect")
+def _register_function(dbapi_connection, connection_record):
+    if hasattr(dbapi_connection, "create_function"):
+        dbapi_connection.create_function(SQL_FUNCTION, 1, normalize, deterministic=True)
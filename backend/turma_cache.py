@@ -0,0 +1,115 @@
+# Turma Cache - Diretório de turmas em memória, coerente entre processos
+
+"""
+As turmas são poucas e quase nunca mudam, mas criar aluno, matricular,
+excluir turma e listar alunos consultam nome e capacidade a todo momento.
+Cada processo mantém um mapa id -> (nome, capacidade) por escola:
+
+- Escritas feitas neste processo (create_turma/delete_turma) chamam
+  `invalidate()` logo após o commit.
+- Escritas de outros processos (outros workers, o worker de jobs, scripts)
+  incrementam a linha 'turmas' da tabela `contadores` por meio de triggers
+  (migração 0003). A cada POLL_SECONDS, no máximo, uma consulta lê esse
+  contador e recarrega o mapa se ele mudou; entre as verificações as buscas
+  não executam SQL.
+
+`PRAGMA data_version` não serve aqui: o valor é por conexão (com pool cada
+conexão tem o seu) e muda com qualquer escrita no arquivo, inclusive de
+alunos, o que recarregaria o mapa a cada matrícula.
+"""
+
+import os
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import select, text
+
+import models
+
+POLL_SECONDS = float(os.environ.get("ESCOLA_TURMA_CACHE_POLL", 1.0))
+
+TurmaInfo = namedtuple("TurmaInfo", ["id", "nome", "capacidade"])
+
+_Turma = models.Turma.__table__
+LISTAR_TURMAS = select(_Turma.c.id, _Turma.c.nome, _Turma.c.capacidade).order_by(_Turma.c.id)
+VERSAO_TURMAS = text("SELECT valor FROM contadores WHERE nome = 'turmas'")
+
+
+class TurmaDirectory:
+    """Mapa id -> TurmaInfo de uma escola, recarregado quando o contador muda"""
+
+    def __init__(self, poll_seconds=POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._turmas = None
+        self._versao = None
+        self._verificado_em = 0.0
+        # Incrementada por invalidate(): descarta recargas iniciadas antes dela
+        self._geracao = 0
+        self.metrics = {"recargas": 0, "verificacoes": 0, "invalidacoes": 0}
+
+    def invalidate(self):
+        with self._lock:
+            self._turmas = None
+            self._geracao += 1
+            self.metrics["invalidacoes"] += 1
+
+    def _current(self, db):
+        agora = time.monotonic()
+        with self._lock:
+            turmas, geracao = self._turmas, self._geracao
+            if turmas is not None and agora - self._verificado_em < self.poll_seconds:
+                return turmas
+
+        # Contador lido antes das turmas: uma escrita entre as duas leituras
+        # apenas provoca outra recarga na próxima verificação
+        versao = db.execute(VERSAO_TURMAS).scalar()
+        with self._lock:
+            self.metrics["verificacoes"] += 1
+            if turmas is not None and versao == self._versao and geracao == self._geracao:
+                self._verificado_em = agora
+                return turmas
+
+        turmas = {row.id: TurmaInfo(row.id, row.nome, row.capacidade) for row in db.execute(LISTAR_TURMAS)}
+        with self._lock:
+            self.metrics["recargas"] += 1
+            if geracao == self._geracao:
+                self._turmas, self._versao, self._verificado_em = turmas, versao, agora
+        return turmas
+
+    def get(self, db, turma_id):
+        """TurmaInfo da turma ou None"""
+        return self._current(db).get(turma_id)
+
+    def all(self, db):
+        """Todas as turmas, em ordem de id"""
+        return list(self._current(db).values())
+
+    def nomes(self, db):
+        """Mapa id -> nome"""
+        return {turma_id: turma.nome for turma_id, turma in self._current(db).items()}
+
+
+directory = TurmaDirectory()
+
+# Um diretório por escola no modo multi-escola
+_tenant_directories = {}
+_tenant_lock = threading.Lock()
+
+
+def directory_for(tenant):
+    """Diretório da escola (ou o padrão quando tenant é None)"""
+    if tenant is None:
+        return directory
+    with _tenant_lock:
+        tenant_directory = _tenant_directories.get(tenant)
+        if tenant_directory is None:
+            tenant_directory = _tenant_directories[tenant] = TurmaDirectory()
+        return tenant_directory
+
+
+def current():
+    """Diretório da escola da requisição atual"""
+    import tenancy
+    return directory_for(tenancy.current_tenant.get())
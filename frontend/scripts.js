@@ -21,6 +21,9 @@ let filters = {
 let alunosData = [];
 let turmasData = [];
 
+// Feed de mudanças (SSE)
+let eventSource = null;
+
 // =====================================================
 // INICIALIZAÇÃO
 // =====================================================
@@ -142,6 +145,7 @@ async function handleLogout() {
         });
         
         currentUser = null;
+        disconnectEventStream();
         showLoginScreen();
         setupLoginEventListeners();
         showToast('Logout realizado com sucesso!', 'success');
@@ -199,17 +203,20 @@ function setupEventListeners() {
     // Botões principais - permissões de admin
 
     const btnNovoProfessor = document.getElementById('btnNovoProfessor');
+    const btnMatriculaAuto = document.getElementById('btnMatriculaAuto');
 
     if (currentUser && currentUser.is_admin) {
         btnNovoAluno.style.display = '';
         btnNovaTurma.style.display = '';
         btnNovoProfessor.style.display = '';
+        btnMatriculaAuto.style.display = '';
         btnNovoAluno.disabled = false;
         btnNovaTurma.disabled = false;
         btnNovoProfessor.disabled = false;
         btnNovoAluno.addEventListener('click', () => openModal('modalNovoAluno'));
         btnNovaTurma.addEventListener('click', () => openModal('modalNovaTurma'));
         btnNovoProfessor.addEventListener('click', () => openModal('modalNovoProfessor'));
+        btnMatriculaAuto.addEventListener('click', handleMatriculaAuto);
 
         // Cadastro de professor (apenas admin)
         const formProfessor = document.getElementById('formProfessor');
@@ -253,6 +260,7 @@ function setupEventListeners() {
         btnNovoAluno.style.display = 'none';
         btnNovaTurma.style.display = 'none';
         btnNovoProfessor.style.display = 'none';
+        btnMatriculaAuto.style.display = 'none';
     }
 // Cadastro de professor (apenas admin)
 
@@ -359,6 +367,7 @@ async function loadInitialData() {
         await Promise.all([loadAlunos(), loadTurmas()]);
         updateStatistics();
         populateTurmaSelects();
+        connectEventStream();
     } catch (error) {
         showToast('Erro ao carregar dados iniciais', 'error');
         console.error('Erro ao carregar dados:', error);
@@ -373,6 +382,8 @@ async function loadAlunos() {
         if (filters.search) queryParams.append('search', filters.search);
         if (filters.turma) queryParams.append('turma_id', filters.turma);
         if (filters.status) queryParams.append('status', filters.status);
+        // Formato colunar (um array por campo); o navegador negocia gzip sozinho
+        queryParams.append('format', 'columnar');
         
         const response = await fetch(`${API_BASE_URL}/alunos?${queryParams}`, {
             credentials: 'include'
@@ -386,7 +397,7 @@ async function loadAlunos() {
             throw new Error(`Erro ${response.status}: ${response.statusText}`);
         }
         
-        alunosData = await response.json();
+        alunosData = decodeColumnar(await response.json());
         renderAlunos();
         updateStatistics();
         
@@ -399,9 +410,37 @@ async function loadAlunos() {
     }
 }
 
+const DAY_MS = 24 * 60 * 60 * 1000;
+
+// Converte a resposta ?format=columnar de /alunos de volta em objetos
+function decodeColumnar(payload) {
+    if (Array.isArray(payload)) return payload;
+    
+    const { colunas, dicionarios, total } = payload;
+    const epoca = Date.parse(`${payload.epoca}T00:00:00Z`);
+    const turmaNomes = dicionarios.turma_nome;
+    const alunos = new Array(total);
+    
+    for (let i = 0; i < total; i++) {
+        const turmaCodigo = colunas.turma_nome[i];
+        alunos[i] = {
+            id: colunas.id[i],
+            nome: colunas.nome[i],
+            data_nascimento: new Date(epoca + colunas.data_nascimento[i] * DAY_MS).toISOString().slice(0, 10),
+            email: colunas.email[i],
+            status: colunas.status[i],
+            turma_id: colunas.turma_id[i],
+            turma_nome: turmaCodigo === null ? null : turmaNomes[turmaCodigo]
+        };
+        if (colunas.arquivado) alunos[i].arquivado = colunas.arquivado[i];
+    }
+    return alunos;
+}
+
 async function loadTurmas() {
     try {
-        const response = await fetch(`${API_BASE_URL}/turmas`, {
+        // Ocupação calculada no servidor: a aba de turmas não precisa das linhas de alunos
+        const response = await fetch(`${API_BASE_URL}/turmas?include=ocupacao,alunos_count,vagas`, {
             credentials: 'include'
         });
         
@@ -522,8 +561,8 @@ function renderTurmas() {
     }
 
     tbody.innerHTML = turmasData.map(turma => {
-        const ocupacao = alunosData.filter(aluno => aluno.turma_id === turma.id).length;
-        const percentualOcupacao = (ocupacao / turma.capacidade * 100).toFixed(1);
+        const ocupacao = turma.alunos_count || 0;
+        const percentualOcupacao = (turma.ocupacao || 0).toFixed(1);
 
         if (currentUser && currentUser.is_admin) {
             return `
@@ -656,11 +695,11 @@ async function handleAlunoSubmit(e) {
             throw new Error(errorData.detail || `Erro ${response.status}`);
         }
         
-        await response.json();
+        const novoAluno = await response.json();
         
         closeModal('modalNovoAluno');
         resetForm('formAluno');
-        await loadAlunos();
+        applyAlunoCriado(novoAluno);
         
         showToast('Aluno cadastrado com sucesso!');
         
@@ -717,7 +756,7 @@ async function deleteAluno(id) {
             throw new Error(errorData.detail || `Erro ${response.status}`);
         }
         
-        await loadAlunos();
+        applyAlunoExcluido({ id });
         showToast('Aluno excluído com sucesso!');
         
     } catch (error) {
@@ -755,12 +794,11 @@ async function handleTurmaSubmit(e) {
             throw new Error(errorData.detail || `Erro ${response.status}`);
         }
         
-        await response.json();
+        const novaTurma = await response.json();
         
         closeModal('modalNovaTurma');
         resetForm('formTurma');
-        await loadTurmas();
-        populateTurmaSelects();
+        applyTurmaCriada(novaTurma);
         
         showToast('Turma cadastrada com sucesso!');
         
@@ -798,8 +836,7 @@ async function deleteTurma(id) {
     if (!turma) return;
     
     // Verificar se há alunos matriculados
-    const alunosMatriculados = alunosData.filter(aluno => aluno.turma_id === id).length;
-    if (alunosMatriculados > 0) {
+    if (turma.alunos_count > 0) {
         showToast('Não é possível excluir turma com alunos matriculados', 'error');
         return;
     }
@@ -821,8 +858,7 @@ async function deleteTurma(id) {
             throw new Error(errorData.detail || `Erro ${response.status}`);
         }
         
-        await loadTurmas();
-        populateTurmaSelects();
+        applyTurmaExcluida({ id });
         showToast('Turma excluída com sucesso!');
         
     } catch (error) {
@@ -858,8 +894,8 @@ async function openMatriculaModal(alunoId) {
                     <select id="turmaMatricula" name="turma_id" required>
                         <option value="">Selecione uma turma</option>
                         ${turmasData.map(turma => {
-                            const ocupacao = alunosData.filter(a => a.turma_id === turma.id).length;
-                            const disponivel = ocupacao < turma.capacidade;
+                            const ocupacao = turma.alunos_count || 0;
+                            const disponivel = turma.vagas > 0;
                             return `<option value="${turma.id}" ${!disponivel ? 'disabled' : ''}>
                                 ${escapeHtml(turma.nome)} (${ocupacao}/${turma.capacidade})
                                 ${!disponivel ? ' - LOTADA' : ''}
@@ -921,7 +957,14 @@ async function handleMatriculaSubmit(e) {
         await response.json();
         
         closeMatriculaModal();
-        await loadAlunos();
+        const turmaId = parseInt(matriculaData.turma_id);
+        const turma = turmasData.find(t => t.id === turmaId);
+        applyAlunoMatriculado({
+            id: parseInt(matriculaData.aluno_id),
+            status: 'ativo',
+            turma_id: turmaId,
+            turma_nome: turma ? turma.nome : null
+        });
         
         showToast('Aluno matriculado com sucesso!');
         
@@ -933,6 +976,155 @@ async function handleMatriculaSubmit(e) {
     }
 }
 
+// =====================================================
+// FEED DE MUDANÇAS (SERVER-SENT EVENTS)
+// =====================================================
+
+function connectEventStream() {
+    if (eventSource || typeof EventSource === 'undefined') return;
+    
+    // O navegador reconecta sozinho e envia Last-Event-ID
+    eventSource = new EventSource(`${API_BASE_URL}/events`, { withCredentials: true });
+    
+    const handlers = {
+        aluno_criado: applyAlunoCriado,
+        aluno_excluido: applyAlunoExcluido,
+        aluno_matriculado: applyAlunoMatriculado,
+        turma_criada: applyTurmaCriada,
+        turma_excluida: applyTurmaExcluida,
+        // Alocação em lote: mais simples recarregar as listas do que aplicar cada matrícula
+        matriculas_automaticas: () => { loadAlunos(); loadTurmas(); }
+    };
+    
+    Object.entries(handlers).forEach(([tipo, handler]) => {
+        eventSource.addEventListener(tipo, (e) => handler(JSON.parse(e.data)));
+    });
+    
+    // Eventos perdidos além do buffer do servidor: recarregar tudo
+    eventSource.addEventListener('resync', () => {
+        loadAlunos();
+        loadTurmas();
+    });
+}
+
+function disconnectEventStream() {
+    if (eventSource) {
+        eventSource.close();
+        eventSource = null;
+    }
+}
+
+function matchesFilters(aluno) {
+    if (filters.search && !aluno.nome.toLowerCase().includes(filters.search.toLowerCase())) return false;
+    if (filters.turma && aluno.turma_id !== parseInt(filters.turma)) return false;
+    if (filters.status && aluno.status !== filters.status) return false;
+    return true;
+}
+
+function refreshAlunosView() {
+    renderAlunos();
+    updateStatistics();
+}
+
+// As contagens por turma vêm do servidor (?include=); após mudanças de
+// matrícula basta recarregar a lista de turmas, que não traz linhas de alunos
+let turmasRefreshTimer = null;
+
+function scheduleTurmasRefresh() {
+    if (turmasData.length === 0) return;
+    clearTimeout(turmasRefreshTimer);
+    turmasRefreshTimer = setTimeout(loadTurmas, 300);
+}
+
+function applyAlunoCriado(aluno) {
+    if (aluno.turma_id) scheduleTurmasRefresh();
+    // Idempotente: o evento SSE pode chegar depois da resposta local
+    if (alunosData.some(a => a.id === aluno.id) || !matchesFilters(aluno)) return;
+    alunosData.push(aluno);
+    refreshAlunosView();
+}
+
+function applyAlunoExcluido({ id }) {
+    scheduleTurmasRefresh();
+    const index = alunosData.findIndex(a => a.id === id);
+    if (index === -1) return;
+    alunosData.splice(index, 1);
+    refreshAlunosView();
+}
+
+function applyAlunoMatriculado(delta) {
+    scheduleTurmasRefresh();
+    const aluno = alunosData.find(a => a.id === delta.id);
+    if (!aluno) return;
+    Object.assign(aluno, delta);
+    if (!matchesFilters(aluno)) {
+        alunosData.splice(alunosData.indexOf(aluno), 1);
+    }
+    refreshAlunosView();
+}
+
+function applyTurmaCriada(turma) {
+    if (turmasData.some(t => t.id === turma.id)) return;
+    turmasData.push({ ...turma, alunos_count: 0, vagas: turma.capacidade, ocupacao: 0 });
+    renderTurmas();
+    populateTurmaSelects();
+    updateStatistics();
+}
+
+function applyTurmaExcluida({ id }) {
+    const index = turmasData.findIndex(t => t.id === id);
+    if (index === -1) return;
+    turmasData.splice(index, 1);
+    renderTurmas();
+    populateTurmaSelects();
+    updateStatistics();
+}
+
+// Alocação automática: mostra a prévia (simular) e só grava após confirmação
+async function postMatriculaAuto(simular) {
+    const response = await fetch(`${API_BASE_URL}/matriculas/auto`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        credentials: 'include',
+        body: JSON.stringify({ politica: 'equilibrar', simular })
+    });
+    if (!response.ok) {
+        const errorData = await response.json();
+        throw new Error(errorData.detail || `Erro ${response.status}`);
+    }
+    return response.json();
+}
+
+async function handleMatriculaAuto() {
+    try {
+        showLoading(true);
+        const previa = await postMatriculaAuto(true);
+        showLoading(false);
+        if (previa.alocados === 0) {
+            showToast(previa.sem_vaga ? 'Não há vagas para os alunos sem turma.' : 'Nenhum aluno sem turma.', 'error');
+            return;
+        }
+        const turmas = previa.turmas
+            .filter(t => t.alocados > 0)
+            .map(t => `${t.turma_nome}: +${t.alocados} (${t.alunos_depois}/${t.capacidade})`)
+            .join('\n');
+        const semVaga = previa.sem_vaga ? `\n\n${previa.sem_vaga} aluno(s) continuarão sem turma (sem vagas).` : '';
+        if (!confirm(`Alocar ${previa.alocados} aluno(s) sem turma?\n\n${turmas}${semVaga}`)) return;
+
+        showLoading(true);
+        const resultado = await postMatriculaAuto(false);
+        await Promise.all([loadAlunos(), loadTurmas()]);
+        showToast(`${resultado.alocados} aluno(s) matriculado(s) automaticamente!`);
+    } catch (error) {
+        console.error('Erro na alocação automática:', error);
+        showToast(`Erro na alocação automática: ${error.message}`, 'error');
+    } finally {
+        showLoading(false);
+    }
+}
+
 // =====================================================
 // EXPORTAÇÃO DE DADOS
 // =====================================================
@@ -943,7 +1135,7 @@ async function exportData(type, format) {
         let filename;
         
         if (type === 'alunos') {
-            data = alunosData;
+            data = await fetchAlunosComArquivados();
             filename = `alunos_${new Date().toISOString().split('T')[0]}`;
         } else if (type === 'matriculas') {
             data = alunosData.filter(aluno => aluno.turma_id);
@@ -964,19 +1156,31 @@ async function exportData(type, format) {
     }
 }
 
+// Exportação de alunos inclui os arquivados (fora da tabela principal)
+async function fetchAlunosComArquivados() {
+    const response = await fetch(`${API_BASE_URL}/alunos?incluir_arquivados=1&format=columnar`, {
+        credentials: 'include'
+    });
+    if (!response.ok) {
+        throw new Error(`Erro ${response.status}: ${response.statusText}`);
+    }
+    return decodeColumnar(await response.json());
+}
+
 function exportToCSV(data, filename, type) {
     let headers;
     let rows;
     
     if (type === 'alunos') {
-        headers = ['ID', 'Nome', 'Data de Nascimento', 'Email', 'Status', 'Turma'];
+        headers = ['ID', 'Nome', 'Data de Nascimento', 'Email', 'Status', 'Turma', 'Arquivado'];
         rows = data.map(aluno => [
             aluno.id,
             aluno.nome,
             aluno.data_nascimento,
             aluno.email || '',
             aluno.status,
-            aluno.turma_nome || ''
+            aluno.turma_nome || '',
+            aluno.arquivado ? 'sim' : 'não'
         ]);
     } else {
         headers = ['Aluno ID', 'Nome do Aluno', 'Turma ID', 'Nome da Turma', 'Data de Matricula'];